@@ -0,0 +1,186 @@
+"""
+analytics_cube.py — count / wins / ΣR / ΣR² over trade dimensions in one pass
+
+Each dimension (hour, day, session, bars-to-confirm bucket, ATR quartile, direction,
+planned R:R bucket, pair) is integer-coded once (-1 = not in any bucket). All 1-D
+margins and pairwise crosses are then bincounts over the combined codes; any other
+slice (e.g. hour × session × direction for one pair) is one more bincount, cached.
+
+    cube = AnalyticsCube.from_trades(closed)            # enrich_signals() rows
+    cube.table("session")                                # like analyze_by_session
+    cube.table("hour", "session", "direction", where={"pair": "XAUUSD"})
+    cube.save(path); AnalyticsCube.load(path)            # npz, no pickles
+"""
+
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+# Buckets (right-closed, as pd.cut)
+BTC_BINS = [0, 5, 10, 20, 30, 50, 100, 500, 10000]
+BTC_LABELS = ["1-5", "6-10", "11-20", "21-30", "31-50", "51-100", "101-500", "500+"]
+RR_BINS = [0, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 100.0]
+RR_LABELS = ["<0.5", "0.5-1.0", "1.0-1.5", "1.5-2.0", "2.0-3.0", "3.0-5.0", "5.0+"]
+ATR_LABELS = ["Low (Q1)", "Medium-Low (Q2)", "Medium-High (Q3)", "High (Q4)"]
+
+MEASURES = ("count", "wins", "sum_r", "sum_r2", "sum_bars")
+
+
+def _cut_codes(values, bins) -> np.ndarray:
+    codes = pd.cut(np.asarray(values, dtype=np.float64), bins=bins, labels=False, right=True)
+    return np.where(np.isnan(codes), -1, codes).astype(np.int64)
+
+
+def _label_codes(values) -> Tuple[np.ndarray, List[str]]:
+    """String column → codes in sorted label order (same order as a pandas groupby)."""
+    labels, codes = np.unique(np.asarray(values).astype(str), return_inverse=True)
+    return codes.astype(np.int64), [str(x) for x in labels]
+
+
+def _atr_codes(atr) -> Tuple[np.ndarray, List[str]]:
+    """ATR quartiles of the valid rows (halves if quartile edges collide), -1 = NaN / too few."""
+    atr = pd.Series(np.asarray(atr, dtype=np.float64))
+    codes = np.full(len(atr), -1, dtype=np.int64)
+    valid = atr.notna()
+    if valid.sum() < 5:
+        return codes, list(ATR_LABELS)
+    try:
+        cat = pd.qcut(atr[valid], q=4, labels=ATR_LABELS, duplicates="drop")
+    except ValueError:
+        # Not enough unique values for 4 quartiles
+        cat = pd.qcut(atr[valid], q=2, labels=["Low", "High"], duplicates="drop")
+    codes[valid.to_numpy()] = cat.cat.codes.to_numpy()
+    return codes, [str(c) for c in cat.cat.categories]
+
+
+def encode_dimensions(trades: pd.DataFrame) -> Tuple[Dict[str, np.ndarray], Dict[str, List[str]]]:
+    """Integer codes + labels for every dimension available in the trades frame."""
+    codes, labels = {}, {}
+    codes["hour"] = trades["hour"].to_numpy(dtype=np.int64)
+    labels["hour"] = [str(h) for h in range(24)]
+    codes["day"] = trades["day_of_week"].to_numpy(dtype=np.int64)
+    labels["day"] = list(DAY_NAMES)
+    codes["session"], labels["session"] = _label_codes(trades["session"])
+    codes["btc"] = _cut_codes(trades["bars_to_confirm"], BTC_BINS)
+    labels["btc"] = list(BTC_LABELS)
+    codes["atr"], labels["atr"] = _atr_codes(trades["atr_at_confirm"])
+    codes["direction"], labels["direction"] = _label_codes(trades["direction"])
+    codes["rr"] = _cut_codes(trades["rr_planned"], RR_BINS)
+    labels["rr"] = list(RR_LABELS)
+    if "pair" in trades.columns:
+        codes["pair"], labels["pair"] = _label_codes(trades["pair"])
+    return codes, labels
+
+
+class AnalyticsCube:
+    """Coded trades + precomputed 1-D and pairwise cells."""
+
+    def __init__(self, codes: Dict[str, np.ndarray], labels: Dict[str, List[str]],
+                 pnl_r: np.ndarray, is_win: np.ndarray, bars: np.ndarray):
+        self.codes = codes
+        self.labels = labels
+        self.pnl_r = np.asarray(pnl_r, dtype=np.float64)
+        self.is_win = np.asarray(is_win, dtype=bool)
+        self.bars = np.asarray(bars, dtype=np.float64)
+        self._cells: Dict[tuple, Dict[str, np.ndarray]] = {}
+        dims = list(codes)
+        for d in dims:
+            self.cells((d,))
+        for pair in combinations(dims, 2):
+            self.cells(pair)
+
+    @classmethod
+    def from_trades(cls, trades: pd.DataFrame) -> "AnalyticsCube":
+        codes, labels = encode_dimensions(trades)
+        return cls(codes, labels, trades["pnl_r"].to_numpy(), trades["is_win"].to_numpy(),
+                   trades["bars_to_confirm"].to_numpy())
+
+    @property
+    def dimensions(self) -> List[str]:
+        return list(self.codes)
+
+    def __len__(self) -> int:
+        return len(self.pnl_r)
+
+    def _mask(self, where: Optional[dict]) -> Optional[np.ndarray]:
+        if not where:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        for dim, want in where.items():
+            want = [want] if np.isscalar(want) else list(want)
+            ids = [self.labels[dim].index(str(w)) for w in want if str(w) in self.labels[dim]]
+            mask &= np.isin(self.codes[dim], ids)
+        return mask
+
+    def cells(self, dims: tuple, where: Optional[dict] = None) -> Dict[str, np.ndarray]:
+        """Measures over the full grid of dims (shape = label counts), cached without `where`."""
+        key = (tuple(dims), tuple(sorted((k, str(v)) for k, v in (where or {}).items())))
+        if key in self._cells:
+            return self._cells[key]
+        shape = tuple(len(self.labels[d]) for d in dims)
+        flat = np.zeros(len(self), dtype=np.int64)
+        ok = np.ones(len(self), dtype=bool)
+        for d, size in zip(dims, shape):
+            c = self.codes[d]
+            ok &= c >= 0
+            flat = flat * size + np.maximum(c, 0)
+        mask = self._mask(where)
+        if mask is not None:
+            ok &= mask
+        idx = flat[ok]
+        size = int(np.prod(shape)) if shape else 1
+        r = self.pnl_r[ok]
+        out = {
+            "count": np.bincount(idx, minlength=size),
+            "wins": np.bincount(idx, weights=self.is_win[ok], minlength=size).astype(np.int64),
+            "sum_r": np.bincount(idx, weights=r, minlength=size),
+            "sum_r2": np.bincount(idx, weights=r * r, minlength=size),
+            "sum_bars": np.bincount(idx, weights=self.bars[ok], minlength=size),
+        }
+        out = {k: v.reshape(shape) for k, v in out.items()}
+        self._cells[key] = out
+        return out
+
+    def table(self, *dims: str, where: Optional[dict] = None) -> pd.DataFrame:
+        """Non-empty cells of dims as rows: labels, total, wins, pnl_r, sum_r2, avg_pnl, std_r, win_rate."""
+        cells = self.cells(tuple(dims), where)
+        count = cells["count"].ravel()
+        nz = np.flatnonzero(count)
+        grid = np.unravel_index(nz, cells["count"].shape)
+        out = {d: np.asarray(self.labels[d], dtype=object)[g] for d, g in zip(dims, grid)}
+        n = count[nz]
+        s = cells["sum_r"].ravel()[nz]
+        s2 = cells["sum_r2"].ravel()[nz]
+        mean = s / n
+        var = np.where(n > 1, (s2 - n * mean * mean) / np.maximum(n - 1, 1), np.nan)
+        out.update({
+            "total": n,
+            "wins": cells["wins"].ravel()[nz],
+            "pnl_r": s,
+            "sum_r2": s2,
+            "avg_pnl": mean,
+            "std_r": np.sqrt(np.maximum(var, 0.0)),
+            "avg_bars": cells["sum_bars"].ravel()[nz] / n,
+            "win_rate": cells["wins"].ravel()[nz] / n * 100,
+        })
+        return pd.DataFrame(out)
+
+    # ── Disk cache ──
+    def save(self, path: str):
+        data = {"pnl_r": self.pnl_r, "is_win": self.is_win, "bars": self.bars}
+        for d in self.codes:
+            data[f"code_{d}"] = self.codes[d]
+            data[f"label_{d}"] = np.array(self.labels[d], dtype=str)
+        np.savez_compressed(path, **data)
+
+    @classmethod
+    def load(cls, path: str) -> "AnalyticsCube":
+        with np.load(path, allow_pickle=False) as z:
+            dims = [k[5:] for k in z.files if k.startswith("code_")]
+            codes = {d: z[f"code_{d}"] for d in dims}
+            labels = {d: [str(x) for x in z[f"label_{d}"]] for d in dims}
+            return cls(codes, labels, z["pnl_r"], z["is_win"], z["bars"])
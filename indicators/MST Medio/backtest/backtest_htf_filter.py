@@ -16,7 +16,10 @@ import pandas as pd
 import numpy as np
 from typing import List
 from strategy_mst_medio import run_mst_medio, Signal, print_summary
-from backtest_partial_tp import simulate_partial_tp, load_data
+from backtest_partial_tp import simulate_partial_tp
+from market_data import load_data
+from mtf import mtf_for, bucket_ids, bucket_start
+from metrics import trade_metrics
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
 
@@ -25,22 +28,82 @@ HTF_EMA_LEN = 50
 HTF_TIMEFRAME = "H1"   # Resample M5 → H1
 
 
+# HTF indicators for align_htf(): name → f(htf_bars, length)
+HTF_INDICATORS = {
+    "ema": lambda h, n: h["Close"].ewm(span=n, adjust=False).mean(),
+    "sma": lambda h, n: h["Close"].rolling(n).mean(),
+    "close": lambda h, n: h["Close"],
+}
+
+
+# Calendar rules: weeks (any W-xxx anchor → Monday weeks as in mtf.py) and months
+_CALENDAR_TF = {"W": "W", "1W": "W", "M": "M", "1M": "M", "ME": "M", "1ME": "M", "MS": "M", "1MS": "M"}
+
+
+def pine_tf(rule: str) -> str:
+    """
+    pandas rule ("1h", "4h", "15min", "1D", "1W", "1M") → Pine timeframe string
+    ("60", "240", "15", "D", "W", "M"). Weeks / months map to calendar buckets,
+    not to a fixed number of minutes.
+    """
+    key = rule.strip().upper()
+    if key in _CALENDAR_TF:
+        return _CALENDAR_TF[key]
+    if key.startswith(("W-", "1W-")):
+        return "W"
+    secs = int(pd.to_timedelta(rule).total_seconds())
+    if secs % 86400 == 0 and secs >= 7 * 86400:
+        raise ValueError(f"multi-week / multi-month rules are not supported: {rule!r}")
+    return "D" if secs == 86400 else str(secs // 60)
+
+
+def resample_htf(df_m5: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """M5 → HTF OHLC, indexed by HTF bar open time (mtf bucket bars, cached per dataset)."""
+    return mtf_for(df_m5).bars(pine_tf(rule)).to_frame()[["Open", "High", "Low", "Close"]]
+
+
+def _epoch(times) -> np.ndarray:
+    return np.asarray(pd.DatetimeIndex(times).values.astype("datetime64[s]").astype(np.int64))
+
+
+def last_closed_htf_bar(htf_index, rule: str, times) -> np.ndarray:
+    """
+    Position in htf_index of the most recent completed HTF bar at each time
+    (bar opened at or before the start of the bucket before t's), -1 if none. One searchsorted.
+    """
+    tf = pine_tf(rule)
+    key = bucket_start(bucket_ids(_epoch(times), tf) - 1, tf)
+    return np.searchsorted(_epoch(htf_index), key, side="right") - 1
+
+
+def align_htf(df_m5: pd.DataFrame, times, specs: dict) -> pd.DataFrame:
+    """
+    As-of join of HTF indicators onto `times` (last completed HTF bar, no look-ahead).
+
+    specs: column name → (rule, indicator, length), e.g.
+           {"ema50_h1": ("1h", "ema", 50), "ema200_h4": ("4h", "ema", 200)}
+    Each timeframe is resampled once; NaN before the first completed HTF bar.
+    """
+    times = pd.DatetimeIndex(times)
+    out = {}
+    bars = {}
+    pos = {}
+    for name, (rule, indicator, length) in specs.items():
+        if rule not in bars:
+            bars[rule] = resample_htf(df_m5, rule)
+            pos[rule] = last_closed_htf_bar(bars[rule].index, rule, times)
+        values = np.asarray(HTF_INDICATORS[indicator](bars[rule], length), dtype=np.float64)
+        p = pos[rule]
+        out[name] = np.where(p >= 0, values[np.maximum(p, 0)] if len(values) else np.nan, np.nan)
+    return pd.DataFrame(out, index=times)
+
+
 def calc_htf_ema(df_m5: pd.DataFrame, ema_len: int = 50) -> pd.Series:
     """
     Resample M5 data to H1 and calculate EMA.
     Returns a Series indexed by H1 bar open time with EMA values.
     """
-    # Resample to H1 OHLC
-    df_h1 = df_m5.resample("1h").agg({
-        "Open": "first",
-        "High": "max",
-        "Low": "min",
-        "Close": "last",
-    }).dropna()
-
-    # Calculate EMA on H1 close
-    ema = df_h1["Close"].ewm(span=ema_len, adjust=False).mean()
-    return ema
+    return HTF_INDICATORS["ema"](resample_htf(df_m5, "1h"), ema_len)
 
 
 def get_htf_ema_at_time(ema_h1: pd.Series, signal_time: pd.Timestamp) -> float:
@@ -48,16 +111,25 @@ def get_htf_ema_at_time(ema_h1: pd.Series, signal_time: pd.Timestamp) -> float:
     Get the H1 EMA value at the time of a signal.
     Uses the most recent completed H1 bar (not the current forming bar).
     """
-    # Floor to H1 boundary
-    h1_time = signal_time.floor("1h")
-    # Use previous completed H1 bar (not current forming one)
-    prev_h1 = h1_time - pd.Timedelta(hours=1)
+    p = last_closed_htf_bar(ema_h1.index, "1h", [signal_time])[0]
+    return ema_h1.iloc[p] if p >= 0 else np.nan
 
-    # Find closest available EMA value <= prev_h1
-    valid = ema_h1[ema_h1.index <= prev_h1]
-    if valid.empty:
-        return np.nan
-    return valid.iloc[-1]
+
+def htf_filter_mask(signals: List[Signal], df_m5: pd.DataFrame, ema_len: int = 50,
+                    rule: str = "1h"):
+    """
+    Keep-mask for signals (BUY: close >= EMA, SELL: close <= EMA, no EMA yet → keep)
+    plus the aligned EMA and confirm-bar close arrays.
+    """
+    confirm_times = pd.DatetimeIndex([s.confirm_time for s in signals])
+    ema = align_htf(df_m5, confirm_times, {"ema": (rule, "ema", ema_len)})["ema"].to_numpy()
+    # Confirm bar close (EA: iClose(_Symbol, _Period, 1) at confirm time); entry if not in data
+    conf_idx = df_m5.index.get_indexer(confirm_times)
+    entry = np.array([s.entry for s in signals], dtype=np.float64)
+    close = np.where(conf_idx >= 0, df_m5["Close"].to_numpy()[np.maximum(conf_idx, 0)], entry)
+    buy = np.array([s.direction == "BUY" for s in signals], dtype=bool)
+    against = np.where(buy, close < ema, close > ema)     # NaN EMA → False (fail-open)
+    return ~against, ema, close
 
 
 def apply_htf_filter(signals: List[Signal], df_m5: pd.DataFrame,
@@ -66,40 +138,23 @@ def apply_htf_filter(signals: List[Signal], df_m5: pd.DataFrame,
     Filter signals using HTF EMA trend.
     BUY only when close > EMA(H1), SELL only when close < EMA(H1).
     """
-    ema_h1 = calc_htf_ema(df_m5, ema_len)
-    filtered = []
-    skipped_buy = 0
-    skipped_sell = 0
-
-    for sig in signals:
-        ema_val = get_htf_ema_at_time(ema_h1, sig.confirm_time)
-        if np.isnan(ema_val):
-            # No EMA data yet (early bars) → allow signal (fail-open)
-            filtered.append(sig)
-            continue
+    if not signals:
+        return []
+    keep, ema, close = htf_filter_mask(signals, df_m5, ema_len)
+    filtered = [s for s, k in zip(signals, keep) if k]
 
-        # Use the signal's confirm bar close (approximate: entry is the old SH/SL)
-        # In EA, we use iClose(_Symbol, _Period, 1) at confirm time
-        # Here we use the confirm bar's close from M5 data
-        confirm_close = df_m5.loc[sig.confirm_time, "Close"] if sig.confirm_time in df_m5.index else sig.entry
-
-        if sig.direction == "BUY" and confirm_close < ema_val:
-            skipped_buy += 1
-            if debug:
+    if debug:
+        skipped_buy = skipped_sell = 0
+        for i in np.flatnonzero(~keep):
+            sig = signals[i]
+            if sig.direction == "BUY":
+                skipped_buy += 1
                 print(f"  ⚠️ HTF: BUY skipped @ {sig.confirm_time} — "
-                      f"Close={confirm_close:.2f} < EMA{ema_len}={ema_val:.2f}")
-            continue
-
-        if sig.direction == "SELL" and confirm_close > ema_val:
-            skipped_sell += 1
-            if debug:
+                      f"Close={close[i]:.2f} < EMA{ema_len}={ema[i]:.2f}")
+            else:
+                skipped_sell += 1
                 print(f"  ⚠️ HTF: SELL skipped @ {sig.confirm_time} — "
-                      f"Close={confirm_close:.2f} > EMA{ema_len}={ema_val:.2f}")
-            continue
-
-        filtered.append(sig)
-
-    if debug:
+                      f"Close={close[i]:.2f} > EMA{ema_len}={ema[i]:.2f}")
         print(f"  HTF Filter: {len(signals)}→{len(filtered)} signals "
               f"(skipped {skipped_buy} BUY, {skipped_sell} SELL)")
 
@@ -108,28 +163,19 @@ def apply_htf_filter(signals: List[Signal], df_m5: pd.DataFrame,
 
 def calc_stats(signals: List[Signal]):
     """Calculate basic stats from signals."""
-    closed = [s for s in signals if s.result in ("TP", "SL", "CLOSE_REVERSE")]
-    n = len(closed)
-    if n == 0:
-        return 0, 0, 0.0, 0.0
-    wins = sum(1 for s in closed if s.pnl_r > 0)
-    wr = wins / n * 100
-    total_r = sum(s.pnl_r for s in closed)
-    return n, wins, wr, total_r
+    m = trade_metrics([s.pnl_r for s in signals if s.result in ("TP", "SL", "CLOSE_REVERSE")])
+    return m["trades"], m["wins"], m["wr"], m["pnl"]
 
 
 def calc_partial_stats(trades):
     """Calculate partial TP stats."""
-    n = len(trades)
-    if n == 0:
-        return 0, 0, 0.0, 0.0
-    pnl = sum((t.part1_pnl_r + t.part2_pnl_r) / 2 for t in trades)
-    wins = sum(1 for t in trades if (t.part1_pnl_r + t.part2_pnl_r) > 0)
-    wr = wins / n * 100
-    return n, wins, wr, pnl
+    m = trade_metrics([t.total_pnl_r for t in trades])
+    return m["trades"], m["wins"], m["wr"], m["pnl"]
 
 
 def main():
+    from gates import htf_trend_gate
+
     PAIRS = [
         ("XAUUSD",        "XAUUSD_M5.csv"),
         ("BTCUSD",        "BTCUSD_M5.csv"),
@@ -192,6 +238,16 @@ def main():
         print(f"  {'HTF Filter + Full TP':<25} {n_htf:>4} {wr_htf:>6.1f}% {pnl_htf:>+8.2f} {avg_htf:>+7.2f}")
         print(f"  {'HTF Filter + Partial TP':<25} {n_p_htf:>4} {wr_p_htf:>6.1f}% {pnl_p_htf:>+8.2f} {avg_p_htf:>+7.2f}")
 
+        # Same filter as an in-engine gate: gated bars create no signal, so a filtered
+        # setup no longer replaces / reverse-closes the active trade
+        long_ok, short_ok = htf_trend_gate(df, "1h", HTF_EMA_LEN)
+        signals_gate, _ = run_mst_medio(df, pivot_len=5, break_mult=0.25, impulse_mult=1.5,
+                                        min_rr=0, tp_mode="confirm", debug=False,
+                                        long_ok=long_ok, short_ok=short_ok)
+        n_g, w_g, wr_g, pnl_g = calc_stats(signals_gate)
+        avg_g = pnl_g / n_g if n_g > 0 else 0
+        print(f"  {'HTF Gate (engine) + Full':<25} {n_g:>4} {wr_g:>6.1f}% {pnl_g:>+8.2f} {avg_g:>+7.2f}")
+
         # Filtered signals detail
         filtered_count = len(signals_all) - len(signals_htf)
         buy_all = sum(1 for s in signals_all if s.direction == "BUY")
@@ -7,21 +7,23 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(__file__))
 
-import pandas as pd
-from dataclasses import dataclass
-from typing import List
-from strategy_mst_medio import run_mst_medio, Signal
+from strategy_mst_medio import run_mst_medio
+from backtest_partial_tp import simulate_partial_modes, to_partial_trades
+from exit_policy import ExitPolicy, Tranche
+from metrics import trade_metrics
+from market_data import load_data
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
 
-
-@dataclass
-class PartialTrade:
-    signal: Signal
-    part1_pnl_r: float = 0.0
-    part2_pnl_r: float = 0.0
-    part1_result: str = ""
-    part2_result: str = ""
+# Modes of this study (tranche 0 = Part1, tranche 1 = Part2). Unlike
+# backtest_partial_tp's Mode A, Part2 here closes on the next opposite signal
+# whether or not Part1 already took TP.
+COMPARE_MODES = {
+    "A": ExitPolicy([Tranche(0.5, tp="tp"), Tranche(0.5, exit_on_opposite=True)],
+                    be_after_tp1=True, opposite_after_tp1=False, name="A"),
+    "B": ExitPolicy([Tranche(0.5, tp="tp"), Tranche(0.5, stop_r=0.0, exit_on_opposite=True)],
+                    name="B"),
+}
 
 
 def simulate_partial(df, signals, mode="A"):
@@ -29,172 +31,8 @@ def simulate_partial(df, signals, mode="A"):
     Mode A: Part2 SL = SL gốc → move to BE after Part1 TP
     Mode B: Part2 SL = entry (BE) from start
     """
-    times = df.index.values
-    highs = df["High"].values
-    lows = df["Low"].values
-    closes = df["Close"].values
-
-    time_to_idx = {}
-    for i, t in enumerate(times):
-        time_to_idx[t] = i
-
-    trades = []
-
-    for sig_idx, sig in enumerate(signals):
-        pt = PartialTrade(signal=sig)
-
-        confirm_idx = time_to_idx.get(sig.confirm_time)
-        if confirm_idx is None:
-            pt.part1_pnl_r = sig.pnl_r
-            pt.part2_pnl_r = sig.pnl_r
-            pt.part1_result = sig.result
-            pt.part2_result = sig.result
-            trades.append(pt)
-            continue
-
-        risk = abs(sig.entry - sig.sl)
-        if risk == 0:
-            trades.append(pt)
-            continue
-
-        # Next opposite signal
-        next_opp_idx = None
-        for future_sig in signals[sig_idx + 1:]:
-            if future_sig.direction != sig.direction:
-                idx = time_to_idx.get(future_sig.confirm_time)
-                if idx is not None:
-                    next_opp_idx = idx
-                break
-
-        part1_done = False
-        part2_done = False
-
-        if mode == "A":
-            # Mode A: Part2 starts with SL gốc, changes to BE after Part1 TP
-            part2_sl = sig.sl
-        else:
-            # Mode B: Part2 starts with SL = entry (BE) from the start
-            part2_sl = sig.entry
-
-        for bar_i in range(confirm_idx + 1, len(times)):
-            bar_h = highs[bar_i]
-            bar_l = lows[bar_i]
-            bar_c = closes[bar_i]
-
-            if sig.direction == "BUY":
-                # ── Part1 ──
-                if not part1_done:
-                    if bar_l <= sig.sl:
-                        # SL hit on Part1
-                        pt.part1_pnl_r = -1.0
-                        pt.part1_result = "SL"
-                        part1_done = True
-                        if mode == "A":
-                            # Mode A: Part2 also SL (same SL)
-                            pt.part2_pnl_r = -1.0
-                            pt.part2_result = "SL"
-                            part2_done = True
-                            break
-                        # Mode B: Part2 has separate SL at entry
-                        # Check if Part2 SL (entry) is also hit
-                        if not part2_done and bar_l <= part2_sl:
-                            pt.part2_pnl_r = 0.0
-                            pt.part2_result = "BE"
-                            part2_done = True
-                            break
-                    elif sig.tp > 0 and bar_h >= sig.tp:
-                        rr = abs(sig.tp - sig.entry) / risk
-                        pt.part1_pnl_r = rr
-                        pt.part1_result = "TP"
-                        part1_done = True
-                        if mode == "A":
-                            part2_sl = sig.entry  # Move to BE
-
-                # ── Part2 (BUY) ──
-                if not part2_done:
-                    if bar_l <= part2_sl:
-                        if part2_sl >= sig.entry:
-                            pt.part2_pnl_r = 0.0
-                            pt.part2_result = "BE"
-                        else:
-                            pt.part2_pnl_r = (part2_sl - sig.entry) / risk
-                            pt.part2_result = "SL"
-                        part2_done = True
-                        if part1_done:
-                            break
-                    elif next_opp_idx is not None and bar_i >= next_opp_idx:
-                        pt.part2_pnl_r = (bar_c - sig.entry) / risk
-                        pt.part2_result = "OPP"
-                        part2_done = True
-                        if part1_done:
-                            break
-
-            else:  # SELL
-                # ── Part1 ──
-                if not part1_done:
-                    if bar_h >= sig.sl:
-                        pt.part1_pnl_r = -1.0
-                        pt.part1_result = "SL"
-                        part1_done = True
-                        if mode == "A":
-                            pt.part2_pnl_r = -1.0
-                            pt.part2_result = "SL"
-                            part2_done = True
-                            break
-                        if not part2_done and bar_h >= part2_sl:
-                            pt.part2_pnl_r = 0.0
-                            pt.part2_result = "BE"
-                            part2_done = True
-                            break
-                    elif sig.tp > 0 and bar_l <= sig.tp:
-                        rr = abs(sig.entry - sig.tp) / risk
-                        pt.part1_pnl_r = rr
-                        pt.part1_result = "TP"
-                        part1_done = True
-                        if mode == "A":
-                            part2_sl = sig.entry
-
-                # ── Part2 (SELL) ──
-                if not part2_done:
-                    if bar_h >= part2_sl:
-                        if part2_sl <= sig.entry:
-                            pt.part2_pnl_r = 0.0
-                            pt.part2_result = "BE"
-                        else:
-                            pt.part2_pnl_r = (sig.entry - part2_sl) / risk
-                            pt.part2_result = "SL"
-                        part2_done = True
-                        if part1_done:
-                            break
-                    elif next_opp_idx is not None and bar_i >= next_opp_idx:
-                        pt.part2_pnl_r = (sig.entry - bar_c) / risk
-                        pt.part2_result = "OPP"
-                        part2_done = True
-                        if part1_done:
-                            break
-
-            if part1_done and part2_done:
-                break
-
-        # Handle unclosed at end
-        if not part1_done:
-            last_c = closes[-1]
-            if sig.direction == "BUY":
-                pt.part1_pnl_r = (last_c - sig.entry) / risk
-            else:
-                pt.part1_pnl_r = (sig.entry - last_c) / risk
-            pt.part1_result = "OPEN"
-        if not part2_done:
-            last_c = closes[-1]
-            if sig.direction == "BUY":
-                pt.part2_pnl_r = (last_c - sig.entry) / risk
-            else:
-                pt.part2_pnl_r = (sig.entry - last_c) / risk
-            pt.part2_result = "OPEN"
-
-        trades.append(pt)
-
-    return trades
+    setups, results = simulate_partial_modes(df, signals, modes=(mode,), policies=COMPARE_MODES)
+    return to_partial_trades(signals, setups, results[mode])
 
 
 def calc_stats(trades, label):
@@ -202,9 +40,8 @@ def calc_stats(trades, label):
     if n == 0:
         return None
 
-    pnl = sum((t.part1_pnl_r + t.part2_pnl_r) / 2 for t in trades)
-    wins = sum(1 for t in trades if (t.part1_pnl_r + t.part2_pnl_r) > 0)
-    wr = wins / n * 100
+    m = trade_metrics([t.total_pnl_r for t in trades])
+    pnl, wins, wr = m["pnl"], m["wins"], m["wr"]
 
     p2_be = sum(1 for t in trades if t.part2_result == "BE")
     p2_sl = sum(1 for t in trades if t.part2_result == "SL")
@@ -217,20 +54,6 @@ def calc_stats(trades, label):
     }
 
 
-def load_data(path):
-    df = pd.read_csv(path, parse_dates=["datetime"])
-    df.set_index("datetime", inplace=True)
-    df.sort_index(inplace=True)
-    for cu, cl in [("Open","open"),("High","high"),("Low","low"),("Close","close"),("Volume","volume")]:
-        if cu in df.columns and cl in df.columns:
-            df[cu] = df[cu].fillna(df[cl])
-            df.drop(columns=[cl], inplace=True, errors="ignore")
-    df.drop(columns=["symbol"], inplace=True, errors="ignore")
-    df.dropna(subset=["Open","High","Low","Close"], inplace=True)
-    df = df[df.index.dayofweek < 5]
-    return df
-
-
 def main():
     PAIRS = [
         ("XAUUSD",        "XAUUSD_M5.csv"),
@@ -263,8 +86,9 @@ def main():
             print(f"\n  {symbol}: No signals")
             continue
 
-        trades_a = simulate_partial(df, signals, mode="A")
-        trades_b = simulate_partial(df, signals, mode="B")
+        setups, res = simulate_partial_modes(df, signals, modes=("A", "B"), policies=COMPARE_MODES)
+        trades_a = to_partial_trades(signals, setups, res["A"])
+        trades_b = to_partial_trades(signals, setups, res["B"])
 
         sa = calc_stats(trades_a, f"{symbol} Mode A")
         sb = calc_stats(trades_b, f"{symbol} Mode B")
@@ -7,10 +7,16 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(__file__))
 
+import numpy as np
 import pandas as pd
 from dataclasses import dataclass
-from typing import List, Optional
-from strategy_mst_medio import run_mst_medio, Signal
+from typing import Dict, List, Tuple
+from strategy_mst_medio import run_mst_medio, Signal, signals_to_arrays
+from fast_exits import BarIndex
+from market_data import load_data
+from trade_paths import build_trade_paths
+from exit_policy import (ExitPolicy, Tranche, PolicyResult, simulate_exits,
+                         next_opposite_index)
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
 
@@ -23,6 +29,78 @@ class PartialTrade:
     part1_result: str = ""    # TP, SL
     part2_result: str = ""    # TP_OPP (next opposite), SL, BE, OPEN
 
+    @property
+    def total_pnl_r(self) -> float:
+        """Blended PnL of the two 50% parts (R of the full position)."""
+        return (self.part1_pnl_r + self.part2_pnl_r) / 2
+
+
+# Partial-TP modes as exit policies (tranche 0 = Part1, tranche 1 = Part2)
+PARTIAL_MODES = {
+    # A: Part2 keeps the original SL → BE after TP1, closes on the next opposite signal after TP1
+    "A": ExitPolicy([Tranche(0.5, tp="tp"), Tranche(0.5, exit_on_opposite=True)],
+                    be_after_tp1=True, opposite_after_tp1=True, name="A"),
+    # B: Part2 SL = entry from the start, closes on the next opposite signal any time
+    "B": ExitPolicy([Tranche(0.5, tp="tp"), Tranche(0.5, stop_r=0.0, exit_on_opposite=True)],
+                    name="B"),
+    # FULL: whole position at TP / SL (same entry bar as the partial modes)
+    "FULL": ExitPolicy([Tranche(1.0, tp="tp")], name="FULL"),
+}
+
+
+def partial_setups(df: pd.DataFrame, signals: List[Signal]) -> dict:
+    """
+    Setup arrays for the partial-TP modes, one row per signal:
+    start = confirm bar + 1, opp_bar = confirm bar of the next opposite signal (n = none),
+    valid = confirm bar found and risk > 0.
+    """
+    n = len(df)
+    a = signals_to_arrays(signals)
+    conf_idx = df.index.get_indexer(pd.DatetimeIndex([s.confirm_time for s in signals]))
+    a["sl"] = np.array([s.sl for s in signals], dtype=np.float64)
+    a["start"] = conf_idx + 1
+    a["risk"] = np.abs(a["entry"] - a["sl"])
+    nxt = next_opposite_index(a["direction"])
+    opp = np.where(nxt >= 0, conf_idx[np.maximum(nxt, 0)], -1)
+    a["opp_bar"] = np.where(opp >= 0, opp, n)
+    a["conf_idx"] = conf_idx
+    a["valid"] = (conf_idx >= 0) & (a["risk"] > 0)
+    return a
+
+
+def simulate_partial_modes(df: pd.DataFrame, signals: List[Signal], modes=("A", "B", "FULL"),
+                           policies: Dict[str, ExitPolicy] = None) -> Tuple[dict, Dict[str, PolicyResult]]:
+    """
+    Evaluate several partial-TP modes in one pass over shared trade paths.
+    policies: mode name → ExitPolicy (default PARTIAL_MODES).
+    Returns (setups, {mode: PolicyResult}); results cover the valid setups only
+    (setups[k][setups["valid"]]).
+    """
+    policies = PARTIAL_MODES if policies is None else policies
+    a = partial_setups(df, signals)
+    ok = a["valid"]
+    setups = {k: v[ok] for k, v in a.items()}
+    index = BarIndex.from_df(df)
+    paths = build_trade_paths(index, setups["start"], setups["direction"],
+                              setups["entry"], setups["sl"])
+    results = {m: simulate_exits(index, setups, policies[m], paths=paths) for m in modes}
+    return a, results
+
+
+def to_partial_trades(signals: List[Signal], setups: dict, res: PolicyResult) -> List[PartialTrade]:
+    """PolicyResult of a 2-tranche mode → PartialTrade list (one per signal)."""
+    trades = [PartialTrade(signal=sig) for sig in signals]
+    for i in np.flatnonzero(setups["conf_idx"] < 0):
+        pt = trades[i]
+        pt.part1_pnl_r = pt.part2_pnl_r = pt.signal.pnl_r
+        pt.part1_result = pt.part2_result = pt.signal.result
+    names1, names2 = res.outcome_names(0), res.outcome_names(1)
+    for j, i in enumerate(np.flatnonzero(setups["valid"])):
+        pt = trades[i]
+        pt.part1_pnl_r, pt.part1_result = float(res.pnl_r[0, j]), names1[j]
+        pt.part2_pnl_r, pt.part2_result = float(res.pnl_r[1, j]), names2[j]
+    return trades
+
 
 def simulate_partial_tp(df: pd.DataFrame, signals: List[Signal]) -> List[PartialTrade]:
     """
@@ -32,140 +110,8 @@ def simulate_partial_tp(df: pd.DataFrame, signals: List[Signal]) -> List[Partial
       - If SL hit before TP1 → both parts = -1R
       - If Part2 SL (breakeven) hit → Part2 = 0R
     """
-    times = df.index.values
-    highs = df["High"].values
-    lows = df["Low"].values
-    closes = df["Close"].values
-
-    time_to_idx = {}
-    for i, t in enumerate(times):
-        time_to_idx[t] = i
-
-    trades: List[PartialTrade] = []
-
-    for sig_idx, sig in enumerate(signals):
-        pt = PartialTrade(signal=sig)
-
-        confirm_idx = time_to_idx.get(sig.confirm_time)
-        if confirm_idx is None:
-            pt.part1_pnl_r = sig.pnl_r
-            pt.part2_pnl_r = sig.pnl_r
-            pt.part1_result = sig.result
-            pt.part2_result = sig.result
-            trades.append(pt)
-            continue
-
-        risk = abs(sig.entry - sig.sl)
-        if risk == 0:
-            trades.append(pt)
-            continue
-
-        # Find next opposite signal confirm time
-        next_opp_confirm_idx = None
-        for future_sig in signals[sig_idx + 1:]:
-            if future_sig.direction != sig.direction:
-                idx = time_to_idx.get(future_sig.confirm_time)
-                if idx is not None:
-                    next_opp_confirm_idx = idx
-                break
-
-        part1_done = False
-        part2_done = False
-        part2_sl = sig.sl  # Initially same as original SL
-
-        for bar_i in range(confirm_idx + 1, len(times)):
-            bar_h = highs[bar_i]
-            bar_l = lows[bar_i]
-            bar_c = closes[bar_i]
-
-            # ── Part1: TP/SL check ──
-            if not part1_done:
-                if sig.direction == "BUY":
-                    if bar_l <= sig.sl:
-                        # SL hit → both parts lose
-                        pt.part1_pnl_r = -1.0
-                        pt.part1_result = "SL"
-                        pt.part2_pnl_r = -1.0
-                        pt.part2_result = "SL"
-                        part1_done = part2_done = True
-                        break
-                    if sig.tp > 0 and bar_h >= sig.tp:
-                        rr = abs(sig.tp - sig.entry) / risk
-                        pt.part1_pnl_r = rr
-                        pt.part1_result = "TP"
-                        part1_done = True
-                        part2_sl = sig.entry  # Move SL to breakeven
-                else:  # SELL
-                    if bar_h >= sig.sl:
-                        pt.part1_pnl_r = -1.0
-                        pt.part1_result = "SL"
-                        pt.part2_pnl_r = -1.0
-                        pt.part2_result = "SL"
-                        part1_done = part2_done = True
-                        break
-                    if sig.tp > 0 and bar_l <= sig.tp:
-                        rr = abs(sig.entry - sig.tp) / risk
-                        pt.part1_pnl_r = rr
-                        pt.part1_result = "TP"
-                        part1_done = True
-                        part2_sl = sig.entry
-
-            # ── Part2: SL or next opposite signal ──
-            if part1_done and not part2_done:
-                # Check Part2 SL (breakeven)
-                if sig.direction == "BUY":
-                    if bar_l <= part2_sl:
-                        if part2_sl >= sig.entry:
-                            pt.part2_pnl_r = 0.0
-                            pt.part2_result = "BE"
-                        else:
-                            pt.part2_pnl_r = (part2_sl - sig.entry) / risk
-                            pt.part2_result = "SL"
-                        part2_done = True
-                        break
-                else:
-                    if bar_h >= part2_sl:
-                        if part2_sl <= sig.entry:
-                            pt.part2_pnl_r = 0.0
-                            pt.part2_result = "BE"
-                        else:
-                            pt.part2_pnl_r = (sig.entry - part2_sl) / risk
-                            pt.part2_result = "SL"
-                        part2_done = True
-                        break
-
-                # Check if next opposite signal fires
-                if next_opp_confirm_idx is not None and bar_i >= next_opp_confirm_idx:
-                    if sig.direction == "BUY":
-                        pt.part2_pnl_r = (bar_c - sig.entry) / risk
-                    else:
-                        pt.part2_pnl_r = (sig.entry - bar_c) / risk
-                    pt.part2_result = "OPP"
-                    part2_done = True
-                    break
-
-        # Handle unclosed parts at end of data
-        if not part1_done:
-            last_c = closes[-1]
-            if sig.direction == "BUY":
-                pt.part1_pnl_r = (last_c - sig.entry) / risk
-            else:
-                pt.part1_pnl_r = (sig.entry - last_c) / risk
-            pt.part1_result = "OPEN"
-            pt.part2_pnl_r = pt.part1_pnl_r
-            pt.part2_result = "OPEN"
-
-        if not part2_done and part1_done:
-            last_c = closes[-1]
-            if sig.direction == "BUY":
-                pt.part2_pnl_r = (last_c - sig.entry) / risk
-            else:
-                pt.part2_pnl_r = (sig.entry - last_c) / risk
-            pt.part2_result = "OPEN"
-
-        trades.append(pt)
-
-    return trades
+    setups, results = simulate_partial_modes(df, signals, modes=("A",))
+    return to_partial_trades(signals, setups, results["A"])
 
 
 def print_results(trades: List[PartialTrade], label: str):
@@ -212,20 +158,6 @@ def print_results(trades: List[PartialTrade], label: str):
               f"Part1={t.part1_pnl_r:+.2f}R Part2={t.part2_pnl_r:+.2f}R ({t.part2_result})")
 
 
-def load_data(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path, parse_dates=["datetime"])
-    df.set_index("datetime", inplace=True)
-    df.sort_index(inplace=True)
-    for cu, cl in [("Open","open"),("High","high"),("Low","low"),("Close","close"),("Volume","volume")]:
-        if cu in df.columns and cl in df.columns:
-            df[cu] = df[cu].fillna(df[cl])
-            df.drop(columns=[cl], inplace=True, errors="ignore")
-    df.drop(columns=["symbol"], inplace=True, errors="ignore")
-    df.dropna(subset=["Open","High","Low","Close"], inplace=True)
-    df = df[df.index.dayofweek < 5]
-    return df
-
-
 def main():
     PAIRS = [
         ("XAUUSD",        "XAUUSD_M5.csv"),
@@ -17,7 +17,9 @@ sys.path.insert(0, os.path.dirname(__file__))
 import pandas as pd
 import numpy as np
 from strategy_mst_medio import run_mst_medio, Signal
-from backtest_partial_tp import simulate_partial_tp, PartialResult, load_data
+from backtest_partial_tp import simulate_partial_tp
+from market_data import load_data
+from metrics import trade_metrics
 from typing import List, Dict
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
@@ -30,38 +32,27 @@ PAIRS = [
 ]
 
 
-def run_baseline(signals: List[Signal]) -> Dict:
-    """Standard: 100% at TP1 = Confirm Break H/L."""
-    closed = [s for s in signals if s.result in ("TP", "SL", "CLOSE_REVERSE")]
-    total = len(closed)
-    if total == 0:
+def _summary(pnls: List[float]) -> Dict:
+    if not pnls:
         return {"trades": 0, "wins": 0, "wr": 0, "pnl": 0, "avg": 0}
-    wins = sum(1 for s in closed if s.pnl_r > 0)
-    pnl = sum(s.pnl_r for s in closed)
+    m = trade_metrics(pnls)
     return {
-        "trades": total,
-        "wins": wins,
-        "wr": round(wins / total * 100, 1),
-        "pnl": round(pnl, 2),
-        "avg": round(pnl / total, 2),
+        "trades": m["trades"],
+        "wins": m["wins"],
+        "wr": round(m["wr"], 1),
+        "pnl": round(m["pnl"], 2),
+        "avg": round(m["avg_trade"], 2),
     }
 
 
+def run_baseline(signals: List[Signal]) -> Dict:
+    """Standard: 100% at TP1 = Confirm Break H/L."""
+    return _summary([s.pnl_r for s in signals if s.result in ("TP", "SL", "CLOSE_REVERSE")])
+
+
 def run_partial(signals: List[Signal], df: pd.DataFrame) -> Dict:
     """Partial TP: 50% at TP1, 50% with BE stop."""
-    results = simulate_partial_tp(signals, df)
-    total = len(results)
-    if total == 0:
-        return {"trades": 0, "wins": 0, "wr": 0, "pnl": 0, "avg": 0}
-    wins = sum(1 for r in results if r.total_pnl_r > 0)
-    pnl = sum(r.total_pnl_r for r in results)
-    return {
-        "trades": total,
-        "wins": wins,
-        "wr": round(wins / total * 100, 1),
-        "pnl": round(pnl, 2),
-        "avg": round(pnl / total, 2),
-    }
+    return _summary([r.total_pnl_r for r in simulate_partial_tp(df, signals)])
 
 
 def main():
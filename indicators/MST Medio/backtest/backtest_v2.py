@@ -5,33 +5,42 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(__file__))
 
+import numpy as np
 import pandas as pd
-from strategy_mst_medio import run_mst_medio, signals_to_dataframe, print_summary
+from strategy_mst_medio import run_mst_medio, signals_to_dataframe, print_summary, signals_to_arrays
+from fast_exits import BarIndex, fill_bars, mfe_before_stop
+from intrabar import IntrabarResolver
+from market_data import load_data
 
 DATA_M5 = os.path.join(os.path.dirname(__file__), "..", "data", "XAUUSD_M5.csv")
 DATA_M15 = os.path.join(os.path.dirname(__file__), "..", "data", "XAUUSD_M15.csv")
+DATA_M1 = os.path.join(os.path.dirname(__file__), "..", "data", "XAUUSD_M1.csv")   # optional (intrabar)
 
-def load_data(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path, parse_dates=["datetime"])
-    df.set_index("datetime", inplace=True)
-    df.sort_index(inplace=True)
-    
-    # Merge uppercase and lowercase columns (from CSV merge artifact)
-    # Old data uses Open/High/Low/Close, new data uses open/high/low/close
-    for col_upper, col_lower in [("Open", "open"), ("High", "high"), ("Low", "low"), ("Close", "close"), ("Volume", "volume")]:
-        if col_upper in df.columns and col_lower in df.columns:
-            df[col_upper] = df[col_upper].fillna(df[col_lower])
-            df.drop(columns=[col_lower], inplace=True, errors="ignore")
-    
-    # Drop symbol column
-    df.drop(columns=["symbol"], inplace=True, errors="ignore")
-    
-    # Drop rows that are still NaN
-    df.dropna(subset=["Open", "High", "Low", "Close"], inplace=True)
-    
-    # Remove weekends
-    df = df[df.index.dayofweek < 5]
-    return df
+def print_rr_curve(df: pd.DataFrame, signals, label: str, rr_grid=None):
+    """
+    Expectancy vs R:R from one MFE-before-stop table (each setup taken independently:
+    limit fill at entry, original SL, fixed TP — no reverse close / unfilled cancel).
+    """
+    if rr_grid is None:
+        rr_grid = np.arange(0.5, 5.01, 0.25)
+    arr = signals_to_arrays(signals)
+    ok = arr["risk"] > 0
+    if not ok.any():
+        return
+    index = BarIndex.from_df(df)
+    fill = fill_bars(index, arr["start"][ok], arr["direction"][ok], arr["entry"][ok])
+    filled = fill < index.n
+    table = mfe_before_stop(index, fill[filled], arr["direction"][ok][filled],
+                            arr["entry"][ok][filled], arr["sl"][ok][filled])
+    curve = table.expectancy_curve(rr_grid)
+
+    print(f"\n{'='*60}")
+    print(f"  {label}: Expectancy vs R:R ({int(filled.sum())} filled setups, independent)")
+    print(f"{'='*60}")
+    print(f"{'R:R':>6} {'Win':>5} {'Loss':>5} {'Open':>5} {'WR%':>7} {'Total R':>9} {'Exp R':>8}")
+    for row in curve.itertuples(index=False):
+        print(f"{row.rr:>6.2f} {row.wins:>5} {row.losses:>5} {row.open:>5} "
+              f"{row.wr:>6.1f}% {row.total_r:>+9.2f} {row.expectancy:>+8.3f}")
 
 def main():
     for label, path in [("M5", DATA_M5), ("M15", DATA_M15)]:
@@ -57,6 +66,23 @@ def main():
         )
         print_summary(signals, title=f"{label}: MST Medio v2.0 — TP = Confirm Peak")
 
+        # ── Same run, ambiguous SL/TP bars ordered from M1 (only if M1 data exists) ──
+        intrabar = IntrabarResolver.for_df(df, DATA_M1)
+        if intrabar is not None:
+            print(f"\n▶ {label}: TP = Confirm Peak, M1 intrabar resolution")
+            signals_ib, _ = run_mst_medio(
+                df,
+                pivot_len=5,
+                break_mult=0.25,
+                impulse_mult=1.5,
+                tp_mode="confirm",
+                min_rr=0.0,
+                intrabar=intrabar,
+                debug=False,
+            )
+            print_summary(signals_ib, title=f"{label}: TP = Confirm Peak, M1 intrabar "
+                                            f"({intrabar.calls} ambiguous bars)")
+
         # ── With min R:R filter ──
         print(f"\n▶ {label}: TP = Confirm Peak, Min R:R ≥ 1.0")
         signals_rr, _ = run_mst_medio(
@@ -70,7 +96,10 @@ def main():
         )
         print_summary(signals_rr, title=f"{label}: TP = Confirm Peak, Min R:R ≥ 1.0")
 
-        # ── Fixed R:R comparison ──
+        # ── Expectancy vs R:R (vectorized, any resolution) ──
+        print_rr_curve(df, signals, label)
+
+        # ── Fixed R:R comparison (engine: includes reverse close / unfilled cancel) ──
         for rr in [1.5, 2.0, 3.0]:
             signals_fix, _ = run_mst_medio(
                 df,
@@ -0,0 +1,222 @@
+"""
+costs.py — Transaction costs as a vectorized post-pass
+
+The engines resolve trades on raw chart prices (no spread / commission / slippage).
+Instead of re-running detection per cost assumption, costs are applied to the
+resolved trade arrays for a whole grid of scenarios at once:
+
+    cost (price units) = spread                      (round turn, once per trade)
+                       + slippage × market sides     (SL / reverse close / time exits; limits = 0)
+                       + commission                  (per lot round turn in account ccy → price,
+                                                      or % of notional per side)
+    net R   = gross R - cost / risk
+    net ccy = net R × risk_amount                    (fixed risk per trade)
+
+Results are (scenarios × trades) matrices; summary() gives one row per scenario.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from market_data import load_data
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+# Engine results that exit at market (not the TP limit)
+MARKET_EXITS = ("SL", "CLOSE_REVERSE")
+
+
+@dataclass
+class CostModel:
+    """
+    Per-symbol contract spec + cost ranges for stress tests (price units / account ccy).
+
+    contract_size:    units per lot (XAUUSD 100 oz, EURUSD 100 000, BTC 1)
+    commission_mode:  "per_lot" (account ccy per lot, round turn) | "pct" (% of notional per side)
+    account_in_base:  quote ccy ≠ account ccy and account = base (USDJPY) → convert at entry
+    """
+    symbol: str
+    contract_size: float
+    spreads: Sequence[float]
+    slippages: Sequence[float] = (0.0,)
+    commissions: Sequence[float] = (0.0,)
+    commission_mode: str = "per_lot"
+    account_in_base: bool = False
+
+
+COST_MODELS = {
+    "XAUUSD": CostModel("XAUUSD", 100, spreads=(0.10, 0.20, 0.35, 0.50),
+                        slippages=(0.0, 0.05, 0.15), commissions=(0.0, 7.0)),
+    "EURUSD": CostModel("EURUSD", 100_000, spreads=(0.00002, 0.00006, 0.00010, 0.00015),
+                        slippages=(0.0, 0.00002, 0.00005), commissions=(0.0, 7.0)),
+    "USDJPY": CostModel("USDJPY", 100_000, spreads=(0.003, 0.008, 0.015, 0.025),
+                        slippages=(0.0, 0.003, 0.008), commissions=(0.0, 7.0),
+                        account_in_base=True),
+    "BTCUSD": CostModel("BTCUSD", 1, spreads=(2.0, 10.0, 25.0, 50.0),
+                        slippages=(0.0, 5.0, 15.0), commissions=(0.0, 0.02, 0.05),
+                        commission_mode="pct"),
+}
+
+
+@dataclass
+class CostScenarios:
+    """One entry per scenario (parallel arrays)."""
+    spread: np.ndarray
+    slippage: np.ndarray
+    commission: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.spread)
+
+
+def cost_grid(spreads, slippages=(0.0,), commissions=(0.0,)) -> CostScenarios:
+    """Cartesian product of the cost ranges."""
+    s, sl, c = np.meshgrid(np.asarray(spreads, dtype=np.float64),
+                           np.asarray(slippages, dtype=np.float64),
+                           np.asarray(commissions, dtype=np.float64), indexing="ij")
+    return CostScenarios(spread=s.ravel(), slippage=sl.ravel(), commission=c.ravel())
+
+
+@dataclass
+class CostResult:
+    """Rows = scenarios, columns = trades."""
+    scenarios: CostScenarios
+    gross_r: np.ndarray       # (T,)
+    cost_r: np.ndarray        # (S, T)
+    net_r: np.ndarray         # (S, T)
+    net_ccy: np.ndarray       # (S, T)
+    risk_amount: float
+
+    def summary(self) -> pd.DataFrame:
+        n = self.net_r.shape[1]
+        wins = (self.net_r > 0).sum(axis=1)
+        net = self.net_r.sum(axis=1)
+        return pd.DataFrame({
+            "spread": self.scenarios.spread,
+            "slippage": self.scenarios.slippage,
+            "commission": self.scenarios.commission,
+            "trades": n,
+            "wins": wins,
+            "wr": wins / n * 100 if n > 0 else 0.0,
+            "gross_r": float(self.gross_r.sum()),
+            "cost_r": self.cost_r.sum(axis=1),
+            "net_r": net,
+            "exp_r": net / n if n > 0 else 0.0,
+            "net_ccy": self.net_ccy.sum(axis=1),
+        })
+
+    def breakeven_cost_r(self) -> float:
+        """Average cost per trade (R) that would bring the gross result to zero."""
+        n = len(self.gross_r)
+        return float(self.gross_r.sum() / n) if n > 0 else 0.0
+
+
+def apply_costs(trades: dict, model: CostModel, scenarios: Optional[CostScenarios] = None,
+                risk_amount: float = 100.0) -> CostResult:
+    """
+    Net PnL of every trade under every scenario (default: the model's full grid).
+
+    trades: entry, risk, pnl_r and optional market_sides (0 = limit in and TP limit out,
+            1 = limit in, market out) or engine `result` to derive them from
+            (strategy_mst_medio.trades_from_signals) — any resolved trade arrays work,
+            e.g. from the vectorized exit evaluators.
+    """
+    if scenarios is None:
+        scenarios = cost_grid(model.spreads, model.slippages, model.commissions)
+    entry = np.asarray(trades["entry"], dtype=np.float64)
+    risk = np.asarray(trades["risk"], dtype=np.float64)
+    gross = np.asarray(trades["pnl_r"], dtype=np.float64)
+    if "market_sides" in trades:
+        sides = np.asarray(trades["market_sides"], dtype=np.float64)
+    elif "result" in trades:
+        sides = np.isin(trades["result"], MARKET_EXITS).astype(np.float64)
+    else:
+        sides = np.ones(len(entry))
+
+    spread = scenarios.spread[:, None]
+    slip = scenarios.slippage[:, None]
+    comm = scenarios.commission[:, None]
+    if model.commission_mode == "pct":
+        comm_px = comm / 100.0 * 2.0 * entry[None, :]
+    else:
+        # per lot in account ccy → per unit → quote ccy
+        comm_px = comm / model.contract_size
+        if model.account_in_base:
+            comm_px = comm_px * entry[None, :]
+    cost_px = spread + slip * sides[None, :] + comm_px
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cost_r = np.where(risk > 0, cost_px / risk, 0.0)
+    net_r = gross[None, :] - cost_r
+    return CostResult(scenarios=scenarios, gross_r=gross, cost_r=cost_r, net_r=net_r,
+                      net_ccy=net_r * risk_amount, risk_amount=risk_amount)
+
+
+def print_cost_stress(symbol: str, result: CostResult, top: int = 0):
+    """Scenario table, best → worst net R (top = 0: all rows)."""
+    table = result.summary().sort_values("net_r", ascending=False)
+    if top:
+        table = table.head(top)
+    n = len(result.gross_r)
+    print(f"\n{'─' * 80}")
+    print(f"  {symbol} — {n} trades | Gross={result.gross_r.sum():+.2f}R "
+          f"| Break-even cost ≈ {result.breakeven_cost_r():.3f}R/trade")
+    print(f"{'─' * 80}")
+    print(f"{'Spread':>10} {'Slip':>9} {'Comm':>6} {'WR%':>6} {'Cost R':>8} {'Net R':>8} "
+          f"{'Exp R':>7} {'Net $':>10}")
+    for row in table.itertuples(index=False):
+        print(f"{row.spread:>10.5g} {row.slippage:>9.5g} {row.commission:>6.3g} {row.wr:>5.1f}% "
+              f"{row.cost_r:>8.2f} {row.net_r:>+8.2f} {row.exp_r:>+7.3f} {row.net_ccy:>+10.2f}")
+
+
+def main():
+    from strategy_mst_medio import run_mst_medio, trades_from_signals
+
+    PAIRS = [
+        ("XAUUSD", "XAUUSD_M5.csv"),
+        ("EURUSD", "EURUSD_M5.csv"),
+        ("USDJPY", "USDJPY_M5.csv"),
+        ("BTCUSD", "BTCUSD_M5.csv"),
+    ]
+
+    print("=" * 80)
+    print("MST Medio v2.0 — Transaction cost stress test (TP = Confirm Peak, $100 risk/trade)")
+    print("=" * 80)
+
+    rows = []
+    for symbol, filename in PAIRS:
+        filepath = os.path.join(DATA_DIR, filename)
+        if not os.path.exists(filepath):
+            print(f"\n⚠️ {symbol}: No data file ({filename})")
+            continue
+        df = load_data(filepath)
+        signals, _ = run_mst_medio(df, pivot_len=5, break_mult=0.25, impulse_mult=1.5,
+                                   min_rr=0, tp_mode="confirm", debug=False)
+        trades = trades_from_signals(signals)
+        if len(trades["entry"]) == 0:
+            print(f"\n{symbol}: No closed trades")
+            continue
+        result = apply_costs(trades, COST_MODELS[symbol])
+        print_cost_stress(symbol, result)
+        s = result.summary()
+        rows.append((symbol, len(trades["entry"]), result.gross_r.sum(),
+                     s["net_r"].max(), s["net_r"].median(), s["net_r"].min()))
+
+    print(f"\n\n{'=' * 80}")
+    print("SUMMARY (net R across the cost grid)")
+    print(f"{'=' * 80}")
+    print(f"{'Symbol':<10} {'N':>5} {'Gross':>9} {'Best':>9} {'Median':>9} {'Worst':>9}")
+    print("-" * 55)
+    for sym, n, gross, best, med, worst in rows:
+        print(f"{sym:<10} {n:>5} {gross:>+9.2f} {best:>+9.2f} {med:>+9.2f} {worst:>+9.2f}")
+
+
+if __name__ == "__main__":
+    main()
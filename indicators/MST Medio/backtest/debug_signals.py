@@ -1,21 +1,11 @@
 """Print detailed XAUUSD M5 signal list for visual verification."""
 import sys, os
 sys.path.insert(0, os.path.dirname(__file__))
-import pandas as pd
 from strategy_mst_medio import run_mst_medio
+from market_data import load_data
 
 # Load XAUUSD M5
-df = pd.read_csv(os.path.join(os.path.dirname(__file__), "..", "data", "BTCUSD_M5.csv"),
-                 parse_dates=["datetime"])
-df.set_index("datetime", inplace=True)
-df.sort_index(inplace=True)
-for cu, cl in [("Open","open"),("High","high"),("Low","low"),("Close","close"),("Volume","volume")]:
-    if cu in df.columns and cl in df.columns:
-        df[cu] = df[cu].fillna(df[cl])
-        df.drop(columns=[cl], inplace=True, errors="ignore")
-df.drop(columns=["symbol"], inplace=True, errors="ignore")
-df.dropna(subset=["Open","High","Low","Close"], inplace=True)
-df = df[df.index.dayofweek < 5]
+df = load_data(os.path.join(os.path.dirname(__file__), "..", "data", "BTCUSD_M5.csv"))
 
 signals, swings = run_mst_medio(df, pivot_len=5, break_mult=0.25, impulse_mult=1.5,
                                  min_rr=0, sl_buffer_pct=0, tp_mode="confirm", debug=False)
@@ -0,0 +1,263 @@
+"""
+equity.py — Account equity under fixed-fractional risk, many risk levels at once
+
+Turns a trade array (entry time, exit time, PnL in R) into compounding equity
+curves for a whole grid of risk-per-trade values:
+
+- stake = risk × equity at entry (realized equity — open trades are not marked)
+- max_open_risk caps the sum of open stakes (fraction of equity); a trade that
+  would exceed it is skipped
+- CAGR over first entry → last exit, max drawdown on the closed-trade curve
+
+The risk grid is the vectorized axis: sequential trades (engine output) are one
+cumprod over a (risks × trades) matrix; overlapping trades (independent setups)
+or a cap need one pass over entry/exit events, each step an op on all risks.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from market_data import load_data
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+RISK_GRID = np.array([0.0025, 0.005, 0.0075, 0.01, 0.015, 0.02, 0.025, 0.03])
+
+
+@dataclass
+class EquityResult:
+    """Rows = risk levels, columns = trades in exit order."""
+    risk: np.ndarray
+    exit_time: np.ndarray
+    equity: np.ndarray        # equity after each exit
+    taken: np.ndarray         # trade taken (False = skipped by the open-risk cap)
+    initial: float
+    years: float
+
+    @property
+    def final(self) -> np.ndarray:
+        return self.equity[:, -1] if self.equity.shape[1] else np.full(len(self.risk), self.initial)
+
+    @property
+    def cagr(self) -> np.ndarray:
+        if self.years <= 0:
+            return np.zeros(len(self.risk))
+        growth = np.maximum(self.final / self.initial, 0.0)
+        return growth ** (1.0 / self.years) - 1.0
+
+    @property
+    def drawdown(self) -> np.ndarray:
+        """Drawdown (fraction of the running peak) after each exit."""
+        curve = np.column_stack([np.full(len(self.risk), self.initial), self.equity])
+        peak = np.maximum.accumulate(curve, axis=1)
+        return (1.0 - curve / peak)[:, 1:]
+
+    @property
+    def max_drawdown(self) -> np.ndarray:
+        dd = self.drawdown
+        return dd.max(axis=1) if dd.shape[1] else np.zeros(len(self.risk))
+
+    def summary(self) -> pd.DataFrame:
+        cagr = self.cagr
+        max_dd = self.max_drawdown
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mar = np.where(max_dd > 0, cagr / max_dd, np.inf)
+        return pd.DataFrame({
+            "risk_pct": self.risk * 100,
+            "trades": self.equity.shape[1],
+            "taken": self.taken.sum(axis=1),
+            "final": self.final,
+            "return_pct": (self.final / self.initial - 1.0) * 100,
+            "cagr_pct": cagr * 100,
+            "max_dd_pct": max_dd * 100,
+            "mar": mar,
+        })
+
+
+def simulate_equity(trades: dict, risk=RISK_GRID, initial: float = 10_000.0,
+                    max_open_risk: Optional[float] = None) -> EquityResult:
+    """
+    Compounding equity for every risk level in `risk` (fraction per trade).
+
+    trades: entry_time, exit_time (datetime64 or bar numbers), pnl_r
+    max_open_risk: cap on the sum of open stakes as a fraction of equity (None = no cap)
+    """
+    risk = np.atleast_1d(np.asarray(risk, dtype=np.float64))
+    entry_t = np.asarray(trades["entry_time"])
+    exit_t = np.asarray(trades["exit_time"])
+    pnl = np.asarray(trades["pnl_r"], dtype=np.float64)
+    t_count = len(pnl)
+
+    order = np.lexsort((entry_t, exit_t))          # exit order (ties: earlier entry first)
+    entry_t, exit_t, pnl = entry_t[order], exit_t[order], pnl[order]
+    if t_count:
+        span = (exit_t.max() - entry_t.min())
+        years = span / np.timedelta64(1, "D") / 365.25 if isinstance(span, np.timedelta64) else 0.0
+    else:
+        years = 0.0
+
+    # Sequential trades (each entry at/after the previous exit): pure cumprod.
+    # An entry at the time of the previous exit only sees that exit's PnL when the
+    # previous trade is not zero-length (same tie rule as the event pass below).
+    after = (entry_t[1:] > exit_t[:-1]) | ((entry_t[1:] == exit_t[:-1]) & (entry_t[:-1] < exit_t[:-1]))
+    sequential = t_count < 2 or bool(after.all())
+    if sequential and (max_open_risk is None or (risk <= max_open_risk).all()):
+        growth = np.maximum(1.0 + risk[:, None] * pnl[None, :], 0.0)
+        equity = initial * np.cumprod(growth, axis=1)
+        taken = np.ones((len(risk), t_count), dtype=bool)
+        return EquityResult(risk=risk, exit_time=exit_t, equity=equity, taken=taken,
+                            initial=initial, years=float(years))
+
+    # Event pass: exits before entries at the same time (zero-length trades: entry first)
+    kind = np.concatenate([np.ones(t_count, dtype=np.int8),                  # entry
+                           np.where(exit_t == entry_t, 2, 0).astype(np.int8)])  # exit
+    ev_time = np.concatenate([entry_t, exit_t])
+    ev_trade = np.concatenate([np.arange(t_count), np.arange(t_count)])
+    ev_order = np.lexsort((np.tile(np.arange(t_count), 2), kind, ev_time))  # ties: exit order
+
+    cap = np.inf if max_open_risk is None else float(max_open_risk)
+    eq = np.full(len(risk), float(initial))
+    open_stake = np.zeros(len(risk))
+    stake = np.zeros((len(risk), t_count))
+    taken = np.zeros((len(risk), t_count), dtype=bool)
+    equity = np.empty((len(risk), t_count))
+    for e in ev_order:
+        i = ev_trade[e]
+        if kind[e] == 1:
+            s = risk * eq
+            ok = (open_stake + s <= cap * eq + 1e-9) & (eq > 0)
+            stake[:, i] = np.where(ok, s, 0.0)
+            taken[:, i] = ok
+            open_stake += stake[:, i]
+        else:
+            eq = np.maximum(eq + stake[:, i] * pnl[i], 0.0)
+            open_stake -= stake[:, i]
+            equity[:, i] = eq
+    return EquityResult(risk=risk, exit_time=exit_t, equity=equity, taken=taken,
+                        initial=initial, years=float(years))
+
+
+def print_equity(label: str, result: EquityResult):
+    print(f"\n{'─' * 78}")
+    print(f"  {label} — {result.equity.shape[1]} trades | {result.years * 365.25:.0f} days "
+          f"| start ${result.initial:,.0f}")
+    print(f"{'─' * 78}")
+    print(f"{'Risk%':>6} {'Taken':>6} {'Final $':>12} {'Return%':>9} {'CAGR%':>10} "
+          f"{'MaxDD%':>8} {'MAR':>7}")
+    for row in result.summary().itertuples(index=False):
+        print(f"{row.risk_pct:>6.2f} {row.taken:>6} {row.final:>12,.2f} {row.return_pct:>+9.2f} "
+              f"{row.cagr_pct:>+10.1f} {row.max_dd_pct:>8.2f} {row.mar:>7.2f}")
+
+
+def _equity_loop(trades: dict, risk: float, initial: float = 10_000.0,
+                 max_open_risk: Optional[float] = None) -> np.ndarray:
+    """
+    simulate_equity for one risk level as a plain per-event loop (verify() only):
+    equity after each exit, trades in (exit, entry) order. At equal times exits
+    come before entries, except a zero-length trade which enters before it exits.
+    """
+    trades = sorted(zip(trades["entry_time"], trades["exit_time"], trades["pnl_r"]),
+                    key=lambda t: (t[1], t[0]))
+    events = []
+    for pos, (t_in, t_out, _) in enumerate(trades):
+        events.append((t_in, 1, pos))
+        events.append((t_out, 2 if t_out == t_in else 0, pos))
+    events.sort(key=lambda e: (e[0], e[1], e[2]))
+    cap = np.inf if max_open_risk is None else max_open_risk
+    eq, open_stake = float(initial), 0.0
+    stake = [0.0] * len(trades)
+    out = np.zeros(len(trades))
+    for _, kind, pos in events:
+        if kind == 1:
+            s = risk * eq
+            if eq > 0 and open_stake + s <= cap * eq + 1e-9:
+                stake[pos] = s
+                open_stake += s
+        else:
+            eq = max(eq + stake[pos] * trades[pos][2], 0.0)
+            open_stake -= stake[pos]
+            out[pos] = eq
+    return out
+
+
+def verify(cases: int = 3000, seed: int = 42):
+    """simulate_equity vs _equity_loop on random trade sets with time ties (python equity.py --verify)."""
+    rng = np.random.default_rng(seed)
+    bad = 0
+    for c in range(cases):
+        n = int(rng.integers(1, 12))
+        entry = rng.integers(0, 20, n)
+        trades = {"entry_time": entry, "exit_time": entry + rng.integers(0, 6, n),
+                  "pnl_r": rng.choice([-1.0, 0.0, 0.5, 1.0, 2.5], n)}
+        cap = 0.03 if c % 2 else None
+        result = simulate_equity(trades, max_open_risk=cap)
+        for row, r in enumerate(result.risk):
+            if not np.allclose(result.equity[row], _equity_loop(trades, r, max_open_risk=cap)):
+                bad += 1
+                break
+    print(f"simulate_equity vs per-event loop: {cases} random cases, {bad} mismatches")
+
+
+def main():
+    from strategy_mst_medio import run_mst_medio, signals_to_arrays, trades_from_signals
+    from fast_exits import BarIndex, fill_bars, resolve_fixed_exits, fixed_exit_pnl_r
+
+    PAIRS = [
+        ("XAUUSD", "XAUUSD_M5.csv"),
+        ("BTCUSD", "BTCUSD_M5.csv"),
+        ("EURUSD", "EURUSD_M5.csv"),
+        ("USDJPY", "USDJPY_M5.csv"),
+    ]
+    MAX_OPEN_RISK = 0.03
+
+    print("=" * 78)
+    print("MST Medio v2.0 — Compounding equity vs risk per trade (TP = Confirm Peak)")
+    print("=" * 78)
+
+    for symbol, filename in PAIRS:
+        filepath = os.path.join(DATA_DIR, filename)
+        if not os.path.exists(filepath):
+            print(f"\n⚠️ {symbol}: No data file ({filename})")
+            continue
+        df = load_data(filepath)
+        signals, _ = run_mst_medio(df, pivot_len=5, break_mult=0.25, impulse_mult=1.5,
+                                   min_rr=0, tp_mode="confirm", debug=False)
+        trades = trades_from_signals(signals, times=df.index.values)
+        if len(trades["pnl_r"]) == 0:
+            print(f"\n{symbol}: No closed trades")
+            continue
+        result = simulate_equity(trades)
+        print_equity(f"{symbol} M5 engine (one position at a time)", result)
+
+        # Independent setups (each limit order kept until SL/TP) overlap → open-risk cap
+        arr = signals_to_arrays(signals)
+        ok = arr["risk"] > 0
+        index = BarIndex.from_df(df)
+        fill = fill_bars(index, arr["start"][ok], arr["direction"][ok], arr["entry"][ok])
+        filled = fill < index.n
+        d = arr["direction"][ok][filled]
+        sl, tp = arr["sl"][ok][filled], arr["tp"][ok][filled]
+        exit_bar, outcome = resolve_fixed_exits(index, fill[filled], d, sl, tp)
+        closed = exit_bar >= 0            # exit_bar -1 = still OPEN (no exit, no PnL)
+        times = df.index.values
+        indep = {
+            "entry_time": times[fill[filled][closed]],
+            "exit_time": times[exit_bar[closed]],
+            "pnl_r": fixed_exit_pnl_r(d, arr["entry"][ok][filled], sl, tp, outcome)[closed],
+        }
+        result = simulate_equity(indep, max_open_risk=MAX_OPEN_RISK)
+        print_equity(f"{symbol} M5 independent setups (open risk ≤ {MAX_OPEN_RISK:.0%})", result)
+
+
+if __name__ == "__main__":
+    if "--verify" in sys.argv[1:]:
+        verify()
+    else:
+        main()
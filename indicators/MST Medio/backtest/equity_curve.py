@@ -0,0 +1,174 @@
+"""
+equity_curve.py — Bar-level mark-to-market equity (R) and concurrent exposure
+
+Closed-trade drawdown (metrics.max_drawdown) only sees the PnL at each exit. This
+marks every open trade on every bar:
+
+    open PnL(t) = Σ_open d·(price[t] - entry)/risk = price[t]·A(t) - B(t)
+    A(t) = Σ_open d/risk,  B(t) = Σ_open d·entry/risk
+
+A, B and the open-trade counts are piecewise constant between entries / exits,
+so they are built by scattering +x at the entry bar and -x at the exit bar into
+difference arrays and taking one cumsum — O(bars + trades), no per-trade loop.
+
+A trade is open (marked) from its entry bar up to the bar before its exit bar;
+its pnl_r is realized at the exit bar. exit_bar < 0 = still open at the end.
+Open trades are marked at the close, and also at the adverse extreme (low for
+longs, high for shorts) for the intrabar drawdown against the prior close peak.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from metrics import max_drawdown
+from market_data import load_data
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+
+def _interval_sum(n: int, start: np.ndarray, end: np.ndarray, weight) -> np.ndarray:
+    """Σ weight over intervals [start, end) at every bar (difference array + cumsum)."""
+    w = np.broadcast_to(np.asarray(weight, dtype=np.float64), start.shape)
+    diff = np.bincount(start, w, minlength=n + 1) - np.bincount(end, w, minlength=n + 1)
+    return np.cumsum(diff[:n])
+
+
+@dataclass
+class EquityCurve:
+    """Per-bar series (length = bars), all in R."""
+    realized: np.ndarray      # cumulative closed PnL
+    open_pnl: np.ndarray      # mark-to-market PnL of open trades (at close)
+    worst_pnl: np.ndarray     # open trades marked at the bar's adverse extreme
+    open_trades: np.ndarray   # concurrent open trades
+    net_exposure: np.ndarray  # open longs - open shorts
+    closed_dd: float          # max DD on the closed-trade sequence (for comparison)
+
+    @property
+    def equity(self) -> np.ndarray:
+        return self.realized + self.open_pnl
+
+    @property
+    def drawdown(self) -> np.ndarray:
+        eq = self.equity
+        return np.maximum(np.maximum.accumulate(eq), 0.0) - eq
+
+    @property
+    def intrabar_drawdown(self) -> np.ndarray:
+        """Close-equity peak before the bar minus the bar's worst-case equity."""
+        eq = self.equity
+        peak = np.maximum(np.concatenate([[0.0], np.maximum.accumulate(eq)[:-1]]), 0.0)
+        return np.maximum(peak - (self.realized + self.worst_pnl), 0.0)
+
+    def summary(self) -> dict:
+        eq = self.equity
+        dd = self.drawdown
+        return {
+            "final_r": float(eq[-1]) if len(eq) else 0.0,
+            "closed_dd": self.closed_dd,
+            "mtm_dd": float(dd.max()) if len(dd) else 0.0,
+            "intrabar_dd": float(self.intrabar_drawdown.max()) if len(dd) else 0.0,
+            "max_concurrent": int(self.open_trades.max()) if len(eq) else 0,
+            "exposed_pct": float((self.open_trades > 0).mean() * 100) if len(eq) else 0.0,
+            "avg_concurrent": float(self.open_trades.mean()) if len(eq) else 0.0,
+        }
+
+
+def build_equity_curve(trades: dict, high, low, close) -> EquityCurve:
+    """Mark-to-market equity in R over all bars (see module doc)."""
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    start = np.asarray(trades["entry_bar"], dtype=np.int64)
+    end = np.asarray(trades["exit_bar"], dtype=np.int64)
+    end = np.where(end < 0, n, end)
+    d = np.asarray(trades["direction"], dtype=np.float64)
+    entry = np.asarray(trades["entry"], dtype=np.float64)
+    risk = np.asarray(trades["risk"], dtype=np.float64)
+    pnl = np.asarray(trades["pnl_r"], dtype=np.float64)
+    ok = risk > 0
+    start, end, d, entry, risk, pnl = start[ok], end[ok], d[ok], entry[ok], risk[ok], pnl[ok]
+
+    closed = end < n
+    realized = np.cumsum(np.bincount(end[closed], weights=pnl[closed], minlength=n)[:n])
+
+    # Longs and shorts separately: same close, different adverse extreme
+    open_pnl = np.zeros(n)
+    worst_pnl = np.zeros(n)
+    for side, adverse in ((1.0, low), (-1.0, high)):
+        m = d == side
+        a = _interval_sum(n, start[m], end[m], side / risk[m])
+        b = _interval_sum(n, start[m], end[m], side * entry[m] / risk[m])
+        open_pnl += close * a - b
+        worst_pnl += np.asarray(adverse, dtype=np.float64) * a - b
+
+    order = np.argsort(end[closed], kind="stable")
+    return EquityCurve(
+        realized=realized,
+        open_pnl=open_pnl,
+        worst_pnl=worst_pnl,
+        open_trades=np.rint(_interval_sum(n, start, end, 1.0)).astype(np.int64),
+        net_exposure=np.rint(_interval_sum(n, start, end, d)).astype(np.int64),
+        closed_dd=float(max_drawdown(pnl[closed][order])),
+    )
+
+
+def main():
+    from strategy_mst_medio import run_mst_medio, signals_to_arrays, trades_from_signals
+    from fast_exits import BarIndex, fill_bars, resolve_fixed_exits, fixed_exit_pnl_r
+
+    PAIRS = [
+        ("XAUUSD", "XAUUSD_M5.csv"),
+        ("BTCUSD", "BTCUSD_M5.csv"),
+        ("EURUSD", "EURUSD_M5.csv"),
+        ("USDJPY", "USDJPY_M5.csv"),
+    ]
+
+    print("=" * 96)
+    print("MST Medio v2.0 — Mark-to-market equity vs closed-trade drawdown (R, TP = Confirm Peak)")
+    print("=" * 96)
+    print(f"{'Symbol':<8} {'Trades':<14} {'N':>5} {'Final R':>8} {'Closed DD':>10} {'MTM DD':>8} "
+          f"{'Bar DD':>9} {'Max open':>9} {'Exposed%':>9}")
+    print("-" * 96)
+
+    for symbol, filename in PAIRS:
+        filepath = os.path.join(DATA_DIR, filename)
+        if not os.path.exists(filepath):
+            print(f"⚠️ {symbol}: No data file ({filename})")
+            continue
+        df = load_data(filepath)
+        high, low, close = (df[c].to_numpy() for c in ("High", "Low", "Close"))
+        signals, _ = run_mst_medio(df, pivot_len=5, break_mult=0.25, impulse_mult=1.5,
+                                   min_rr=0, tp_mode="confirm", debug=False)
+
+        # Independent setups: every limit order kept until SL / TP (overlapping trades)
+        arr = signals_to_arrays(signals)
+        ok = arr["risk"] > 0
+        index = BarIndex.from_df(df)
+        fill = fill_bars(index, arr["start"][ok], arr["direction"][ok], arr["entry"][ok])
+        filled = fill < index.n
+        d = arr["direction"][ok][filled]
+        entry, sl, tp = arr["entry"][ok][filled], arr["sl"][ok][filled], arr["tp"][ok][filled]
+        exit_bar, outcome = resolve_fixed_exits(index, fill[filled], d, sl, tp)
+        indep = {
+            "entry_bar": fill[filled],
+            "exit_bar": np.where(exit_bar < index.n, exit_bar, -1),
+            "direction": d,
+            "entry": entry,
+            "risk": np.abs(entry - sl),
+            "pnl_r": np.where(exit_bar < index.n, fixed_exit_pnl_r(d, entry, sl, tp, outcome), 0.0),
+        }
+
+        engine = trades_from_signals(signals, include_open=True)
+        for label, trades in (("engine", engine), ("independent", indep)):
+            s = build_equity_curve(trades, high, low, close).summary()
+            print(f"{symbol:<8} {label:<14} {len(trades['entry']):>5} {s['final_r']:>+8.2f} "
+                  f"{s['closed_dd']:>10.2f} {s['mtm_dd']:>8.2f} {s['intrabar_dd']:>9.2f} "
+                  f"{s['max_concurrent']:>9} {s['exposed_pct']:>8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+exit_policy.py — Declarative exit policies compiled to array operations
+
+An ExitPolicy is a list of Tranches (fraction of the position, TP, initial stop,
+trailing, exit on opposite signal) plus policy-wide rules (BE trigger, BE after
+TP1, time stop). simulate_exits() evaluates it for every setup at once over the
+flat TradePaths store — no per-signal bar loop, whatever the combination.
+
+Bar order (same as the bar-loop studies):
+1. BE trigger (price reaches entry ± be_trigger_r × risk) → stop = entry on this bar
+2. stop in force (initial / BE / trailed from earlier bars) — SL priority
+3. BE after TP1: if tranche 0 took TP on this bar, the other tranches' stop = entry, re-checked
+4. tranche TP
+5. exits at the bar's close: opposite signal (bar >= opp_bar), time stop
+Trailing stops update after the bar is checked; open tranches are marked to the last close.
+
+Example — "50% at confirm H/L, BE, trail the rest":
+    ExitPolicy([Tranche(0.5, tp="confirm"),
+                Tranche(0.5, trail=(1.0, 0.5))], be_after_tp1=True)
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from fast_exits import BarIndex, OUTCOME_SL, OUTCOME_OPEN, OUTCOME_TP, OUTCOME_BE
+from trade_paths import TradePaths, build_trade_paths
+
+# Extra outcome codes (stop above entry / close on opposite signal / time stop)
+OUTCOME_TRAIL = 3
+OUTCOME_OPP = 4
+OUTCOME_TIME = 5
+
+OUTCOME_NAMES = {
+    OUTCOME_SL: "SL", OUTCOME_OPEN: "OPEN", OUTCOME_TP: "TP", OUTCOME_BE: "BE",
+    OUTCOME_TRAIL: "TRAIL", OUTCOME_OPP: "OPP", OUTCOME_TIME: "TIME",
+}
+
+
+@dataclass
+class Tranche:
+    """
+    fraction:         share of the position
+    tp:               None (no TP) | R multiple (float) | "confirm" (conf_high / conf_low)
+                      | "w1" (w1_peak) | any price column of the setups dict (e.g. "tp")
+    min_rr:           TP is pushed out to at least entry ± min_rr × risk
+    stop_r:           initial stop distance in R (1.0 = original SL, 0.0 = entry)
+    trail:            (lock_rr, step) — trail at best_r - step once best_r >= lock_rr
+    exit_on_opposite: close at the bar's close once bar >= opp_bar
+    """
+    fraction: float
+    tp: Union[None, float, str] = None
+    min_rr: float = 0.0
+    stop_r: float = 1.0
+    trail: Optional[Tuple[float, float]] = None
+    exit_on_opposite: bool = False
+
+
+@dataclass
+class ExitPolicy:
+    """
+    tranches:           position split (tranche 0 is "TP1")
+    be_trigger_r:       stop → entry for all tranches once price reaches this R (None = off)
+    be_after_tp1:       when tranche 0 takes TP, the other tranches' stop → entry (same bar)
+    opposite_after_tp1: opposite-signal exits only after tranche 0 took TP
+    time_stop:          close at the close of the time_stop-th bar since start (None = off)
+    """
+    tranches: List[Tranche]
+    be_trigger_r: Optional[float] = None
+    be_after_tp1: bool = False
+    opposite_after_tp1: bool = False
+    time_stop: Optional[int] = None
+    name: str = ""
+
+
+@dataclass
+class PolicyResult:
+    """Rows = tranches, columns = setups."""
+    policy: ExitPolicy
+    fraction: np.ndarray
+    exit_bar: np.ndarray      # -1 = open at end of data
+    outcome: np.ndarray
+    exit_price: np.ndarray
+    pnl_r: np.ndarray         # per tranche, in R of the full position risk
+
+    @property
+    def trade_pnl_r(self) -> np.ndarray:
+        """Fraction-weighted PnL per setup."""
+        return (self.fraction[:, None] * self.pnl_r).sum(axis=0)
+
+    @property
+    def closed(self) -> np.ndarray:
+        """True when every tranche is closed."""
+        return (self.outcome != OUTCOME_OPEN).all(axis=0)
+
+    def summary(self) -> dict:
+        pnl = self.trade_pnl_r
+        closed = self.closed
+        wins = int(((pnl > 0) & closed).sum())
+        losses = int(((pnl < 0) & closed).sum())
+        decided = wins + losses
+        return {
+            "name": self.policy.name, "setups": len(pnl), "closed": int(closed.sum()),
+            "wins": wins, "losses": losses,
+            "wr": wins / decided * 100 if decided > 0 else 0.0,
+            "total_r": float(pnl[closed].sum()),
+            "open_r": float(pnl[~closed].sum()),
+        }
+
+    def outcome_names(self, tranche: int = 0) -> List[str]:
+        return [OUTCOME_NAMES[o] for o in self.outcome[tranche]]
+
+
+def _tighter(a, b, d):
+    """The stop closer to price (higher for BUY, lower for SELL)."""
+    return np.where((a - b) * d >= 0, a, b)
+
+
+def _tp_price(tranche: Tranche, setups: dict, direction, entry, risk) -> np.ndarray:
+    tp = tranche.tp
+    if tp is None:
+        price = np.full(len(entry), np.nan)
+    elif isinstance(tp, str):
+        if tp == "confirm":
+            price = np.where(direction > 0, setups["conf_high"], setups["conf_low"])
+        elif tp == "w1":
+            price = np.asarray(setups["w1_peak"], dtype=np.float64)
+        else:
+            price = np.asarray(setups[tp], dtype=np.float64)
+        price = np.where(price > 0, price, np.nan)
+    else:
+        price = entry + direction * (float(tp) * risk)
+    if tranche.min_rr > 0:
+        floor = entry + direction * (tranche.min_rr * risk)
+        price = np.where(np.isnan(price), np.nan, _tighter(floor, price, direction))
+    return price
+
+
+def simulate_exits(index: BarIndex, setups: dict, policy: ExitPolicy,
+                   paths: Optional[TradePaths] = None) -> PolicyResult:
+    """
+    Evaluate one ExitPolicy over all setups.
+
+    setups: column arrays — start, direction (or dir), entry, sl; optional opp_bar
+            (first bar of an opposite-signal exit, n = none) and TP price columns
+            (conf_high / conf_low / w1_peak / tp ...). See strategy_mst_medio.signals_to_arrays.
+    paths:  reuse a TradePaths built for these setups (must reach the widest initial stop).
+    """
+    start = np.asarray(setups["start"], dtype=np.int64)
+    direction = np.asarray(setups["direction"] if "direction" in setups else setups["dir"], dtype=np.int8)
+    entry = np.asarray(setups["entry"], dtype=np.float64)
+    sl = np.asarray(setups["sl"], dtype=np.float64)
+    risk = (entry - sl) * direction
+    n = index.n
+    t_count = len(start)
+    opp_bar = np.asarray(setups.get("opp_bar", np.full(t_count, n)), dtype=np.int64)
+
+    if paths is None:
+        widest = max(tr.stop_r for tr in policy.tranches)
+        far = sl if widest == 1.0 else entry - direction * (widest * risk)
+        buy = direction > 0
+        stop_bar = np.where(
+            buy,
+            index.first_low_at_or_below(start, np.where(buy, far, np.nan)),
+            index.first_high_at_or_above(start, np.where(buy, np.nan, far)),
+        )
+        paths = build_trade_paths(index, start, direction, entry, sl, stop_bar=stop_bar)
+
+    # Per-cell views
+    tr_id = paths.trade
+    bar = paths.bar
+    d = direction[tr_id].astype(np.float64)
+    e = entry[tr_id]
+    rk = risk[tr_id]
+    fav = paths.favourable
+    adv = paths.adverse
+    last_close = index.closes[n - 1] if (index.closes is not None and n > 0) else np.nan
+    cells = len(bar)
+
+    def first_cell(mask):
+        return paths.first_in_segment(mask[None, :])[0]
+
+    # BE trigger bar per setup (n = never)
+    trig_bar = np.full(t_count, n, dtype=np.int64)
+    if policy.be_trigger_r is not None:
+        level = entry + direction * (policy.be_trigger_r * risk)
+        c = first_cell((fav - level[tr_id]) * d >= 0)
+        trig_bar = np.where(c < cells, bar[np.minimum(c, max(cells - 1, 0))], n)
+
+    k_count = len(policy.tranches)
+    fraction = np.array([tr.fraction for tr in policy.tranches], dtype=np.float64)
+    exit_bar = np.full((k_count, t_count), -1, dtype=np.int64)
+    outcome = np.full((k_count, t_count), OUTCOME_OPEN, dtype=np.int8)
+    exit_price = np.full((k_count, t_count), last_close)
+    pnl_r = np.zeros((k_count, t_count))
+    tp1_bar = np.full(t_count, n, dtype=np.int64)
+
+    for k, tranche in enumerate(policy.tranches):
+        init = sl if tranche.stop_r == 1.0 else entry - direction * (tranche.stop_r * risk)
+        pre = init[tr_id]
+        if policy.be_trigger_r is not None:
+            pre = np.where(bar >= trig_bar[tr_id], _tighter(pre, e, d), pre)
+        if tranche.trail is not None:
+            lock, step = tranche.trail
+            best = paths.best_before
+            trailed = e + d * ((best - step) * rk)
+            pre = np.where((best > 0) & (best >= lock), _tighter(pre, trailed, d), pre)
+        post = pre
+        if policy.be_after_tp1 and k > 0:
+            t1 = tp1_bar[tr_id]
+            pre = np.where(bar > t1, _tighter(pre, e, d), pre)
+            post = np.where(bar >= t1, _tighter(pre, e, d), pre)
+
+        hit_pre = (adv - pre) * d <= 0
+        hit_post = (adv - post) * d <= 0
+        tp = _tp_price(tranche, setups, direction, entry, risk)
+        hit_tp = (fav - tp[tr_id]) * d >= 0
+        hit_opp = np.zeros(cells, dtype=bool)
+        if tranche.exit_on_opposite:
+            hit_opp = bar >= opp_bar[tr_id]
+            if policy.opposite_after_tp1:
+                hit_opp &= bar >= tp1_bar[tr_id]
+        hit_time = np.zeros(cells, dtype=bool)
+        if policy.time_stop is not None:
+            hit_time = bar - start[tr_id] >= policy.time_stop - 1
+
+        c = first_cell(hit_post | hit_tp | hit_opp | hit_time)
+        done = c < cells
+        ci = np.where(done, c, 0)
+        if cells == 0:
+            continue
+
+        stop_px = np.where(hit_pre[ci], pre[ci], post[ci])
+        is_stop = hit_post[ci]
+        is_tp = ~is_stop & hit_tp[ci]
+        is_close = ~is_stop & ~is_tp
+        price = np.select([is_stop, is_tp], [stop_px, tp], paths.close[ci])
+        price = np.where(done, price, last_close)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = (price - entry) * direction / risk
+        stop_side = (stop_px - entry) * direction
+        code = np.select(
+            [is_stop & (stop_side < 0), is_stop & (stop_side == 0), is_stop,
+             is_tp, is_close & hit_opp[ci]],
+            [OUTCOME_SL, OUTCOME_BE, OUTCOME_TRAIL, OUTCOME_TP, OUTCOME_OPP],
+            OUTCOME_TIME,
+        )
+        r = np.where(is_stop & (stop_px == sl), -1.0, r)
+
+        exit_bar[k] = np.where(done, bar[ci], -1)
+        outcome[k] = np.where(done, code, OUTCOME_OPEN)
+        exit_price[k] = price
+        pnl_r[k] = np.where(done | ~np.isnan(price), r, 0.0)
+        if k == 0:
+            tp1_bar = np.where(done & is_tp, bar[ci], n)
+
+    return PolicyResult(policy=policy, fraction=fraction, exit_bar=exit_bar,
+                        outcome=outcome, exit_price=exit_price, pnl_r=pnl_r)
+
+
+def next_opposite_index(direction) -> np.ndarray:
+    """
+    For setups in time order: index of the next setup with the opposite direction
+    (-1 = none). One backward pass instead of a forward search per setup.
+    """
+    d = np.asarray(direction)
+    k = len(d)
+    nxt = np.full(k, k, dtype=np.int64)
+    if k > 1:
+        flip = np.flatnonzero(d[1:] != d[:-1]) + 1      # first setup of each new run
+        nxt[flip - 1] = flip                             # last setup of a run → next run
+        nxt = np.minimum.accumulate(nxt[::-1])[::-1]
+    return np.where(nxt < k, nxt, -1)
+
+
+def compare_policies(index: BarIndex, setups: dict, policies: List[ExitPolicy]) -> pd.DataFrame:
+    """One summary row per policy (paths are shared when the initial stops allow it)."""
+    widest = max(tr.stop_r for p in policies for tr in p.tranches) if policies else 1.0
+    paths = None
+    if widest <= 1.0:
+        start = np.asarray(setups["start"], dtype=np.int64)
+        direction = setups["direction"] if "direction" in setups else setups["dir"]
+        paths = build_trade_paths(index, start, direction, setups["entry"], setups["sl"])
+    return pd.DataFrame([simulate_exits(index, setups, p, paths).summary() for p in policies])
@@ -0,0 +1,359 @@
+"""
+fast_exits.py — Vectorized exit resolution for MST Medio setups
+
+Resolves every trade at once on numpy arrays instead of one Python bar loop
+per signal (O(signals × bars) per TP variant):
+
+1. BarIndex: sparse tables (range max of High / range min of Low), built once per dataset
+2. First passage: first bar j >= start with Low[j] <= level (or High[j] >= level),
+   found for all trades together by binary lifting → O(log n) per trade
+3. resolve_fixed_exits: SL / TP first passage for (start, direction, sl, tp) arrays
+4. mfe_before_stop: max favourable excursion before the stop → outcome of any
+   fixed R:R (or a whole expectancy-vs-R:R curve) without rescanning bars
+5. breakeven_grid: BE-trigger / TP grid from first passages of each distinct level
+
+Conventions (same as the bar-loop studies):
+- direction: +1 = BUY, -1 = SELL
+- start: first bar on which SL/TP are checked (inclusive)
+- SL has priority when SL and TP are touched on the same bar
+- tp = NaN → no TP (trade only closes on SL)
+"""
+
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+# Outcome codes
+OUTCOME_SL = -1
+OUTCOME_OPEN = 0
+OUTCOME_TP = 1
+OUTCOME_BE = 2
+
+
+def _sparse_table(values: np.ndarray, op) -> list:
+    """
+    table[k][i] = op over values[i : i + 2^k] (window truncated at the end of data).
+    """
+    table = [values]
+    n = len(values)
+    step = 1
+    while step < n:
+        prev = table[-1]
+        cur = prev.copy()
+        cur[:n - step] = op(prev[:n - step], prev[step:])
+        table.append(cur)
+        step *= 2
+    return table
+
+
+class BarIndex:
+    """
+    Range-max / range-min index over a dataset's High and Low.
+    Memory: 2 × n × ceil(log2 n) floats (≈ 320 MB for 1M bars).
+    """
+
+    def __init__(self, highs, lows, closes=None):
+        self.highs = np.ascontiguousarray(highs, dtype=np.float64)
+        self.lows = np.ascontiguousarray(lows, dtype=np.float64)
+        self.closes = None if closes is None else np.ascontiguousarray(closes, dtype=np.float64)
+        self.n = len(self.highs)
+        self._max_high = _sparse_table(self.highs, np.maximum)
+        self._min_low = _sparse_table(self.lows, np.minimum)
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame) -> "BarIndex":
+        return cls(df["High"].values, df["Low"].values, df["Close"].values)
+
+    # ── First passage ──
+    def first_low_at_or_below(self, start, level) -> np.ndarray:
+        """First bar j >= start with Low[j] <= level (n if never). NaN level = never."""
+        level = np.where(np.isnan(level), -np.inf, level)
+        return self._first_passage(self._min_low, start, level, below=True)
+
+    def first_high_at_or_above(self, start, level) -> np.ndarray:
+        """First bar j >= start with High[j] >= level (n if never). NaN level = never."""
+        level = np.where(np.isnan(level), np.inf, level)
+        return self._first_passage(self._max_high, start, level, below=False)
+
+    def _first_passage(self, table, start, level, below: bool) -> np.ndarray:
+        n = self.n
+        pos, level = np.broadcast_arrays(np.asarray(start, dtype=np.int64),
+                                         np.asarray(level, dtype=np.float64))
+        pos = pos.copy()
+        if n == 0:
+            return np.zeros_like(pos)
+        # Invariant: no touch in [start, pos). Greedy jumps from the largest window down.
+        for k in range(len(table) - 1, -1, -1):
+            live = pos < n
+            if not live.any():
+                break
+            window = table[k][np.minimum(pos, n - 1)]
+            clear = (window > level) if below else (window < level)
+            pos = np.where(live & clear, pos + (1 << k), pos)
+        return np.minimum(pos, n)
+
+    # ── Range queries on [start, stop) ──
+    def range_max_high(self, start, stop) -> np.ndarray:
+        """max(High[start:stop]) per element; -inf for empty ranges."""
+        return self._range_query(self._max_high, start, stop, np.maximum, -np.inf)
+
+    def range_min_low(self, start, stop) -> np.ndarray:
+        """min(Low[start:stop]) per element; +inf for empty ranges."""
+        return self._range_query(self._min_low, start, stop, np.minimum, np.inf)
+
+    def _range_query(self, table, start, stop, op, empty) -> np.ndarray:
+        start = np.asarray(start, dtype=np.int64)
+        stop = np.minimum(np.asarray(stop, dtype=np.int64), self.n)
+        length = stop - start
+        out = np.full(np.broadcast(start, stop).shape, empty, dtype=np.float64)
+        ok = length > 0
+        if not ok.any():
+            return out
+        s = np.broadcast_to(start, out.shape)[ok]
+        e = np.broadcast_to(stop, out.shape)[ok]
+        k = np.floor(np.log2(e - s)).astype(np.int64)
+        # One gather per window level k (at most log2 n distinct values)
+        res = np.empty(len(s), dtype=np.float64)
+        for kk in np.unique(k):
+            m = k == kk
+            tbl = table[kk]
+            res[m] = op(tbl[s[m]], tbl[e[m] - (1 << kk)])
+        out[ok] = res
+        return out
+
+
+def resolve_fixed_exits(index: BarIndex, start, direction, sl, tp, intrabar=None):
+    """
+    First-passage resolution of fixed SL/TP levels for a batch of trades.
+
+    Args:
+        index:     BarIndex of the dataset
+        start:     first bar to check (int array)
+        direction: +1 BUY / -1 SELL
+        sl, tp:    price levels (tp = NaN → no TP)
+        intrabar:  optional intrabar.IntrabarResolver — bars touching both SL and TP
+                   are ordered from M1 instead of SL priority (one batched call)
+
+    Returns:
+        exit_bar: bar of the SL/TP hit (-1 if still open at end of data)
+        outcome:  OUTCOME_TP / OUTCOME_SL / OUTCOME_OPEN
+    """
+    start = np.asarray(start, dtype=np.int64)
+    buy = np.asarray(direction) > 0
+    sl = np.asarray(sl, dtype=np.float64)
+    tp = np.asarray(tp, dtype=np.float64)
+
+    # BUY: SL on Low, TP on High — SELL: SL on High, TP on Low
+    low_bar = index.first_low_at_or_below(start, np.where(buy, sl, tp))
+    high_bar = index.first_high_at_or_above(start, np.where(buy, tp, sl))
+    sl_bar = np.where(buy, low_bar, high_bar)
+    tp_bar = np.where(buy, high_bar, low_bar)
+
+    n = index.n
+    outcome = np.full(len(start), OUTCOME_OPEN, dtype=np.int8)
+    outcome[(sl_bar < n) & (sl_bar <= tp_bar)] = OUTCOME_SL   # SL priority on same bar
+    outcome[tp_bar < np.minimum(sl_bar, n)] = OUTCOME_TP
+    if intrabar is not None:
+        same = np.flatnonzero((sl_bar < n) & (sl_bar == tp_bar))
+        if len(same):
+            from intrabar import INTRABAR_TP
+            d = np.where(np.broadcast_to(buy, sl_bar.shape)[same], 1, -1)
+            order = intrabar.resolve(sl_bar[same], d, np.broadcast_to(sl, sl_bar.shape)[same],
+                                     np.broadcast_to(tp, sl_bar.shape)[same])
+            outcome[same[order == INTRABAR_TP]] = OUTCOME_TP
+    exit_bar = np.where(outcome == OUTCOME_OPEN, -1, np.minimum(sl_bar, tp_bar))
+    return exit_bar, outcome
+
+
+def fixed_exit_pnl_r(direction, entry, sl, tp, outcome) -> np.ndarray:
+    """PnL in R for resolved fixed exits: TP → reward/risk, SL → -1, OPEN → 0."""
+    direction = np.asarray(direction)
+    risk = (np.asarray(entry) - np.asarray(sl)) * direction
+    reward = (np.asarray(tp) - np.asarray(entry)) * direction
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rr = np.where(risk > 0, reward / risk, 0.0)
+    return np.select([outcome == OUTCOME_TP, outcome == OUTCOME_SL], [rr, -1.0], 0.0)
+
+
+def fill_bars(index: BarIndex, start, direction, entry) -> np.ndarray:
+    """
+    Limit-order fill bar: first bar >= start where price trades back to entry
+    (BUY: Low <= entry, SELL: High >= entry). n if never filled.
+    """
+    buy = np.asarray(direction) > 0
+    entry = np.asarray(entry, dtype=np.float64)
+    low_bar = index.first_low_at_or_below(start, np.where(buy, entry, np.nan))
+    high_bar = index.first_high_at_or_above(start, np.where(buy, np.nan, entry))
+    return np.where(buy, low_bar, high_bar)
+
+
+# ========================================================
+#  MFE before stop — every fixed R:R from one pass
+# ========================================================
+@dataclass
+class ExcursionTable:
+    """
+    Per trade: maximum favourable excursion reached strictly before the stop bar.
+    (SL priority: a TP touched on the stop bar itself does not count.)
+
+    mfe_price / mfe_r: best price / R before the stop (-inf R when the stop is hit on `start`)
+    mfe_bar:           first bar the MFE was reached (-1 when empty)
+    stop_bar:          bar the original SL is hit (n = never)
+    """
+    start: np.ndarray
+    direction: np.ndarray
+    entry: np.ndarray
+    risk: np.ndarray
+    stop_bar: np.ndarray
+    mfe_price: np.ndarray
+    mfe_r: np.ndarray
+    mfe_bar: np.ndarray
+    n: int
+
+    def outcomes(self, rr_grid) -> np.ndarray:
+        """Outcome matrix (len(rr_grid) × trades) for fixed TP = entry ± rr × risk."""
+        rr = np.atleast_1d(np.asarray(rr_grid, dtype=np.float64))[:, None]
+        tp = self.entry + self.direction * rr * self.risk
+        # Compare in price space → same rounding as a bar loop checking High >= tp
+        reached = (self.mfe_price - tp) * self.direction >= 0
+        out = np.where(self.stop_bar < self.n, OUTCOME_SL, OUTCOME_OPEN).astype(np.int8)
+        out = np.broadcast_to(out, reached.shape).copy()
+        out[reached] = OUTCOME_TP
+        return out
+
+    def expectancy_curve(self, rr_grid) -> pd.DataFrame:
+        """Wins / losses / total R / expectancy for each R:R in rr_grid (open trades excluded)."""
+        rr = np.atleast_1d(np.asarray(rr_grid, dtype=np.float64))
+        out = self.outcomes(rr)
+        wins = (out == OUTCOME_TP).sum(axis=1)
+        losses = (out == OUTCOME_SL).sum(axis=1)
+        closed = wins + losses
+        total_r = wins * rr - losses
+        with np.errstate(divide="ignore", invalid="ignore"):
+            wr = np.where(closed > 0, wins / closed * 100, 0.0)
+            expectancy = np.where(closed > 0, total_r / closed, 0.0)
+        return pd.DataFrame({
+            "rr": rr, "wins": wins, "losses": losses, "open": len(self.start) - closed,
+            "wr": wr, "total_r": total_r, "expectancy": expectancy,
+        })
+
+
+def mfe_before_stop(index: BarIndex, start, direction, entry, sl) -> ExcursionTable:
+    """Build the ExcursionTable for a batch of trades (SL checked from `start`, inclusive)."""
+    start = np.asarray(start, dtype=np.int64)
+    direction = np.asarray(direction, dtype=np.int8)
+    entry = np.asarray(entry, dtype=np.float64)
+    sl = np.asarray(sl, dtype=np.float64)
+    buy = direction > 0
+    risk = (entry - sl) * direction
+
+    low_stop = index.first_low_at_or_below(start, np.where(buy, sl, np.nan))
+    high_stop = index.first_high_at_or_above(start, np.where(buy, np.nan, sl))
+    stop_bar = np.where(buy, low_stop, high_stop)
+
+    best_high = index.range_max_high(start, stop_bar)
+    best_low = index.range_min_low(start, stop_bar)
+    mfe_price = np.where(buy, best_high, best_low)
+    empty = stop_bar <= start
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mfe_r = np.where(empty | (risk <= 0), -np.inf, (mfe_price - entry) * direction / risk)
+
+    mfe_bar = np.where(
+        buy,
+        index.first_high_at_or_above(start, np.where(buy & ~empty, mfe_price, np.nan)),
+        index.first_low_at_or_below(start, np.where(~buy & ~empty, mfe_price, np.nan)),
+    )
+    mfe_bar = np.where(empty, -1, mfe_bar)
+    return ExcursionTable(start=start, direction=direction, entry=entry, risk=risk,
+                          stop_bar=stop_bar, mfe_price=mfe_price, mfe_r=mfe_r,
+                          mfe_bar=mfe_bar, n=index.n)
+
+
+# ========================================================
+#  Breakeven grid
+# ========================================================
+@dataclass
+class BreakevenGrid:
+    """
+    Result of breakeven_grid: rows = (be_trigger, tp_rr) configs, columns = trades.
+
+    trigger_bar: bar the BE trigger was reached (-1 = never, or trade closed first)
+    exit_bar:    bar of the SL / BE / TP exit (-1 = still open)
+    outcome:     OUTCOME_TP / OUTCOME_SL / OUTCOME_BE / OUTCOME_OPEN
+    pnl_r:       tp_rr / -1 / 0 / 0
+    """
+    be_trigger: np.ndarray
+    tp_rr: np.ndarray
+    trigger_bar: np.ndarray
+    exit_bar: np.ndarray
+    outcome: np.ndarray
+    pnl_r: np.ndarray
+
+    def summary(self) -> pd.DataFrame:
+        """One row per config: wins / losses / BE count / total R."""
+        return pd.DataFrame({
+            "be_trigger": self.be_trigger, "tp_rr": self.tp_rr,
+            "wins": (self.outcome == OUTCOME_TP).sum(axis=1),
+            "losses": (self.outcome == OUTCOME_SL).sum(axis=1),
+            "be": (self.outcome == OUTCOME_BE).sum(axis=1),
+            "open": (self.outcome == OUTCOME_OPEN).sum(axis=1),
+            "total_r": self.pnl_r.sum(axis=1),
+        })
+
+
+def breakeven_grid(index: BarIndex, start, direction, entry, sl, configs) -> BreakevenGrid:
+    """
+    Move SL to entry once price reaches entry ± be_trigger × risk, TP at entry ± tp_rr × risk.
+
+    Same bar order as the bar loops: trigger → stop check (at entry once triggered) → TP.
+    One first passage per distinct trigger / TP level, then the grid is pure array logic:
+      - SL or TP before the trigger bar → plain fixed SL/TP (SL priority)
+      - otherwise from the trigger bar the stop is entry: BE if it is touched no later than TP
+    """
+    start = np.asarray(start, dtype=np.int64)
+    direction = np.asarray(direction, dtype=np.int8)
+    entry = np.asarray(entry, dtype=np.float64)
+    sl = np.asarray(sl, dtype=np.float64)
+    configs = np.asarray(list(configs), dtype=np.float64).reshape(-1, 2)
+    be_trigger, tp_rr = configs[:, 0], configs[:, 1]
+    buy = direction > 0
+    risk = (entry - sl) * direction
+    n = index.n
+
+    def favourable_bar(level):
+        hi = index.first_high_at_or_above(start, np.where(buy, level, np.nan))
+        lo = index.first_low_at_or_below(start, np.where(buy, np.nan, level))
+        return np.where(buy, hi, lo)
+
+    def adverse_bar(from_bar, level):
+        lo = index.first_low_at_or_below(from_bar, np.where(buy, level, np.nan))
+        hi = index.first_high_at_or_above(from_bar, np.where(buy, np.nan, level))
+        return np.where(buy, lo, hi)
+
+    sl_bar = adverse_bar(start, sl)
+    trig_values, trig_inv = np.unique(be_trigger, return_inverse=True)
+    tp_values, tp_inv = np.unique(tp_rr, return_inverse=True)
+    trig_bars = np.stack([favourable_bar(entry + direction * (v * risk)) for v in trig_values])
+    tp_bars = np.stack([favourable_bar(entry + direction * (v * risk)) for v in tp_values])
+    # BE stop is the same level (entry) for every config — only its start bar differs
+    be_bars = np.stack([adverse_bar(tb, entry) for tb in trig_bars])
+
+    trig = trig_bars[trig_inv]
+    tp_bar = tp_bars[tp_inv]
+    be_bar = be_bars[trig_inv]
+
+    before = np.minimum(sl_bar, tp_bar) < trig          # closed before the trigger
+    stop_bar = np.where(before, sl_bar, be_bar)
+    stop_code = np.where(before, OUTCOME_SL, OUTCOME_BE)
+    stopped = (stop_bar < n) & (stop_bar <= tp_bar)
+    took_tp = ~stopped & (tp_bar < n)
+
+    outcome = np.full(trig.shape, OUTCOME_OPEN, dtype=np.int8)
+    outcome[stopped] = stop_code[stopped]
+    outcome[took_tp] = OUTCOME_TP
+    exit_bar = np.where(stopped, stop_bar, np.where(took_tp, tp_bar, -1))
+    trigger_bar = np.where(~before & (trig < n), trig, -1)
+    pnl_r = np.select([outcome == OUTCOME_TP, outcome == OUTCOME_SL],
+                      [np.broadcast_to(tp_rr[:, None], trig.shape), -1.0], 0.0)
+    return BreakevenGrid(be_trigger=be_trigger, tp_rr=tp_rr, trigger_bar=trigger_bar,
+                         exit_bar=exit_bar, outcome=outcome, pnl_r=pnl_r)
@@ -0,0 +1,276 @@
+"""
+filter_discovery.py — Automated timing / context filter search for MST Medio trades
+
+generate_recommendations() flags single buckets by hand-written rules. This module
+scores every candidate filter at once:
+
+- primitives (one bool mask per candidate, P × N matrix):
+  hour windows (wrap-around), weekday subsets, session subsets, ATR bands
+  (quantile edges), bars-to-confirm limits, R:R floors, direction
+- candidates = every primitive + every AND of two primitives from different families
+- count / wins / ΣR of all candidates = three matmuls (M·diag(w)·Mᵀ), chunked over trades
+- trades are split by time: in-sample (ranked) / out-of-sample (must hold up);
+  data-driven edges (ATR quantiles, per-pair ATR percentiles) are fitted on the
+  in-sample trades only
+
+    result = discover_filters(closed)          # enrich_signals() rows / trades_detail.csv
+    result.top(10)
+    keep = result.mask(result.table.index[0])   # bool mask of the best filter
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analytics_cube import BTC_BINS, DAY_NAMES
+
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "analysis_output")
+
+RR_FLOORS = (0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 3.0)
+CHUNK = 8192
+
+
+@dataclass
+class Primitives:
+    """P candidate masks over N trades; family = which dimension each mask filters."""
+    labels: List[str]
+    family: np.ndarray        # (P,) int
+    masks: np.ndarray         # (P, N) bool
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+
+def _subsets(codes: np.ndarray, names: List[str], family: str):
+    """Every proper non-empty subset of the present labels (bitmask enumeration)."""
+    present = np.unique(codes[codes >= 0])
+    k = len(present)
+    if k < 2:
+        return [], np.empty((0, len(codes)), dtype=bool)
+    bits = np.arange(1, 2 ** k - 1)
+    member = ((bits[:, None] >> np.arange(k)[None, :]) & 1).astype(bool)   # (S, k)
+    lut = np.zeros((len(bits), max(len(names), 1)), dtype=bool)
+    lut[:, present] = member
+    masks = np.where(codes[None, :] >= 0, lut[:, np.maximum(codes, 0)], False)
+    labels = [f"{family} in {{{','.join(names[c] for c in present[m])}}}" for m in member]
+    return labels, masks
+
+
+def _pair_percentile(values: np.ndarray, pair: np.ndarray, fit: np.ndarray) -> np.ndarray:
+    """Percentile of each value among the `fit` values of its own pair (empirical CDF; NaN stays NaN)."""
+    out = np.full(len(values), np.nan)
+    finite = np.isfinite(values)
+    for p in np.unique(pair):
+        rows = pair == p
+        ref = np.sort(values[rows & fit & finite])
+        if len(ref):
+            out[rows] = np.searchsorted(ref, values[rows], side="right") / len(ref) * 100
+    out[~finite] = np.nan
+    return out
+
+
+def build_primitives(trades: pd.DataFrame, max_hour_window: int = 12, atr_quantiles: int = 10,
+                     rr_floors=RR_FLOORS, fit: Optional[np.ndarray] = None) -> Primitives:
+    """
+    Candidate masks over the trades (enrich_signals / trades_detail.csv columns).
+    fit: bool mask of the trades the ATR edges / percentiles are fitted on (None = all);
+         discover_filters passes its in-sample rows so held-out trades do not shape them.
+    """
+    fit = np.ones(len(trades), dtype=bool) if fit is None else np.asarray(fit, dtype=bool)
+    labels: List[str] = []
+    family: List[int] = []
+    blocks: List[np.ndarray] = []
+
+    def add(fam: int, labs: List[str], masks: np.ndarray):
+        labels.extend(labs)
+        family.extend([fam] * len(labs))
+        blocks.append(np.asarray(masks, dtype=bool).reshape(len(labs), len(trades)))
+
+    # Hour windows [start, start + length) mod 24
+    hour = trades["hour"].to_numpy(dtype=np.int64)
+    start, length = np.meshgrid(np.arange(24), np.arange(1, max_hour_window + 1), indexing="ij")
+    start, length = start.ravel(), length.ravel()
+    add(0, [f"hour {s:02d}-{(s + n) % 24:02d}" for s, n in zip(start, length)],
+        ((hour[None, :] - start[:, None]) % 24) < length[:, None])
+
+    # Weekday / session subsets
+    labs, masks = _subsets(trades["day_of_week"].to_numpy(dtype=np.int64), DAY_NAMES, "day")
+    add(1, labs, masks)
+    names, codes = np.unique(trades["session"].astype(str).to_numpy(), return_inverse=True)
+    labs, masks = _subsets(codes.astype(np.int64), list(names), "session")
+    add(2, labs, masks)
+
+    # ATR bands between quantile edges (NaN ATR → excluded); several pairs → ATR
+    # percentile within its own pair (price scales differ). Both fitted on `fit` rows.
+    atr = trades["atr_at_confirm"].to_numpy(dtype=np.float64)
+    name = "ATR"
+    if "pair" in trades.columns and trades["pair"].nunique() > 1:
+        atr = _pair_percentile(atr, trades["pair"].astype(str).to_numpy(), fit)
+        name = "ATR pct"
+    if np.isfinite(atr[fit]).sum() >= atr_quantiles:
+        edges = np.unique(np.nanquantile(atr[fit], np.linspace(0, 1, atr_quantiles + 1)))
+        i, j = np.triu_indices(len(edges), k=1)
+        full = (i == 0) & (j == len(edges) - 1)
+        i, j = i[~full], j[~full]
+        with np.errstate(invalid="ignore"):
+            add(3, [f"{name} {edges[a]:.5g}-{edges[b]:.5g}" for a, b in zip(i, j)],
+                (atr[None, :] >= edges[i][:, None]) & (atr[None, :] <= edges[j][:, None]))
+
+    # Bars-to-confirm limits
+    btc = trades["bars_to_confirm"].to_numpy(dtype=np.float64)
+    cuts = np.asarray(BTC_BINS[1:-1], dtype=np.float64)
+    add(4, [f"btc <= {c:g}" for c in cuts] + [f"btc > {c:g}" for c in cuts],
+        np.vstack([btc[None, :] <= cuts[:, None], btc[None, :] > cuts[:, None]]))
+
+    # R:R floors
+    rr = trades["rr_planned"].to_numpy(dtype=np.float64)
+    floors = np.asarray(rr_floors, dtype=np.float64)
+    add(5, [f"rr >= {f:g}" for f in floors], rr[None, :] >= floors[:, None])
+
+    # Direction
+    direction = trades["direction"].astype(str).to_numpy()
+    add(6, ["BUY only", "SELL only"], np.vstack([direction == "BUY", direction == "SELL"]))
+
+    masks = np.vstack(blocks) if blocks else np.empty((0, len(trades)), dtype=bool)
+    return Primitives(labels=labels, family=np.asarray(family, dtype=np.int64), masks=masks)
+
+
+def pair_stats(masks: np.ndarray, pnl_r: np.ndarray, is_win: np.ndarray):
+    """count, wins, ΣR for every (i, j) AND of primitives: (P, P) each, diagonal = singles."""
+    p = len(masks)
+    count = np.zeros((p, p))
+    wins = np.zeros((p, p))
+    sum_r = np.zeros((p, p))
+    for lo in range(0, masks.shape[1], CHUNK):
+        m = masks[:, lo:lo + CHUNK].astype(np.float64)
+        count += m @ m.T
+        wins += (m * is_win[lo:lo + CHUNK]) @ m.T
+        sum_r += (m * pnl_r[lo:lo + CHUNK]) @ m.T
+    return count, wins, sum_r
+
+
+@dataclass
+class DiscoveryResult:
+    primitives: Primitives
+    table: pd.DataFrame          # ranked candidates (i, j = primitive ids; j = -1 single)
+    baseline: dict
+
+    def top(self, k: int = 10) -> pd.DataFrame:
+        return self.table.head(k)
+
+    def mask(self, row) -> np.ndarray:
+        """Bool mask (over the input trades) of one ranked candidate (table index)."""
+        i, j = int(self.table.at[row, "i"]), int(self.table.at[row, "j"])
+        m = self.primitives.masks[i]
+        return m & self.primitives.masks[j] if j >= 0 else m.copy()
+
+
+def discover_filters(trades: pd.DataFrame, min_trades: int = 30, min_oos: int = 10,
+                     oos_frac: float = 0.3, max_depth: int = 2, require_oos_uplift: bool = True,
+                     primitives: Optional[Primitives] = None) -> DiscoveryResult:
+    """
+    Rank filters by in-sample expectancy (R/trade).
+
+    min_trades:  in-sample trades the filter must keep
+    min_oos:     out-of-sample trades the filter must keep
+    oos_frac:    latest fraction of trades (by confirm_time) held out
+    require_oos_uplift: OOS expectancy must beat taking every OOS trade
+    primitives:  default = build_primitives fitted on the in-sample trades
+    """
+    n = len(trades)
+    if "confirm_time" in trades.columns:
+        order = np.argsort(pd.to_datetime(trades["confirm_time"]).to_numpy(), kind="stable")
+    else:
+        order = np.arange(n)
+    oos = np.zeros(n, dtype=bool)
+    oos[order[n - int(round(n * oos_frac)):]] = True
+    if primitives is None:
+        primitives = build_primitives(trades, fit=~oos)
+
+    pnl = trades["pnl_r"].to_numpy(dtype=np.float64)
+    win = trades["is_win"].to_numpy(dtype=np.float64)
+    cnt_is, win_is, r_is = pair_stats(primitives.masks[:, ~oos], pnl[~oos], win[~oos])
+    cnt_os, win_os, r_os = pair_stats(primitives.masks[:, oos], pnl[oos], win[oos])
+
+    p = len(primitives)
+    i, j = np.triu_indices(p)
+    keep = i == j
+    if max_depth >= 2:
+        keep |= primitives.family[i] != primitives.family[j]
+    i, j = i[keep], j[keep]
+
+    n_is, n_os = cnt_is[i, j], cnt_os[i, j]
+    base = {
+        "n": int((~oos).sum()), "exp_r": pnl[~oos].mean() if (~oos).any() else 0.0,
+        "n_oos": int(oos.sum()), "exp_oos": pnl[oos].mean() if oos.any() else 0.0,
+    }
+    ok = (n_is >= min_trades) & (n_os >= min_oos)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exp_is = r_is[i, j] / n_is
+        exp_os = r_os[i, j] / n_os
+    if require_oos_uplift:
+        ok &= exp_os > base["exp_oos"]
+    i, j = i[ok], j[ok]
+
+    labels = np.asarray(primitives.labels, dtype=object)
+    table = pd.DataFrame({
+        "filter": np.where(i == j, labels[i], labels[i] + " & " + labels[j]),
+        "i": i,
+        "j": np.where(i == j, -1, j),
+        "n": n_is[ok].astype(np.int64),
+        "kept_pct": n_is[ok] / max(base["n"], 1) * 100,
+        "wr": win_is[i, j] / n_is[ok] * 100,
+        "exp_r": exp_is[ok],
+        "pnl_r": r_is[i, j],
+        "n_oos": n_os[ok].astype(np.int64),
+        "wr_oos": win_os[i, j] / n_os[ok] * 100,
+        "exp_oos": exp_os[ok],
+        "pnl_oos": r_os[i, j],
+    })
+    table = (table.sort_values(["exp_r", "n", "j"], ascending=[False, False, True], kind="stable")
+                  .drop_duplicates(["n", "n_oos", "pnl_r", "pnl_oos"])     # same trade set
+                  .reset_index(drop=True))
+    return DiscoveryResult(primitives=primitives, table=table, baseline=base)
+
+
+def print_discovery(label: str, result: DiscoveryResult, top: int = 10):
+    b = result.baseline
+    print(f"\n{'─' * 96}")
+    print(f"  {label} — baseline IS n={b['n']} exp={b['exp_r']:+.3f}R | "
+          f"OOS n={b['n_oos']} exp={b['exp_oos']:+.3f}R | "
+          f"{len(result.primitives)} primitives, {len(result.table)} candidates pass")
+    print(f"{'─' * 96}")
+    if result.table.empty:
+        print("  (no filter passes the sample / out-of-sample constraints)")
+        return
+    print(f"  {'Filter':<44} {'n':>4} {'Kept%':>6} {'WR%':>6} {'Exp R':>7} "
+          f"{'nOOS':>5} {'WR OOS':>7} {'Exp OOS':>8}")
+    for row in result.top(top).itertuples(index=False):
+        print(f"  {row.filter:<44.44} {row.n:>4} {row.kept_pct:>6.1f} {row.wr:>6.1f} "
+              f"{row.exp_r:>+7.3f} {row.n_oos:>5} {row.wr_oos:>7.1f} {row.exp_oos:>+8.3f}")
+
+
+def main():
+    path = os.path.join(OUTPUT_DIR, "trades_detail.csv")
+    if not os.path.exists(path):
+        print(f"⚠️  {path} not found — run timing_analysis.py first")
+        return
+    trades = pd.read_csv(path)
+
+    print("=" * 96)
+    print("MST Medio v2.0 — Filter discovery (rank by IS expectancy, check on latest 30% OOS)")
+    print("=" * 96)
+    for pair, group in trades.groupby("pair"):
+        print_discovery(pair, discover_filters(group.reset_index(drop=True),
+                                               min_trades=10, min_oos=4), top=5)
+    print_discovery("ALL PAIRS", discover_filters(trades, min_trades=20, min_oos=8))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+gates.py — Per-bar pre-trade gates for run_mst_medio(long_ok=..., short_ok=...)
+
+Each builder returns (long_ok, short_ok) bool arrays aligned to df rows, computed
+with whole-column ops. A gate at bar i may only use data known at the open of
+bar i (the signal bar): the confirm candle is bar i-1, HTF values come from the
+last completed HTF bar. NaN inputs (warm-up) leave the bar open (fail-open).
+
+    long_ok, short_ok = combine_gates(htf_trend_gate(df), session_gate(df, ["London"]))
+    signals, _ = run_mst_medio(df, ..., long_ok=long_ok, short_ok=short_ok)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest_htf_filter import pine_tf
+from mtf import mtf_for, ema_of, htf_trend
+from timing_analysis import SESSIONS, calc_atr
+
+Gate = Tuple[np.ndarray, np.ndarray]
+
+
+def _both(mask) -> Gate:
+    mask = np.asarray(mask, dtype=bool)
+    return mask, mask.copy()
+
+
+def htf_trend_gate(df: pd.DataFrame, rule: str = "1h", ema_len: int = 50) -> Gate:
+    """BUY only when the confirm close >= HTF EMA, SELL only when <= (last completed HTF bar)."""
+    ema = mtf_for(df).security(pine_tf(rule), lambda b: ema_of(b.close, ema_len), at="open")
+    prev_close = df["Close"].shift(1).to_numpy()
+    return ~(prev_close < ema), ~(prev_close > ema)
+
+
+def htf_structure_gate(df: pd.DataFrame, tf: str = "15", pivot_len: int = 5) -> Gate:
+    """
+    MST Medio.pine htfTrend (HH / LL of HTF pivots) as a gate: no BUY in an HTF
+    downtrend, no SELL in an HTF uptrend. tf = HTF (Pine f_htfTF: M5 chart → "15").
+    """
+    trend = mtf_for(df).security(tf, lambda b: htf_trend(b, pivot_len), at="open")
+    return ~(trend < 0), ~(trend > 0)
+
+
+def session_gate(df: pd.DataFrame, sessions: Iterable[str]) -> Gate:
+    """Signal bar hour inside one of the timing_analysis.SESSIONS windows (both directions)."""
+    hour = df.index.hour.to_numpy()
+    mask = np.zeros(len(df), dtype=bool)
+    for name in sessions:
+        start_h, end_h = SESSIONS[name]
+        if end_h > 24:
+            mask |= (hour >= start_h) | (hour < end_h - 24)
+        else:
+            mask |= (hour >= start_h) & (hour < end_h)
+    return _both(mask)
+
+
+def calc_adx(df: pd.DataFrame, period: int = 14) -> pd.Series:
+    """Wilder ADX (RMA smoothing)."""
+    high = df["High"]
+    low = df["Low"]
+    up = high.diff()
+    down = -low.diff()
+    plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+    minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+    prev_close = df["Close"].shift(1)
+    tr = pd.concat([high - low, (high - prev_close).abs(), (low - prev_close).abs()],
+                   axis=1).max(axis=1)
+    alpha = 1.0 / period
+    atr = tr.ewm(alpha=alpha, adjust=False).mean()
+    plus_di = 100 * pd.Series(plus_dm, index=df.index).ewm(alpha=alpha, adjust=False).mean() / atr
+    minus_di = 100 * pd.Series(minus_dm, index=df.index).ewm(alpha=alpha, adjust=False).mean() / atr
+    dx = 100 * (plus_di - minus_di).abs() / (plus_di + minus_di)
+    adx = dx.ewm(alpha=alpha, adjust=False).mean()
+    adx.iloc[:2 * period] = np.nan
+    return adx
+
+
+def adx_gate(df: pd.DataFrame, min_adx: float = 20.0, max_adx: Optional[float] = None,
+             period: int = 14) -> Gate:
+    """ADX of the confirm bar within [min_adx, max_adx] (trending regime)."""
+    adx = calc_adx(df, period).shift(1).to_numpy()
+    bad = adx < min_adx
+    if max_adx is not None:
+        bad |= adx > max_adx
+    return _both(~bad)
+
+
+def atr_gate(df: pd.DataFrame, lo: Optional[float] = None, hi: Optional[float] = None,
+             period: int = 14, baseline: int = 288) -> Gate:
+    """
+    Volatility regime: ATR(period) of the confirm bar / its rolling median over
+    `baseline` bars (288 × M5 = 1 day) within [lo, hi].
+    """
+    atr = calc_atr(df, period)
+    ratio = (atr / atr.rolling(baseline, min_periods=period).median()).shift(1).to_numpy()
+    bad = np.zeros(len(df), dtype=bool)
+    if lo is not None:
+        bad |= ratio < lo
+    if hi is not None:
+        bad |= ratio > hi
+    return _both(~bad)
+
+
+def combine_gates(*gates: Gate) -> Gate:
+    """AND of several (long_ok, short_ok) gates."""
+    long_ok = np.logical_and.reduce([g[0] for g in gates])
+    short_ok = np.logical_and.reduce([g[1] for g in gates])
+    return long_ok, short_ok
@@ -0,0 +1,117 @@
+"""
+intrabar.py — M1 resolver for ambiguous same-bar events on M5/M15
+
+When one M5/M15 bar touches both SL and TP (or fills the limit and touches SL/TP),
+the bar-level studies fall back to "SL priority". With M1 data the real order can
+be read from the M1 bars inside that bar only:
+
+1. market_data.BarStore: M1 OHLC as memory-mapped .npy columns, the same store
+   every bar loader uses (data/XAUUSD_M1.csv from tools/save_data.py is converted
+   once into data/.store/XAUUSD_M1/ with the shared CSV clean-up)
+2. BarStore.locate(): bar-time index → [lo, hi) M1 rows of each HTF bar via
+   searchsorted on the mapped time column (only the touched pages are read)
+3. IntrabarResolver.resolve(): for a batch of ambiguous bars, first M1 touch of
+   fill / stop / target → TP or SL first
+
+Cost is proportional to the number of ambiguous bars × M1 bars per bar.
+Ties inside a single M1 bar keep SL priority; bars without M1 coverage return
+INTRABAR_UNKNOWN so the caller keeps its own rule.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from market_data import BarStore, to_epoch
+
+# Resolver results
+INTRABAR_SL = -1
+INTRABAR_NONE = 0       # neither stop nor target touched (after the fill)
+INTRABAR_TP = 1
+INTRABAR_UNKNOWN = 2    # no M1 data for the bar / fill not seen on M1
+
+
+def _first_in_ranges(mask: np.ndarray, offsets: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Position (within its range) of the first True per range; -1 if none."""
+    out = np.full(len(lengths), -1, dtype=np.int64)
+    total = len(mask)
+    ok = lengths > 0
+    if total == 0 or not ok.any():
+        return out
+    pos = np.where(mask, np.arange(total), total)
+    first = np.minimum.reduceat(pos, offsets[:-1][ok])
+    seg_end = offsets[1:][ok]
+    out[ok] = np.where(first < seg_end, first - offsets[:-1][ok], -1)
+    return out
+
+
+class IntrabarResolver:
+    """
+    Orders events inside HTF bars using an M1 BarStore.
+
+    bar_times:   times of the HTF dataset (df.index); bar_seconds: 300 for M5, 900 for M15
+    """
+
+    def __init__(self, store: BarStore, bar_times, bar_seconds: int):
+        self.store = store
+        self.bar_epoch = to_epoch(bar_times)
+        self.bar_seconds = int(bar_seconds)
+        self.calls = 0          # ambiguous bars resolved (for reporting)
+
+    @classmethod
+    def for_df(cls, df: pd.DataFrame, m1_csv: str):
+        """Resolver for df (bar size inferred from the median spacing) or None if m1_csv is missing."""
+        if not os.path.exists(m1_csv):
+            return None
+        step = int(pd.Series(df.index).diff().median().total_seconds())
+        return cls(BarStore.from_csv(m1_csv), df.index, step)
+
+    def resolve(self, bars, direction, stop, target, fill=None) -> np.ndarray:
+        """
+        For each HTF bar index in `bars`: did target or stop come first (from the fill on)?
+
+        direction: +1 BUY (stop / fill on Low, target on High) / -1 SELL (mirrored)
+        stop, target: price levels (target NaN = none)
+        fill:  limit entry price; events before the first M1 touch of it are ignored (None = no fill)
+        """
+        bars = np.atleast_1d(np.asarray(bars, dtype=np.int64))
+        k = len(bars)
+        d = np.broadcast_to(np.asarray(direction, dtype=np.int8), (k,))
+        stop = np.broadcast_to(np.asarray(stop, dtype=np.float64), (k,))
+        target = np.broadcast_to(np.asarray(target, dtype=np.float64), (k,))
+        fill = np.full(k, np.nan) if fill is None else \
+            np.broadcast_to(np.asarray(fill, dtype=np.float64), (k,))
+        self.calls += k
+
+        lo, hi = self.store.locate(self.bar_epoch[bars], self.bar_seconds)
+        lengths = np.maximum(hi - lo, 0)
+        offsets = np.zeros(k + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        rows = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths) + np.repeat(lo, lengths)
+        seg = np.repeat(np.arange(k), lengths)
+
+        hi_px = np.asarray(self.store.high[rows])
+        lo_px = np.asarray(self.store.low[rows])
+        ds = d[seg]
+        adverse = np.where(ds > 0, lo_px, hi_px)
+        favourable = np.where(ds > 0, hi_px, lo_px)
+
+        # Limit fill: BUY trades down to the entry (adverse side), SELL up to it
+        has_fill = ~np.isnan(fill)
+        fill_m = _first_in_ranges((adverse - fill[seg]) * ds <= 0, offsets, lengths)
+        fill_m = np.where(has_fill, fill_m, 0)
+        after = np.arange(offsets[-1]) - offsets[:-1][seg] >= fill_m[seg]
+
+        stop_m = _first_in_ranges(after & ((adverse - stop[seg]) * ds <= 0), offsets, lengths)
+        tgt_m = _first_in_ranges(after & ((favourable - target[seg]) * ds >= 0), offsets, lengths)
+
+        out = np.full(k, INTRABAR_NONE, dtype=np.int8)
+        out[(tgt_m >= 0) & ((stop_m < 0) | (tgt_m < stop_m))] = INTRABAR_TP
+        out[(stop_m >= 0) & ((tgt_m < 0) | (stop_m <= tgt_m))] = INTRABAR_SL
+        out[(lengths == 0) | (fill_m < 0)] = INTRABAR_UNKNOWN
+        return out
+
+    def resolve_one(self, bar: int, direction: int, stop: float, target: float,
+                    fill: float = None) -> int:
+        return int(self.resolve([bar], direction, stop, target, fill)[0])
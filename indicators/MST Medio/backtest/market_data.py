@@ -0,0 +1,225 @@
+"""
+market_data.py — Shared bar loader backed by a memory-mapped columnar store
+
+Every script loads bars through load_data(). The first load of a CSV converts
+it once into a directory of .npy columns (full float64 precision) next to it:
+
+    data/.store/XAUUSD_M5/
+        time.npy                    int64 epoch seconds, sorted (CSV wall time; UTC if tz-aware)
+        open/high/low/close/volume.npy
+        meta.json                   source, rows, columns, timezone, time unit
+
+Later loads memory-map the columns (no CSV / datetime parsing). The store is
+rebuilt when the CSV is newer than it. The CSV clean-up applied on conversion is
+the one every script used to copy: merge Open/open… duplicates from CSV
+merges, drop `symbol`, drop rows without OHLC, drop weekends, sort by time.
+
+    store = BarStore.from_csv(path)
+    store.arrays(["High", "Low"], start="2026-02-01")   # zero-copy mmap slices
+    load_data(path, start=..., end=..., columns=[...])   # DataFrame of that slice only
+
+Date ranges are pushed down as a searchsorted on the time column, columns by
+only opening the requested files; DataFrames copy just the selected slice.
+"""
+
+import os
+import json
+from datetime import timedelta, timezone
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+STORE_VERSION = 1
+PRICE_COLUMNS = ("Open", "High", "Low", "Close")
+BAR_COLUMNS = PRICE_COLUMNS + ("Volume",)
+
+
+def to_epoch(times) -> np.ndarray:
+    """Datetimes → int64 epoch seconds (naive = wall time, tz-aware = UTC)."""
+    return np.asarray(pd.DatetimeIndex(times).values.astype("datetime64[s]").astype(np.int64))
+
+
+def read_csv_bars(csv_path: str) -> pd.DataFrame:
+    """Parse and clean a bar CSV (datetime index, Open/High/Low/Close[/Volume])."""
+    df = pd.read_csv(csv_path, parse_dates=["datetime"])
+    df.set_index("datetime", inplace=True)
+    df.sort_index(inplace=True, kind="stable")
+    # Merge uppercase and lowercase columns (CSV merge artifact: old Open…, new open…)
+    for cu, cl in zip(BAR_COLUMNS, (c.lower() for c in BAR_COLUMNS)):
+        if cu in df.columns and cl in df.columns:
+            df[cu] = df[cu].fillna(df[cl])
+            df.drop(columns=[cl], inplace=True, errors="ignore")
+    df.drop(columns=["symbol"], inplace=True, errors="ignore")
+    df.dropna(subset=list(PRICE_COLUMNS), inplace=True)
+    df = df[df.index.dayofweek < 5]
+    return df
+
+
+def _tz_meta(index: pd.DatetimeIndex):
+    """JSON form of the index timezone: None, a zone name, or a fixed offset in seconds."""
+    tz = index.tz
+    if tz is None:
+        return None
+    name = getattr(tz, "key", None) or getattr(tz, "zone", None)
+    if name:
+        return name
+    return int(tz.utcoffset(None).total_seconds())
+
+
+def _tz_from_meta(tz):
+    if tz is None or isinstance(tz, str):
+        return tz
+    return timezone(timedelta(seconds=tz))
+
+
+class BarStore:
+    """Memory-mapped bar columns of one CSV (see module doc for the layout)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.time = np.load(os.path.join(path, "time.npy"), mmap_mode="r")
+        self._cols: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        """Lower-case column access (store.high, store.close…) as mmap arrays."""
+        meta = self.__dict__.get("meta", {})
+        if name.startswith("_") or name.capitalize() not in meta.get("columns", ()):
+            raise AttributeError(name)
+        return self.column(name.capitalize())
+
+    @property
+    def columns(self) -> list:
+        return list(self.meta["columns"])
+
+    def column(self, name: str) -> np.ndarray:
+        """Full column as a read-only memory map (opened on first use)."""
+        if name not in self._cols:
+            if name not in self.meta["columns"]:
+                raise KeyError(f"{name!r} not in store {self.path} (columns: {self.columns})")
+            self._cols[name] = np.load(os.path.join(self.path, f"{name.lower()}.npy"), mmap_mode="r")
+        return self._cols[name]
+
+    @staticmethod
+    def _store_dir(csv_path: str) -> str:
+        base = os.path.splitext(os.path.basename(csv_path))[0]
+        return os.path.join(os.path.dirname(csv_path), ".store", base)
+
+    @classmethod
+    def from_csv(cls, csv_path: str, store_dir: str = None, rebuild: bool = False) -> "BarStore":
+        """
+        Open the store for csv_path, converting it first if missing, older than the
+        CSV or written by another store version. Default: <csv dir>/.store/<csv name>
+        """
+        if store_dir is None:
+            store_dir = cls._store_dir(csv_path)
+        meta_path = os.path.join(store_dir, "meta.json")
+        stale = rebuild or not os.path.exists(meta_path)
+        if not stale and os.path.exists(csv_path):
+            stale = os.path.getmtime(meta_path) < os.path.getmtime(csv_path)
+        if not stale:
+            with open(meta_path) as f:
+                stale = json.load(f).get("version") != STORE_VERSION
+        if stale:
+            cls.write(read_csv_bars(csv_path), store_dir, source=os.path.basename(csv_path))
+        return cls(store_dir)
+
+    @classmethod
+    def write(cls, df: pd.DataFrame, store_dir: str, source: str = "") -> "BarStore":
+        """Save a bar DataFrame (datetime index) as a store."""
+        os.makedirs(store_dir, exist_ok=True)
+        index = pd.DatetimeIndex(df.index)
+        columns = [c for c in BAR_COLUMNS if c in df.columns]
+        np.save(os.path.join(store_dir, "time.npy"), to_epoch(index))
+        for col in columns:
+            np.save(os.path.join(store_dir, f"{col.lower()}.npy"), df[col].to_numpy(dtype=np.float64))
+        # meta.json last: its presence / mtime marks a complete store
+        with open(os.path.join(store_dir, "meta.json"), "w") as f:
+            json.dump({"version": STORE_VERSION, "source": source, "rows": int(len(df)),
+                       "columns": columns, "tz": _tz_meta(index),
+                       "unit": np.datetime_data(index.values.dtype)[0]}, f)
+        return cls(store_dir)
+
+    def _epoch(self, t) -> int:
+        ts = pd.Timestamp(t)
+        tz = _tz_from_meta(self.meta.get("tz"))
+        if tz is not None:
+            ts = ts.tz_localize(tz) if ts.tz is None else ts
+        elif ts.tz is not None:
+            ts = ts.tz_localize(None)
+        return int(to_epoch([ts])[0])
+
+    def rows(self, start=None, end=None) -> tuple:
+        """[lo, hi) rows with start <= time <= end (either bound optional)."""
+        lo = 0 if start is None else int(np.searchsorted(self.time, self._epoch(start), side="left"))
+        hi = len(self) if end is None else int(np.searchsorted(self.time, self._epoch(end), side="right"))
+        return lo, max(lo, hi)
+
+    def arrays(self, columns: Optional[Sequence[str]] = None, start=None, end=None) -> Dict[str, np.ndarray]:
+        """Zero-copy mmap slices of the requested columns ("time" = epoch seconds)."""
+        lo, hi = self.rows(start, end)
+        out = {}
+        for name in (self.columns if columns is None else columns):
+            out[name] = self.time[lo:hi] if name == "time" else self.column(name)[lo:hi]
+        return out
+
+    def index(self, lo: int = 0, hi: int = None) -> pd.DatetimeIndex:
+        """DatetimeIndex of rows [lo, hi) (same unit / timezone as the source CSV)."""
+        t = np.asarray(self.time[lo:hi]).astype("datetime64[s]").astype(f"datetime64[{self.meta['unit']}]")
+        tz = _tz_from_meta(self.meta.get("tz"))
+        if tz is None:
+            return pd.DatetimeIndex(t, name="datetime")
+        return pd.DatetimeIndex(t, name="datetime").tz_localize("UTC").tz_convert(tz)
+
+    def to_frame(self, columns: Optional[Sequence[str]] = None, start=None, end=None) -> pd.DataFrame:
+        """DataFrame of the selected rows / columns (only this slice is read and copied)."""
+        lo, hi = self.rows(start, end)
+        cols = self.columns if columns is None else list(columns)
+        return pd.DataFrame({c: np.array(self.column(c)[lo:hi]) for c in cols},
+                            index=self.index(lo, hi))
+
+    def locate(self, bar_times, bar_seconds: int):
+        """[lo, hi) rows inside each coarser bar [t, t + bar_seconds) (e.g. M1 rows of M5 bars)."""
+        t0 = to_epoch(bar_times) if not np.issubdtype(np.asarray(bar_times).dtype, np.integer) \
+            else np.asarray(bar_times, dtype=np.int64)
+        lo = np.searchsorted(self.time, t0, side="left")
+        hi = np.searchsorted(self.time, t0 + bar_seconds, side="left")
+        return lo, hi
+
+
+def load_data(path: str, start=None, end=None, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Bars of a data CSV as a DataFrame (datetime index, Open/High/Low/Close/Volume),
+    read from its store (converted on first use). start / end: inclusive time bounds.
+    """
+    return BarStore.from_csv(path).to_frame(columns, start, end)
+
+
+def main():
+    import sys
+    import time
+
+    paths = sys.argv[1:] or sorted(
+        os.path.join(DATA_DIR, f) for f in os.listdir(DATA_DIR) if f.endswith(".csv"))
+    print(f"{'File':<20} {'Rows':>8} {'CSV ms':>8} {'Store ms':>9}  Range")
+    for path in paths:
+        store = BarStore.from_csv(path)
+        t0 = time.perf_counter()
+        read_csv_bars(path)
+        t_csv = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        df = load_data(path)
+        t_store = time.perf_counter() - t0
+        span = f"{df.index[0]} → {df.index[-1]}" if len(df) else "-"
+        print(f"{os.path.basename(path):<20} {len(store):>8} {t_csv * 1e3:>8.1f} {t_store * 1e3:>9.1f}  {span}")
+
+
+if __name__ == "__main__":
+    main()
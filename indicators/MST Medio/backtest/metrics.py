@@ -0,0 +1,193 @@
+"""
+metrics.py — Trade statistics in R (one definition for every script)
+
+Batch path: trade_metrics(pnl_r) on an array of trade PnLs in close order —
+WR, PF, expectancy, drawdown (cumsum / maximum.accumulate), streaks. Works on a
+(configs × trades) matrix too (statistics along the last axis).
+
+Online path: MetricsAccumulator keeps the same statistics in O(1) memory, for
+engines / sweeps that update as trades close instead of storing them:
+
+    acc = MetricsAccumulator()
+    for trade in ...: acc.update(trade.pnl_r)
+    acc.update_many(pnl_chunk)        # vectorized, same result as one update per value
+    acc.summary()                     # same keys as trade_metrics()
+"""
+
+import math
+from typing import Dict, Iterable
+
+import numpy as np
+
+KEYS = ("trades", "wins", "losses", "be", "wr", "pnl", "avg_trade", "avg_win", "avg_loss",
+        "std", "profit_factor", "max_dd", "best_trade", "worst_trade",
+        "max_win_streak", "max_loss_streak")
+
+
+def max_drawdown(pnl_r) -> np.ndarray:
+    """Max peak-to-trough drop of the cumulative R curve (curve starts at 0)."""
+    pnl = np.asarray(pnl_r, dtype=np.float64)
+    if pnl.shape[-1] == 0:
+        return np.zeros(pnl.shape[:-1])
+    equity = np.cumsum(pnl, axis=-1)
+    peak = np.maximum(np.maximum.accumulate(equity, axis=-1), 0.0)
+    return (peak - equity).max(axis=-1)
+
+
+def max_streak(flags) -> np.ndarray:
+    """Longest run of True along the last axis."""
+    flags = np.asarray(flags, dtype=bool)
+    if flags.shape[-1] == 0:
+        return np.zeros(flags.shape[:-1], dtype=np.int64)
+    idx = np.arange(flags.shape[-1])
+    # Run length at i = i - last False position at or before i
+    last_reset = np.maximum.accumulate(np.where(flags, -1, idx), axis=-1)
+    return (idx - last_reset).max(axis=-1)
+
+
+def trade_metrics(pnl_r) -> Dict:
+    """Statistics of trade PnLs (R) in close order; 2-D input → one value per row."""
+    pnl = np.asarray(pnl_r, dtype=np.float64)
+    n = pnl.shape[-1]
+    win = pnl > 0
+    loss = pnl < 0
+    wins = win.sum(axis=-1)
+    losses = loss.sum(axis=-1)
+    total = pnl.sum(axis=-1)
+    win_sum = np.where(win, pnl, 0.0).sum(axis=-1)
+    loss_sum = np.where(loss, pnl, 0.0).sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = {
+            "trades": n,
+            "wins": wins,
+            "losses": losses,
+            "be": n - wins - losses,
+            "wr": wins / n * 100 if n else np.zeros_like(total),
+            "pnl": total,
+            "avg_trade": total / n if n else np.zeros_like(total),
+            "avg_win": np.where(wins > 0, win_sum / wins, 0.0),
+            "avg_loss": np.where(losses > 0, loss_sum / losses, 0.0),
+            "std": pnl.std(axis=-1, ddof=1) if n > 1 else np.zeros_like(total),
+            "profit_factor": np.where(loss_sum != 0, np.abs(win_sum / loss_sum), np.inf),
+            "max_dd": max_drawdown(pnl),
+            "best_trade": pnl.max(axis=-1) if n else np.zeros_like(total),
+            "worst_trade": pnl.min(axis=-1) if n else np.zeros_like(total),
+            "max_win_streak": max_streak(win),
+            "max_loss_streak": max_streak(loss),
+        }
+    if pnl.ndim == 1:
+        out = {k: (v.item() if isinstance(v, (np.ndarray, np.generic)) else v) for k, v in out.items()}
+    return out
+
+
+class MetricsAccumulator:
+    """O(1)-memory running version of trade_metrics() (trades fed in close order)."""
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.wins = 0
+        self.losses = 0
+        self.win_sum = 0.0
+        self.loss_sum = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0              # Welford: Σ(x - mean)²
+        self.equity = 0.0
+        self.peak = 0.0
+        self.max_dd = 0.0
+        self.best = -math.inf
+        self.worst = math.inf
+        self.win_run = 0
+        self.loss_run = 0
+        self.max_win_streak = 0
+        self.max_loss_streak = 0
+
+    def update(self, pnl_r: float):
+        x = float(pnl_r)
+        self.n += 1
+        self.total += x
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+        if x > 0:
+            self.wins += 1
+            self.win_sum += x
+            self.win_run += 1
+            self.loss_run = 0
+        elif x < 0:
+            self.losses += 1
+            self.loss_sum += x
+            self.loss_run += 1
+            self.win_run = 0
+        else:
+            self.win_run = self.loss_run = 0
+        self.max_win_streak = max(self.max_win_streak, self.win_run)
+        self.max_loss_streak = max(self.max_loss_streak, self.loss_run)
+        self.equity += x
+        self.peak = max(self.peak, self.equity)
+        self.max_dd = max(self.max_dd, self.peak - self.equity)
+        self.best = max(self.best, x)
+        self.worst = min(self.worst, x)
+
+    def update_many(self, pnl_r: Iterable[float]):
+        """Feed a chunk at once (vectorized; state carries across chunks)."""
+        x = np.asarray(pnl_r, dtype=np.float64).ravel()
+        k = len(x)
+        if k == 0:
+            return
+        # Mean / M2 (Chan et al. parallel merge)
+        mean_b = x.mean()
+        m2_b = ((x - mean_b) ** 2).sum()
+        n = self.n + k
+        d = mean_b - self.mean
+        self.m2 += m2_b + d * d * self.n * k / n
+        self.mean += d * k / n
+        self.n = n
+        self.total += float(x.sum())
+
+        win, loss = x > 0, x < 0
+        self.wins += int(win.sum())
+        self.losses += int(loss.sum())
+        self.win_sum += float(x[win].sum())
+        self.loss_sum += float(x[loss].sum())
+
+        # Drawdown continues from the running equity / peak
+        equity = self.equity + np.cumsum(x)
+        peak = np.maximum(np.maximum.accumulate(equity), self.peak)
+        self.max_dd = max(self.max_dd, float((peak - equity).max()))
+        self.equity = float(equity[-1])
+        self.peak = float(peak[-1])
+        self.best = max(self.best, float(x.max()))
+        self.worst = min(self.worst, float(x.min()))
+
+        # Streaks: prepend the open run so it continues into the chunk
+        for flags, run, attr in ((win, self.win_run, "win"), (loss, self.loss_run, "loss")):
+            idx = np.arange(1, k + 1)
+            last_reset = np.maximum.accumulate(np.where(flags, -1, idx))
+            runs = np.where(last_reset < 0, idx + run, idx - last_reset)
+            setattr(self, f"{attr}_run", int(runs[-1]))
+            best = max(getattr(self, f"max_{attr}_streak"), int(runs.max()))
+            setattr(self, f"max_{attr}_streak", best)
+
+    def summary(self) -> Dict:
+        n = self.n
+        if n == 0:
+            return {k: 0 for k in KEYS}
+        return {
+            "trades": n,
+            "wins": self.wins,
+            "losses": self.losses,
+            "be": n - self.wins - self.losses,
+            "wr": self.wins / n * 100,
+            "pnl": self.total,
+            "avg_trade": self.total / n,
+            "avg_win": self.win_sum / self.wins if self.wins else 0.0,
+            "avg_loss": self.loss_sum / self.losses if self.losses else 0.0,
+            "std": math.sqrt(self.m2 / (n - 1)) if n > 1 else 0.0,
+            "profit_factor": abs(self.win_sum / self.loss_sum) if self.loss_sum != 0 else math.inf,
+            "max_dd": self.max_dd,
+            "best_trade": self.best,
+            "worst_trade": self.worst,
+            "max_win_streak": self.max_win_streak,
+            "max_loss_streak": self.max_loss_streak,
+        }
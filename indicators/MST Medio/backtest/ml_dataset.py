@@ -0,0 +1,238 @@
+"""
+ml_dataset.py — Fixed-length bar windows + labels per MST Medio setup (ML datasets)
+
+Each sample is the window of the last `window` bars ending at the setup's confirm
+bar, labelled with the setup's outcome. Windows are never materialized:
+
+- per-bar features are computed once into a float32 (bars × features) matrix
+- sliding_window_view over that matrix gives every window as a zero-copy
+  (bars - window + 1, window, features) view
+- a sample is just its end bar; X[i] is a view, batch(rows) copies one batch
+
+On disk (.npz) the dataset is the bar matrix once + end bars + labels, so the file
+size does not grow with the window length and millions of samples stay small.
+
+Per-bar features (stationary, scaled by ATR so pairs can be mixed):
+    ret_atr, range_atr, body_atr, upper_wick_atr, lower_wick_atr, close_pos,
+    atr_pct, hour_sin, hour_cos
+Labels: direction, result (code into RESULTS), pnl_r (engine), filled (the engine
+filled the limit order), mfe_r (best R before the original SL, measured from the
+limit fill bar) and mfe_bars (fill → MFE bar), rr. Unfilled setups (UNFILLED /
+PENDING) keep their sample but get mfe_r = NaN and mfe_bars = -1.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from fast_exits import BarIndex, fill_bars, mfe_before_stop
+from market_data import load_data
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "analysis_output")
+
+ATR_PERIOD = 14
+WINDOW = 64
+FEATURES = ("ret_atr", "range_atr", "body_atr", "upper_wick_atr", "lower_wick_atr",
+            "close_pos", "atr_pct", "hour_sin", "hour_cos")
+RESULTS = ("UNFILLED", "PENDING", "OPEN", "SL", "TP", "CLOSE_REVERSE")
+
+
+def bar_features(df: pd.DataFrame, atr_period: int = ATR_PERIOD) -> np.ndarray:
+    """float32 (bars × FEATURES) matrix; NaN during the ATR warm-up."""
+    from timing_analysis import calc_atr
+
+    o, h, l, c = (df[col].to_numpy(dtype=np.float64) for col in ("Open", "High", "Low", "Close"))
+    atr = calc_atr(df, atr_period).to_numpy()
+    atr = np.where(atr > 0, atr, np.nan)
+    prev_c = np.concatenate([[np.nan], c[:-1]])
+    rng = h - l
+    hour = (df.index.hour + df.index.minute / 60.0).to_numpy() * (2 * np.pi / 24)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cols = [
+            (c - prev_c) / atr,
+            rng / atr,
+            (c - o) / atr,
+            (h - np.maximum(o, c)) / atr,
+            (np.minimum(o, c) - l) / atr,
+            np.where(rng > 0, (c - l) / rng, 0.5),
+            atr / c * 100,
+            np.sin(hour),
+            np.cos(hour),
+        ]
+    return np.stack(cols, axis=1).astype(np.float32)
+
+
+@dataclass
+class SetupDataset:
+    """
+    features: (bars × F) float32, shared by every window
+    end_bar:  (samples,) bar index of each window's last bar (confirm bar)
+    labels:   per-sample arrays (see module doc) + end_time (int64 ns)
+    """
+    features: np.ndarray
+    end_bar: np.ndarray
+    labels: Dict[str, np.ndarray]
+    window: int = WINDOW
+    names: tuple = FEATURES
+
+    def __len__(self) -> int:
+        return len(self.end_bar)
+
+    @property
+    def windows(self) -> np.ndarray:
+        """Every window of the bar matrix: (bars - window + 1, window, F), zero-copy."""
+        return sliding_window_view(self.features, self.window, axis=0).transpose(0, 2, 1)
+
+    @property
+    def X(self) -> np.ndarray:
+        """Sample windows (samples × window × F). Fancy indexing copies — use batch() for large sets."""
+        return self.windows[self.end_bar - self.window + 1]
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        """Window of sample i as a (window × F) view."""
+        return self.windows[self.end_bar[i] - self.window + 1]
+
+    def batch(self, rows) -> tuple:
+        """(X copy for `rows`, labels for `rows`) — only this batch is materialized."""
+        rows = np.asarray(rows)
+        return (self.windows[self.end_bar[rows] - self.window + 1],
+                {k: v[rows] for k, v in self.labels.items()})
+
+    def batches(self, size: int = 4096, shuffle: bool = False, seed: int = 42):
+        order = np.random.default_rng(seed).permutation(len(self)) if shuffle else np.arange(len(self))
+        for lo in range(0, len(order), size):
+            yield self.batch(order[lo:lo + size])
+
+    def save(self, path: str, compressed: bool = True):
+        save = np.savez_compressed if compressed else np.savez
+        save(path, features=self.features, end_bar=self.end_bar,
+             window=np.array(self.window), names=np.array(self.names),
+             **{f"label_{k}": v for k, v in self.labels.items()})
+
+    @classmethod
+    def load(cls, path: str) -> "SetupDataset":
+        with np.load(path, allow_pickle=False) as z:
+            labels = {k[len("label_"):]: z[k] for k in z.files if k.startswith("label_")}
+            return cls(features=z["features"], end_bar=z["end_bar"], labels=labels,
+                       window=int(z["window"]), names=tuple(str(x) for x in z["names"]))
+
+    @classmethod
+    def concat(cls, datasets: List["SetupDataset"]) -> "SetupDataset":
+        """Stack datasets (e.g. pairs): bar matrices are appended, end bars shifted.
+        Windows never cross a boundary since each end bar is >= window - 1 within its own part."""
+        if not datasets:
+            raise ValueError("concat needs at least one dataset")
+        window = datasets[0].window
+        if any(ds.window != window for ds in datasets):
+            raise ValueError("all datasets must share the same window length")
+        offsets = np.cumsum([0] + [len(ds.features) for ds in datasets[:-1]])
+        return cls(
+            features=np.concatenate([ds.features for ds in datasets]),
+            end_bar=np.concatenate([ds.end_bar + off for ds, off in zip(datasets, offsets)]),
+            labels={k: np.concatenate([ds.labels[k] for ds in datasets]) for k in datasets[0].labels},
+            window=window, names=datasets[0].names,
+        )
+
+
+def build_dataset(df: pd.DataFrame, signals, window: int = WINDOW, pair_id: int = 0) -> SetupDataset:
+    """Dataset of every engine signal whose window has complete features."""
+    from strategy_mst_medio import signals_to_arrays
+
+    features = bar_features(df)
+    if not signals:
+        labels = {k: np.zeros(0) for k in ("direction", "result", "pnl_r", "mfe_r",
+                                           "mfe_bars", "rr", "pair", "end_time")}
+        labels["filled"] = np.zeros(0, dtype=bool)
+        return SetupDataset(features, np.zeros(0, dtype=np.int64), labels, window)
+    arr = signals_to_arrays(signals)
+    end_bar = arr["start"] - 1                                 # confirm bar
+    ok = (end_bar >= window - 1) & (end_bar < len(df)) & (arr["risk"] > 0)
+    # Complete window = no NaN feature (ATR warm-up) in any of its bars
+    bad = np.concatenate([[0], np.cumsum(np.isnan(features).any(axis=1))])
+    safe = np.clip(end_bar, window - 1, len(df) - 1)
+    ok &= bad[safe + 1] - bad[safe + 1 - window] == 0
+    rows = np.flatnonzero(ok)
+
+    arr = {k: v[rows] for k, v in arr.items()}
+    # MFE from the limit fill (same bar the engine filled on), filled setups only
+    index = BarIndex.from_df(df)
+    filled = np.array([signals[i].filled for i in rows], dtype=bool)
+    fill = fill_bars(index, arr["start"], arr["direction"], arr["entry"])
+    filled &= fill < index.n
+    mfe = mfe_before_stop(index, fill[filled], arr["direction"][filled],
+                          arr["entry"][filled], arr["sl"][filled])
+    mfe_r = np.full(len(rows), np.nan, dtype=np.float32)
+    mfe_r[filled] = np.maximum(mfe.mfe_r, 0.0)
+    mfe_bars = np.full(len(rows), -1, dtype=np.int32)
+    mfe_bars[filled] = np.where(mfe.mfe_bar >= 0, mfe.mfe_bar - mfe.start, -1)
+    code = {r: i for i, r in enumerate(RESULTS)}
+    return SetupDataset(
+        features=features,
+        end_bar=end_bar[rows],
+        labels={
+            "direction": arr["direction"],
+            "result": np.array([code.get(signals[i].result, -1) for i in rows], dtype=np.int8),
+            "pnl_r": np.array([signals[i].pnl_r for i in rows], dtype=np.float32),
+            "filled": filled,
+            "mfe_r": mfe_r,
+            "mfe_bars": mfe_bars,
+            "rr": (np.abs(arr["tp"] - arr["entry"]) / arr["risk"]).astype(np.float32),
+            "pair": np.full(len(rows), pair_id, dtype=np.int8),
+            "end_time": df.index.values[end_bar[rows]].astype("datetime64[ns]").astype(np.int64),
+        },
+        window=window,
+    )
+
+
+def main():
+    from strategy_mst_medio import run_mst_medio
+
+    PAIRS = [
+        ("XAUUSD", "XAUUSD_M5.csv"),
+        ("EURUSD", "EURUSD_M5.csv"),
+        ("USDJPY", "USDJPY_M5.csv"),
+        ("BTCUSD", "BTCUSD_M5.csv"),
+    ]
+
+    print("=" * 72)
+    print(f"MST Medio v2.0 — ML dataset ({WINDOW}-bar windows ending at confirm, {len(FEATURES)} features)")
+    print("=" * 72)
+    parts = []
+    for pair_id, (symbol, filename) in enumerate(PAIRS):
+        filepath = os.path.join(DATA_DIR, filename)
+        if not os.path.exists(filepath):
+            print(f"  ⚠️ {symbol}: No data file ({filename})")
+            continue
+        df = load_data(filepath)
+        signals, _ = run_mst_medio(df, pivot_len=5, break_mult=0.25, impulse_mult=1.5,
+                                   min_rr=0, tp_mode="confirm", debug=False)
+        ds = build_dataset(df, signals, pair_id=pair_id)
+        res = ds.labels["result"]
+        filled = ds.labels["filled"]
+        print(f"  {symbol:<8} {len(df):>7} bars  {len(ds):>5} samples ({filled.sum():>4} filled)  "
+              f"TP {(res == RESULTS.index('TP')).sum():>4}  SL {(res == RESULTS.index('SL')).sum():>4}  "
+              f"avg MFE {ds.labels['mfe_r'][filled].mean() if filled.any() else 0:>5.2f}R")
+        parts.append(ds)
+    if not parts:
+        return
+
+    ds = SetupDataset.concat(parts)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    path = os.path.join(OUTPUT_DIR, "ml_dataset.npz")
+    ds.save(path)
+    dense = len(ds) * ds.window * len(ds.names) * ds.features.itemsize
+    print("-" * 72)
+    print(f"  {len(ds)} samples × {ds.window} × {len(ds.names)}  →  {path}")
+    print(f"  on disk {os.path.getsize(path) / 1e6:.2f} MB  (materialized windows: {dense / 1e6:.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
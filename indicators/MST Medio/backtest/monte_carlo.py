@@ -0,0 +1,148 @@
+"""
+monte_carlo.py — Bootstrap / shuffle resampling of trade sequences (R)
+
+One backtest = one trade order on a few weeks of data. Resampling the trade PnLs
+gives the spread of outcomes the same edge could have produced:
+
+- "bootstrap": draw trades with replacement (total R, WR, DD all vary)
+- "shuffle":   random order of the same trades (total / WR fixed, path risk varies)
+- "block":     circular block bootstrap (keeps streaks of block_len trades together)
+
+Simulations are generated as (sims × trades) blocks of at most BLOCK_ELEMS values;
+only per-simulation scalars (total, WR, max DD, ruin) are kept.
+
+    mc = monte_carlo(pnl_r, n_sims=10_000, ruin_r=10)
+    mc.summary()            # total / WR intervals, DD quantiles, ruin probability
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from metrics import max_drawdown
+
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "analysis_output")
+
+BLOCK_ELEMS = 4_000_000       # values per generated block (~32 MB float64)
+METHODS = ("bootstrap", "shuffle", "block")
+
+
+def resample(pnl_r: np.ndarray, rows: int, rng: np.random.Generator,
+             method: str = "bootstrap", block_len: int = 5) -> np.ndarray:
+    """(rows × trades) matrix of resampled trade sequences."""
+    n = len(pnl_r)
+    if method == "bootstrap":
+        return pnl_r[rng.integers(0, n, size=(rows, n))]
+    if method == "shuffle":
+        return rng.permuted(np.broadcast_to(pnl_r, (rows, n)), axis=1)
+    if method == "block":
+        k = -(-n // block_len)
+        starts = rng.integers(0, n, size=(rows, k, 1))
+        idx = ((starts + np.arange(block_len)) % n).reshape(rows, k * block_len)[:, :n]
+        return pnl_r[idx]
+    raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+
+
+@dataclass
+class MonteCarloResult:
+    """Per-simulation statistics (length n_sims)."""
+    method: str
+    n_trades: int
+    total_r: np.ndarray
+    win_rate: np.ndarray
+    max_dd: np.ndarray
+    ruined: np.ndarray        # cumulative R touched -ruin_r
+    ruin_r: float
+
+    @property
+    def n_sims(self) -> int:
+        return len(self.total_r)
+
+    def summary(self, level: float = 0.90) -> Dict:
+        """Central `level` intervals for total R / WR, DD quantiles, ruin / loss probability."""
+        lo, hi = (1 - level) / 2 * 100, (1 + level) / 2 * 100
+        if self.n_sims == 0:
+            return {}
+        t_lo, t_med, t_hi = np.percentile(self.total_r, [lo, 50, hi])
+        w_lo, w_hi = np.percentile(self.win_rate, [lo, hi])
+        dd_med, dd_hi = np.percentile(self.max_dd, [50, hi])
+        return {
+            "mc_total_lo": t_lo,
+            "mc_total_med": t_med,
+            "mc_total_hi": t_hi,
+            "mc_wr_lo": w_lo,
+            "mc_wr_hi": w_hi,
+            "mc_dd_med": dd_med,
+            "mc_dd_hi": dd_hi,
+            "mc_p_loss": (self.total_r < 0).mean() * 100,
+            "mc_ruin_pct": self.ruined.mean() * 100,
+        }
+
+
+def monte_carlo(pnl_r, n_sims: int = 10_000, method: str = "bootstrap", block_len: int = 5,
+                ruin_r: float = 10.0, seed: Optional[int] = 42,
+                block_elems: int = BLOCK_ELEMS) -> MonteCarloResult:
+    """
+    Resample trade PnLs n_sims times.
+
+    ruin_r: a simulation is ruined when its cumulative R reaches -ruin_r
+            (e.g. 10 = losing 10 % of the account at 1 % risk, non-compounded)
+    """
+    pnl = np.asarray(pnl_r, dtype=np.float64)
+    n = len(pnl)
+    total = np.zeros(n_sims)
+    wr = np.zeros(n_sims)
+    dd = np.zeros(n_sims)
+    ruined = np.zeros(n_sims, dtype=bool)
+    if n == 0:
+        return MonteCarloResult(method, 0, total, wr, dd, ruined, ruin_r)
+
+    rng = np.random.default_rng(seed)
+    rows = max(1, block_elems // n)
+    for lo in range(0, n_sims, rows):
+        hi = min(n_sims, lo + rows)
+        sims = resample(pnl, hi - lo, rng, method, block_len)
+        equity = np.cumsum(sims, axis=1)
+        total[lo:hi] = equity[:, -1]
+        wr[lo:hi] = (sims > 0).mean(axis=1) * 100
+        dd[lo:hi] = max_drawdown(sims)
+        ruined[lo:hi] = equity.min(axis=1) <= -ruin_r
+    return MonteCarloResult(method, n, total, wr, dd, ruined, ruin_r)
+
+
+def print_monte_carlo(label: str, mc: MonteCarloResult, level: float = 0.90):
+    s = mc.summary(level)
+    if not s:
+        return
+    print(f"  {label:<26s} n={mc.n_trades:>4d}  total {s['mc_total_lo']:>+7.1f} / "
+          f"{s['mc_total_med']:>+7.1f} / {s['mc_total_hi']:>+7.1f}R  "
+          f"WR {s['mc_wr_lo']:>5.1f}–{s['mc_wr_hi']:.1f}%  "
+          f"DD p50 {s['mc_dd_med']:>5.1f}R p{(1 + level) / 2 * 100:.0f} {s['mc_dd_hi']:>5.1f}R  "
+          f"P(loss) {s['mc_p_loss']:>5.1f}%  ruin {s['mc_ruin_pct']:>5.1f}%")
+
+
+def main():
+    path = os.path.join(OUTPUT_DIR, "trades_detail.csv")
+    if not os.path.exists(path):
+        print(f"⚠️  {path} not found — run timing_analysis.py first")
+        return
+    trades = pd.read_csv(path)
+
+    print("=" * 120)
+    print("MST Medio v2.0 — Monte Carlo of closed trades (100k sims, 90% intervals, ruin = -10R)")
+    print("=" * 120)
+    for method in METHODS:
+        print(f"\n  ── {method} ──")
+        for pair, group in trades.groupby("pair"):
+            print_monte_carlo(pair, monte_carlo(group["pnl_r"].to_numpy(), 100_000, method))
+        print_monte_carlo("ALL PAIRS", monte_carlo(trades["pnl_r"].to_numpy(), 100_000, method))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+mtf.py — request.security()-style higher-timeframe context for the Python studies
+
+Builds HTF bars from the base bars with integer bucket math on epoch seconds and
+aligns HTF values back onto base bars with Pine's non-repainting semantics
+(lookahead_off): an HTF bar's value becomes visible on the base bar that closes it.
+
+    mtf = mtf_for(df)                                   # HTF bars cached per dataset (LRU)
+    h1 = mtf.bars("60")                                 # HTF OHLC arrays
+    ema = mtf.security("60", lambda b: ema_of(b.close, 50))      # value at base bar close
+    ema_open = mtf.security("60", ..., at="open")       # known at base bar open (signal bar)
+    trend = mtf.security(htf_tf("5"), lambda b: htf_trend(b, 5))  # = MST Medio.pine htfTrend
+
+Timeframes use Pine strings ("1", "5", "15", "60", "240", "D", "W", "M").
+Buckets follow the data's wall clock (CSV times are UTC+7); weeks start on Monday.
+The last HTF bar of the data is treated as still forming.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# Pine f_htfTF(): chart timeframe → HTF used for htfTrend
+HTF_OF = {"1": "5", "5": "15", "15": "60", "30": "120", "60": "240",
+          "120": "D", "240": "D", "D": "W", "W": "M"}
+
+# HTF bars of recent (dataset, timeframe) pairs, least recently used evicted first
+CACHE_SIZE = 32
+_CACHE: "OrderedDict[tuple, HTFBars]" = OrderedDict()
+
+
+def htf_tf(tf: str) -> str:
+    """MST Medio.pine f_htfTF(): mapped HTF, default 4× the minutes."""
+    if tf in HTF_OF:
+        return HTF_OF[tf]
+    return str(int(tf) * 4)
+
+
+def tf_seconds(tf: str) -> Optional[int]:
+    """Fixed bucket size in seconds (None for calendar months)."""
+    if tf == "D":
+        return 86400
+    if tf == "W":
+        return 7 * 86400
+    if tf == "M":
+        return None
+    return int(tf) * 60
+
+
+def bucket_ids(epoch: np.ndarray, tf: str) -> np.ndarray:
+    """Integer HTF bucket of each epoch-second timestamp."""
+    epoch = np.asarray(epoch, dtype=np.int64)
+    if tf == "M":
+        return epoch.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+    if tf == "W":
+        return (epoch // 86400 + 3) // 7          # 1970-01-01 is a Thursday → Monday weeks
+    return epoch // tf_seconds(tf)
+
+
+def bucket_start(bucket: np.ndarray, tf: str) -> np.ndarray:
+    """Start (epoch seconds) of each HTF bucket id."""
+    if tf == "M":
+        return bucket.astype("datetime64[M]").astype("datetime64[s]").astype(np.int64)
+    if tf == "W":
+        return (bucket * 7 - 3) * 86400
+    return bucket * tf_seconds(tf)
+
+
+@dataclass
+class HTFBars:
+    """
+    HTF OHLCV (one row per non-empty bucket) + base-bar mapping.
+
+    run[i]:       HTF bar containing base bar i
+    closed_at[i]: last HTF bar completed at the close of base bar i (-1 = none)
+    """
+    tf: str
+    time: np.ndarray          # bucket start, epoch seconds
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    run: np.ndarray
+    closed_at: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({"Open": self.open, "High": self.high, "Low": self.low,
+                             "Close": self.close, "Volume": self.volume},
+                            index=pd.to_datetime(self.time, unit="s"))
+
+
+def build_htf_bars(epoch, opens, highs, lows, closes, volumes, tf: str) -> HTFBars:
+    """Aggregate sorted base bars into HTF bars (reduceat over bucket runs)."""
+    bucket = bucket_ids(epoch, tf)
+    n = len(bucket)
+    if n == 0:
+        e = np.empty(0)
+        return HTFBars(tf, np.empty(0, np.int64), e, e, e, e, e,
+                       np.empty(0, np.int64), np.empty(0, np.int64))
+    change = np.empty(n, dtype=bool)
+    change[0] = True
+    change[1:] = bucket[1:] != bucket[:-1]
+    starts = np.flatnonzero(change)
+    ends = np.append(starts[1:], n) - 1
+    run = np.cumsum(change) - 1
+
+    # Base bar i closes HTF bar run[i] when it is the last base bar of the bucket
+    # (the final bucket of the data is still forming)
+    is_last = np.zeros(n, dtype=bool)
+    is_last[ends[:-1]] = True
+    closed_at = np.where(is_last, run, run - 1)
+
+    return HTFBars(
+        tf=tf,
+        time=bucket_start(bucket[starts], tf),
+        open=np.asarray(opens, dtype=np.float64)[starts],
+        high=np.maximum.reduceat(np.asarray(highs, dtype=np.float64), starts),
+        low=np.minimum.reduceat(np.asarray(lows, dtype=np.float64), starts),
+        close=np.asarray(closes, dtype=np.float64)[ends],
+        volume=(np.add.reduceat(np.asarray(volumes, dtype=np.float64), starts)
+                if volumes is not None else np.zeros(len(starts))),
+        run=run,
+        closed_at=closed_at,
+    )
+
+
+class MTF:
+    """HTF context for one base dataset (OHLC DataFrame with a DatetimeIndex)."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.epoch = np.asarray(pd.DatetimeIndex(df.index).values
+                                .astype("datetime64[s]").astype(np.int64))
+        self.open = df["Open"].to_numpy(dtype=np.float64)
+        self.high = df["High"].to_numpy(dtype=np.float64)
+        self.low = df["Low"].to_numpy(dtype=np.float64)
+        self.close = df["Close"].to_numpy(dtype=np.float64)
+        self.volume = df["Volume"].to_numpy(dtype=np.float64) if "Volume" in df.columns else None
+        self.key = _fingerprint(self.epoch, self.close)
+
+    def __len__(self) -> int:
+        return len(self.epoch)
+
+    def bars(self, tf: str) -> HTFBars:
+        """HTF bars for tf (built once per dataset and timeframe)."""
+        key = (self.key, tf)
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            return _CACHE[key]
+        bars = build_htf_bars(self.epoch, self.open, self.high, self.low,
+                              self.close, self.volume, tf)
+        _CACHE[key] = bars
+        while len(_CACHE) > CACHE_SIZE:
+            _CACHE.popitem(last=False)
+        return bars
+
+    def security(self, tf: str, expr: Union[str, np.ndarray, Callable[[HTFBars], np.ndarray]],
+                 at: str = "close") -> np.ndarray:
+        """
+        HTF series aligned to base bars, lookahead_off.
+
+        expr: HTF column name ("close", "high", ...), an array with one value per HTF
+              bar, or a function HTFBars → array.
+        at:   "close" — value known at the close of each base bar (Pine on bar close)
+              "open"  — value known at the open of each base bar (= "close" of the bar before)
+        """
+        bars = self.bars(tf)
+        if isinstance(expr, str):
+            values = getattr(bars, expr)
+        elif callable(expr):
+            values = expr(bars)
+        else:
+            values = expr
+        values = np.asarray(values, dtype=np.float64)
+        pos = bars.closed_at
+        if at == "open":
+            pos = np.concatenate([[-1], pos[:-1]]) if len(pos) else pos
+        elif at != "close":
+            raise ValueError(f"at must be 'close' or 'open', got {at!r}")
+        if len(values) == 0:
+            return np.full(len(pos), np.nan)
+        return np.where(pos >= 0, values[np.maximum(pos, 0)], np.nan)
+
+
+def _fingerprint(epoch: np.ndarray, close: np.ndarray) -> tuple:
+    if len(epoch) == 0:
+        return (0,)
+    return (len(epoch), int(epoch[0]), int(epoch[-1]), float(np.nansum(close)))
+
+
+def mtf_for(df: pd.DataFrame) -> MTF:
+    """MTF view of df; HTF bars are shared with any other view of the same data."""
+    return MTF(df)
+
+
+def clear_cache():
+    _CACHE.clear()
+
+
+# ============================================================================
+# HTF indicators (functions of HTFBars)
+# ============================================================================
+def ema_of(values: np.ndarray, length: int) -> np.ndarray:
+    """Pine ta.ema seeded with the first value (pandas ewm, adjust=False)."""
+    return pd.Series(values).ewm(span=length, adjust=False).mean().to_numpy()
+
+
+def htf_trend(bars: HTFBars, pivot_len: int = 5) -> np.ndarray:
+    """
+    MST Medio.pine f_calcHTFTrend() on HTF bars: 1 = last two pivot highs rising (HH),
+    -1 = last two pivot lows falling (LL), 0 = neutral. A pivot at bar j is known at
+    bar j + pivot_len (strictly above / below pivot_len bars on each side).
+    """
+    k = len(bars)
+    out = np.zeros(k, dtype=np.float64)
+    w = 2 * pivot_len + 1
+    if k < w:
+        return out
+    hw = np.lib.stride_tricks.sliding_window_view(bars.high, w)
+    lw = np.lib.stride_tricks.sliding_window_view(bars.low, w)
+    mid_h = hw[:, pivot_len]
+    mid_l = lw[:, pivot_len]
+    others_h = np.delete(hw, pivot_len, axis=1).max(axis=1)
+    others_l = np.delete(lw, pivot_len, axis=1).min(axis=1)
+    conf = np.arange(len(mid_h)) + 2 * pivot_len         # bar the pivot is confirmed on
+
+    def last_two(is_pivot, price):
+        """Most recent and previous pivot price as of each HTF bar (NaN = none yet)."""
+        p1 = np.full(k, np.nan)
+        p0 = np.full(k, np.nan)
+        at = conf[is_pivot]
+        val = price[is_pivot]
+        if len(at) == 0:
+            return p1, p0
+        seq = np.full(k, -1)
+        seq[at] = np.arange(len(at))
+        seq = np.maximum.accumulate(seq)
+        has1 = seq >= 0
+        p1[has1] = val[seq[has1]]
+        has0 = seq >= 1
+        p0[has0] = val[seq[has0] - 1]
+        return p1, p0
+
+    sh1, sh0 = last_two(mid_h > others_h, mid_h)
+    sl1, sl0 = last_two(mid_l < others_l, mid_l)
+    out[sl1 < sl0] = -1
+    out[sh1 > sh0] = 1          # HH checked first in the Pine ternary
+    return out
@@ -7,9 +7,11 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 import pandas as pd
-import numpy as np
 from strategy_mst_medio import run_mst_medio, Signal
-from backtest_partial_tp import simulate_partial_tp, load_data
+from backtest_partial_tp import simulate_partial_tp
+from market_data import load_data
+from metrics import trade_metrics
+from monte_carlo import monte_carlo
 from typing import List, Dict, Tuple
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
@@ -29,55 +31,40 @@ STRATEGIES = [
     ("Partial TP (50%+BE)", {"tp_mode": "confirm", "min_rr": 0.0, "partial": True}),
 ]
 
+# Bootstrap sims per strategy × pair (mc_* columns in the CSV)
+MC_SIMS = 10_000
+MC_RUIN_R = 10.0
 
-def calc_metrics(signals: List[Signal], df: pd.DataFrame = None, partial: bool = False) -> Dict:
+
+def calc_metrics(signals: List[Signal], df: pd.DataFrame = None, partial: bool = False,
+                 mc_sims: int = 0) -> Dict:
     if partial and df is not None:
-        results = simulate_partial_tp(signals, df)
-        total = len(results)
-        if total == 0:
-            return empty_metrics()
-        wins = sum(1 for r in results if r.total_pnl_r > 0)
-        losses = sum(1 for r in results if r.total_pnl_r < 0)
-        be = sum(1 for r in results if r.total_pnl_r == 0)
-        pnl = sum(r.total_pnl_r for r in results)
-        pnls = [r.total_pnl_r for r in results]
-        win_pnls = [r.total_pnl_r for r in results if r.total_pnl_r > 0]
-        loss_pnls = [r.total_pnl_r for r in results if r.total_pnl_r < 0]
+        pnls = [r.total_pnl_r for r in simulate_partial_tp(df, signals)]
     else:
-        closed = [s for s in signals if s.result in ("TP", "SL", "CLOSE_REVERSE")]
-        total = len(closed)
-        if total == 0:
-            return empty_metrics()
-        wins = sum(1 for s in closed if s.pnl_r > 0)
-        losses = sum(1 for s in closed if s.pnl_r < 0)
-        be = sum(1 for s in closed if s.pnl_r == 0)
-        pnl = sum(s.pnl_r for s in closed)
-        pnls = [s.pnl_r for s in closed]
-        win_pnls = [s.pnl_r for s in closed if s.pnl_r > 0]
-        loss_pnls = [s.pnl_r for s in closed if s.pnl_r < 0]
-
-    wr = wins / total * 100 if total > 0 else 0
-    avg_win = np.mean(win_pnls) if win_pnls else 0
-    avg_loss = np.mean(loss_pnls) if loss_pnls else 0
-    profit_factor = abs(sum(win_pnls) / sum(loss_pnls)) if loss_pnls and sum(loss_pnls) != 0 else float('inf')
-    max_dd = calc_max_drawdown(pnls)
-    expectancy = pnl / total if total > 0 else 0
-
-    return {
-        "trades": total,
-        "wins": wins,
-        "losses": losses,
-        "be": be,
-        "wr": round(wr, 1),
-        "pnl": round(pnl, 2),
-        "avg_trade": round(expectancy, 2),
-        "avg_win": round(avg_win, 2),
-        "avg_loss": round(avg_loss, 2),
-        "profit_factor": round(profit_factor, 2),
-        "max_dd": round(max_dd, 2),
-        "best_trade": round(max(pnls), 2) if pnls else 0,
-        "worst_trade": round(min(pnls), 2) if pnls else 0,
+        pnls = [s.pnl_r for s in signals if s.result in ("TP", "SL", "CLOSE_REVERSE")]
+    if not pnls:
+        return empty_metrics()
+
+    m = trade_metrics(pnls)
+    out = {
+        "trades": m["trades"],
+        "wins": m["wins"],
+        "losses": m["losses"],
+        "be": m["be"],
+        "wr": round(m["wr"], 1),
+        "pnl": round(m["pnl"], 2),
+        "avg_trade": round(m["avg_trade"], 2),
+        "avg_win": round(m["avg_win"], 2),
+        "avg_loss": round(m["avg_loss"], 2),
+        "profit_factor": round(m["profit_factor"], 2),
+        "max_dd": round(m["max_dd"], 2),
+        "best_trade": round(m["best_trade"], 2),
+        "worst_trade": round(m["worst_trade"], 2),
     }
+    if mc_sims:
+        mc = monte_carlo(pnls, n_sims=mc_sims, ruin_r=MC_RUIN_R)
+        out.update({k: round(v, 2) for k, v in mc.summary().items()})
+    return out
 
 
 def empty_metrics() -> Dict:
@@ -87,23 +74,6 @@ def empty_metrics() -> Dict:
     ]}
 
 
-def calc_max_drawdown(pnls: List[float]) -> float:
-    """Calculate max drawdown in R from a list of trade PnLs."""
-    if not pnls:
-        return 0
-    equity = 0
-    peak = 0
-    max_dd = 0
-    for pnl in pnls:
-        equity += pnl
-        if equity > peak:
-            peak = equity
-        dd = peak - equity
-        if dd > max_dd:
-            max_dd = dd
-    return max_dd
-
-
 def bar_chart(value: float, max_val: float, width: int = 30, char: str = "█") -> str:
     """Create a text bar chart."""
     if max_val <= 0:
@@ -138,7 +108,7 @@ def main():
                 min_rr=config.get("min_rr", 0.0),
                 debug=False,
             )
-            metrics = calc_metrics(signals, df, config.get("partial", False))
+            metrics = calc_metrics(signals, df, config.get("partial", False), mc_sims=MC_SIMS)
 
             if strat_name not in all_data:
                 all_data[strat_name] = {}
@@ -422,6 +392,21 @@ def main():
 
     print(f"{'━'*74}")
 
+    # ── SECTION: Monte Carlo (bootstrap of each strategy × pair trade list) ──
+    print(f"\n{'━'*74}")
+    print(f"  🎲 MONTE CARLO — {MC_SIMS:,} bootstrap sims, 90% interval, ruin = -{MC_RUIN_R:.0f}R")
+    print(f"{'━'*74}")
+    print(f"  {'Strategy':<22s} {'Pair':<7s} {'Total R (p5 / p50 / p95)':>26s} "
+          f"{'DD p95':>7s} {'P(loss)':>8s} {'Ruin':>6s}")
+    for sn in strat_names:
+        for pair in pair_names:
+            m = all_data[sn][pair]
+            if "mc_total_med" not in m:
+                continue
+            print(f"  {sn[:22]:<22s} {pair:<7s} {m['mc_total_lo']:>+8.1f} / {m['mc_total_med']:>+6.1f} / "
+                  f"{m['mc_total_hi']:>+6.1f} {m['mc_dd_hi']:>6.1f}R {m['mc_p_loss']:>7.1f}% "
+                  f"{m['mc_ruin_pct']:>5.1f}%")
+
     # Save CSV summary
     records = []
     for sn in strat_names:
@@ -0,0 +1,158 @@
+"""
+rolling.py — Rolling win rate / expectancy / profit factor over trade sequences
+
+Every window statistic is a difference of prefix sums (count, wins, ΣR, gross
+win, gross loss), so any set of windows costs O(trades + windows):
+
+- by_trades(pnl, 20):                 trailing 20 trades at every trade
+- by_time(times, pnl, "7D"):          trailing 7 days at every trade
+- by_time(times, pnl, "7D", at=grid): trailing 7 days at arbitrary times (e.g. daily)
+
+pnl may be (configs × trades) — one row per parameter set of a sweep on the same
+trade slots (windows along the last axis).
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from dataclasses import dataclass
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "analysis_output")
+
+
+@dataclass
+class RollingMetrics:
+    """Window statistics (NaN where the window holds fewer than min_trades)."""
+    end: np.ndarray           # window end: trade index or time
+    n: np.ndarray
+    wins: np.ndarray
+    sum_r: np.ndarray
+    win_rate: np.ndarray
+    expectancy: np.ndarray
+    profit_factor: np.ndarray
+
+    def to_frame(self) -> pd.DataFrame:
+        """1-D results as a DataFrame indexed by window end."""
+        return pd.DataFrame({"n": self.n, "wins": self.wins, "sum_r": self.sum_r,
+                             "win_rate": self.win_rate, "expectancy": self.expectancy,
+                             "profit_factor": self.profit_factor}, index=self.end)
+
+
+def _prefix(pnl: np.ndarray) -> dict:
+    """Prefix sums along the last axis with a leading 0 (index k = first k trades)."""
+    def cum(x):
+        pad = np.zeros(x.shape[:-1] + (1,))
+        return np.concatenate([pad, np.cumsum(x, axis=-1)], axis=-1)
+    win = pnl > 0
+    return {
+        "n": cum(np.ones_like(pnl)),
+        "wins": cum(win.astype(np.float64)),
+        "sum_r": cum(pnl),
+        "gross_win": cum(np.where(win, pnl, 0.0)),
+        "gross_loss": cum(np.where(pnl < 0, -pnl, 0.0)),
+    }
+
+
+def window_metrics(pnl_r, lo, hi, end=None, min_trades: int = 1) -> RollingMetrics:
+    """Statistics of trades [lo, hi) for every window (lo / hi = trade positions)."""
+    pnl = np.asarray(pnl_r, dtype=np.float64)
+    lo = np.asarray(lo, dtype=np.int64)
+    hi = np.asarray(hi, dtype=np.int64)
+    p = _prefix(pnl)
+    w = {k: v[..., hi] - v[..., lo] for k, v in p.items()}
+    n = np.rint(w["n"])
+    enough = n >= max(min_trades, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        win_rate = np.where(enough, w["wins"] / n * 100, np.nan)
+        expectancy = np.where(enough, w["sum_r"] / n, np.nan)
+        pf = np.where(w["gross_loss"] > 1e-12, w["gross_win"] / w["gross_loss"], np.inf)
+        pf = np.where(enough, pf, np.nan)
+    return RollingMetrics(end=hi if end is None else np.asarray(end), n=n.astype(np.int64),
+                          wins=np.rint(w["wins"]).astype(np.int64), sum_r=w["sum_r"],
+                          win_rate=win_rate, expectancy=expectancy, profit_factor=pf)
+
+
+def by_trades(pnl_r, window: int, min_trades: Optional[int] = None) -> RollingMetrics:
+    """Trailing `window` trades ending at every trade (end = trade index)."""
+    pnl = np.asarray(pnl_r, dtype=np.float64)
+    hi = np.arange(1, pnl.shape[-1] + 1)
+    lo = np.maximum(hi - window, 0)
+    return window_metrics(pnl, lo, hi, end=hi - 1,
+                          min_trades=window if min_trades is None else min_trades)
+
+
+def by_time(times, pnl_r, window: Union[str, pd.Timedelta], at=None,
+            min_trades: int = 5) -> RollingMetrics:
+    """
+    Trades closed in (t - window, t] for every t in `at` (default: each trade's time).
+    times must be sorted (close order).
+    """
+    times = pd.DatetimeIndex(times).values
+    at = times if at is None else pd.DatetimeIndex(at).values
+    span = pd.Timedelta(window).to_timedelta64()
+    hi = np.searchsorted(times, at, side="right")
+    lo = np.searchsorted(times, at - span, side="right")
+    return window_metrics(pnl_r, lo, hi, end=at, min_trades=min_trades)
+
+
+def edge_breaks(rolling: RollingMetrics, floor: float = 0.0) -> np.ndarray:
+    """
+    Window ends where rolling expectancy drops below `floor` (was ≥ floor before).
+    For (configs × windows) metrics: boolean mask of the breaks, same shape.
+    """
+    exp = rolling.expectancy
+    below = exp < floor
+    prev_ok = np.concatenate([np.zeros(exp.shape[:-1] + (1,), dtype=bool),
+                              exp[..., :-1] >= floor], axis=-1)
+    breaks = below & prev_ok
+    return rolling.end[breaks] if exp.ndim == 1 else breaks
+
+
+def main():
+    path = os.path.join(OUTPUT_DIR, "trades_detail.csv")
+    if not os.path.exists(path):
+        print(f"⚠️  {path} not found — run timing_analysis.py first")
+        return
+    trades = pd.read_csv(path, parse_dates=["confirm_time"])
+
+    WINDOW_N = 10
+    WINDOW_T = "7D"
+    print("=" * 92)
+    print(f"MST Medio v2.0 — Rolling edge (last {WINDOW_N} trades / trailing {WINDOW_T}, "
+          f"daily snapshots)")
+    print("=" * 92)
+    for pair, group in trades.groupby("pair"):
+        # trades_detail.csv has no exit time: order / window by confirm time
+        group = group.sort_values("confirm_time", kind="stable")
+        times = group["confirm_time"].values
+        pnl = group["pnl_r"].to_numpy()
+
+        roll_n = by_trades(pnl, WINDOW_N)
+        grid = pd.date_range(pd.Timestamp(times[0]).normalize(), pd.Timestamp(times[-1]), freq="1D")
+        roll_t = by_time(times, pnl, WINDOW_T, at=grid, min_trades=3)
+
+        print(f"\n{'─' * 92}")
+        print(f"  {pair} — {len(pnl)} trades")
+        print(f"{'─' * 92}")
+        valid = ~np.isnan(roll_n.expectancy)
+        if valid.any():
+            e = roll_n.expectancy[valid]
+            print(f"  Last {WINDOW_N}: WR {roll_n.win_rate[-1]:5.1f}%  exp {roll_n.expectancy[-1]:+.2f}R  "
+                  f"PF {roll_n.profit_factor[-1]:.2f}   | range exp {e.min():+.2f} → {e.max():+.2f}R")
+            breaks = edge_breaks(roll_n)
+            if len(breaks):
+                at = ", ".join(str(pd.Timestamp(times[i]))[:16] for i in breaks)
+                print(f"  ⚠️ Rolling expectancy turned negative at: {at}")
+        print(f"  {'Day':<12} {'n':>3} {'WR%':>6} {'Exp R':>7} {'PF':>6}")
+        for day, row in roll_t.to_frame().dropna().iterrows():
+            print(f"  {str(day)[:10]:<12} {row['n']:>3.0f} {row['win_rate']:>6.1f} "
+                  f"{row['expectancy']:>+7.2f} {row['profit_factor']:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
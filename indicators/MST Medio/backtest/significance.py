@@ -0,0 +1,168 @@
+"""
+significance.py — Random-entry permutation test for MST Medio expectancy
+
+Null hypothesis: MST Medio's entries are no better than random bars. Each
+permutation replaces every real setup by a random-entry trade matched on:
+
+- direction (same BUY / SELL vector)
+- risk in ATR units (SL distance / ATR14 at the setup bar, applied to ATR at the random bar)
+- R:R (TP distance / SL distance)
+- exit policy (fixed SL / TP, first passage on the same BarIndex, SL priority)
+
+Random trades enter at the close of a uniformly drawn bar. The real setups are
+resolved the same way (limit fill → SL / TP first passage, independent setups).
+All permutations × setups are resolved in batches with one first-passage call.
+
+    p = (1 + #{perm expectancy >= real expectancy}) / (1 + n_perm)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from fast_exits import BarIndex, OUTCOME_OPEN, fill_bars, resolve_fixed_exits, fixed_exit_pnl_r
+from market_data import load_data
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+ATR_PERIOD = 14
+BATCH_TRADES = 500_000        # random trades resolved per first-passage call
+
+
+def resolve_setups(index: BarIndex, arr: dict, atr: np.ndarray) -> dict:
+    """
+    Real setups (signals_to_arrays) as independent fixed-exit trades (pnl_r of the
+    closed ones), plus the matching keys of the filled ones: direction, risk_atr, rr.
+    """
+    ok = (arr["risk"] > 0) & (arr["start"] >= 1) & np.isfinite(arr["tp"])
+    start, d = arr["start"][ok], arr["direction"][ok]
+    entry, sl, tp = arr["entry"][ok], arr["sl"][ok], arr["tp"][ok]
+    risk = np.abs(entry - sl)
+    atr_at = atr[np.minimum(start - 1, len(atr) - 1)]
+    keep = np.isfinite(atr_at) & (atr_at > 0)
+    start, d, entry, sl, tp, risk, atr_at = (x[keep] for x in (start, d, entry, sl, tp, risk, atr_at))
+
+    fill = fill_bars(index, start, d, entry)
+    filled = fill < index.n
+    exit_bar, outcome = resolve_fixed_exits(index, fill[filled], d[filled], sl[filled], tp[filled])
+    pnl = fixed_exit_pnl_r(d[filled], entry[filled], sl[filled], tp[filled], outcome)
+    closed = outcome != OUTCOME_OPEN
+    # Random trades are matched to the filled setups (unfilled limits never traded)
+    return {
+        "direction": d[filled],
+        "risk_atr": (risk / atr_at)[filled],
+        "rr": (np.abs(tp - entry) / risk)[filled],
+        "pnl_r": pnl[closed],
+    }
+
+
+@dataclass
+class PermutationResult:
+    real_n: int
+    real_sum: float
+    perm_n: np.ndarray        # closed random trades per permutation
+    perm_sum: np.ndarray      # Σ R per permutation
+
+    @property
+    def real_exp(self) -> float:
+        return self.real_sum / self.real_n if self.real_n else 0.0
+
+    @property
+    def perm_exp(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.perm_n > 0, self.perm_sum / self.perm_n, 0.0)
+
+    @property
+    def p_value(self) -> float:
+        """One-sided: share of permutations with expectancy >= the real one."""
+        return (1 + int((self.perm_exp >= self.real_exp).sum())) / (1 + len(self.perm_n))
+
+    def __add__(self, other: "PermutationResult") -> "PermutationResult":
+        """Pool two datasets (permutation k of each is combined into pooled permutation k)."""
+        return PermutationResult(self.real_n + other.real_n, self.real_sum + other.real_sum,
+                                 self.perm_n + other.perm_n, self.perm_sum + other.perm_sum)
+
+
+def random_entry_test(index: BarIndex, close: np.ndarray, atr: np.ndarray, setups: dict,
+                      n_perm: int = 2000, seed: int = 42, warmup: int = ATR_PERIOD) -> PermutationResult:
+    """Permutation test of the setups' expectancy against matched random entries."""
+    d = setups["direction"]
+    t = len(d)
+    perm_n = np.zeros(n_perm, dtype=np.int64)
+    perm_sum = np.zeros(n_perm)
+    real = setups["pnl_r"]
+    n = index.n
+    if t == 0 or n - 1 <= warmup:
+        return PermutationResult(len(real), float(real.sum()), perm_n, perm_sum)
+
+    rng = np.random.default_rng(seed)
+    rows = max(1, BATCH_TRADES // t)
+    for lo in range(0, n_perm, rows):
+        k = min(rows, n_perm - lo)
+        bar = rng.integers(warmup, n - 1, size=(k, t))        # entry at close of `bar`
+        entry = close[bar]
+        risk = setups["risk_atr"][None, :] * atr[bar]
+        dd = np.broadcast_to(d, (k, t))
+        sl = entry - dd * risk
+        tp = entry + dd * risk * setups["rr"][None, :]
+        exit_bar, outcome = resolve_fixed_exits(index, (bar + 1).ravel(), dd.ravel(),
+                                                sl.ravel(), tp.ravel())
+        pnl = fixed_exit_pnl_r(dd.ravel(), entry.ravel(), sl.ravel(), tp.ravel(), outcome)
+        closed = (outcome != OUTCOME_OPEN).reshape(k, t)
+        perm_n[lo:lo + k] = closed.sum(axis=1)
+        perm_sum[lo:lo + k] = np.where(closed, pnl.reshape(k, t), 0.0).sum(axis=1)
+    return PermutationResult(len(real), float(real.sum()), perm_n, perm_sum)
+
+
+def print_result(label: str, res: PermutationResult):
+    perm = res.perm_exp
+    print(f"  {label:<10} {res.real_n:>5} {res.real_exp:>+9.3f} {perm.mean():>+10.3f} "
+          f"{np.percentile(perm, 95):>+9.3f} {res.p_value:>8.4f}")
+
+
+def main():
+    from strategy_mst_medio import run_mst_medio, signals_to_arrays
+    from timing_analysis import calc_atr
+
+    PAIRS = [
+        ("XAUUSD", "XAUUSD_M5.csv"),
+        ("EURUSD", "EURUSD_M5.csv"),
+        ("USDJPY", "USDJPY_M5.csv"),
+        ("BTCUSD", "BTCUSD_M5.csv"),
+    ]
+    N_PERM = 5000
+
+    print("=" * 64)
+    print(f"MST Medio v2.0 — Random-entry permutation test ({N_PERM} perms)")
+    print("Matched: direction, risk (ATR units), R:R, fixed SL/TP exits")
+    print("=" * 64)
+    print(f"  {'Pair':<10} {'N':>5} {'Real exp':>9} {'Rand mean':>10} {'Rand p95':>9} {'p-value':>8}")
+    print("-" * 64)
+
+    pooled = None
+    for symbol, filename in PAIRS:
+        filepath = os.path.join(DATA_DIR, filename)
+        if not os.path.exists(filepath):
+            print(f"  ⚠️ {symbol}: No data file ({filename})")
+            continue
+        df = load_data(filepath)
+        signals, _ = run_mst_medio(df, pivot_len=5, break_mult=0.25, impulse_mult=1.5,
+                                   min_rr=0, tp_mode="confirm", debug=False)
+        index = BarIndex.from_df(df)
+        atr = calc_atr(df, ATR_PERIOD).to_numpy()
+        setups = resolve_setups(index, signals_to_arrays(signals), atr)
+        res = random_entry_test(index, df["Close"].to_numpy(), atr, setups, n_perm=N_PERM)
+        print_result(symbol, res)
+        pooled = res if pooled is None else pooled + res
+
+    if pooled is not None:
+        print("-" * 64)
+        print_result("POOLED", pooled)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""
+similarity.py — k-nearest historical setups for a new MST Medio setup
+
+Each setup is a feature vector measured at its confirm bar (ATR14 units):
+
+    swing_atr:     range of the breaking swing (sh1 / sl1 to the SL swing) / ATR
+    break_atr:     break candle close beyond the broken swing / ATR (break strength)
+    w1_atr:        W1 peak beyond the broken swing / ATR
+    risk_atr:      |entry - SL| / ATR
+    bars_confirm:  bars from the break candle to confirm
+    hour_sin/cos:  confirm hour on the 24h circle (sessions cluster, 23h ≈ 0h)
+
+Features are z-scored with the mean / std frozen at build time so incremental
+adds and queries share one metric (columns can be re-weighted via `weights`).
+
+SetupIndex keeps a static KD-tree over most rows plus a small append buffer
+that is scanned exactly (‖x‖² - 2x·q + ‖q‖² + argpartition); the tree is rebuilt
+once the buffer outgrows REBUILD_FRAC of it, so adds stay cheap and queries stay
+exact. The tree is scipy's cKDTree when scipy is installed, else the numpy
+KDTree below (best-first search over leaf blocks).
+"""
+
+import heapq
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.spatial import cKDTree
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+from market_data import load_data
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+ATR_PERIOD = 14
+FEATURES = ("swing_atr", "break_atr", "w1_atr", "risk_atr", "bars_confirm", "hour_sin", "hour_cos")
+REBUILD_MIN = 1024            # buffer rows scanned exactly before the first tree build
+REBUILD_FRAC = 0.05           # rebuild when buffer > this share of the tree
+LEAF_SIZE = 128               # points per leaf block of the numpy KDTree
+SCAN_BLOCK = 1 << 22          # query × row cells per exact-scan block
+
+
+def setup_features(df: pd.DataFrame, signals, atr: Optional[np.ndarray] = None) -> tuple:
+    """
+    (features (setups × FEATURES), outcomes dict) for every signal with a valid
+    ATR / risk at its confirm bar. outcomes: direction, result, pnl_r, confirm_time,
+    exit_time (NaT while the trade is not closed).
+    """
+    from strategy_mst_medio import CLOSED_RESULTS, signals_to_arrays
+    from timing_analysis import calc_atr
+
+    if atr is None:
+        atr = calc_atr(df, ATR_PERIOD).to_numpy()
+    if not signals:
+        return np.zeros((0, len(FEATURES))), {"direction": np.zeros(0, dtype=np.int8),
+                                               "result": np.zeros(0, dtype=object),
+                                               "pnl_r": np.zeros(0),
+                                               "confirm_time": np.zeros(0, dtype="datetime64[ns]"),
+                                               "exit_time": np.zeros(0, dtype="datetime64[ns]")}
+    arr = signals_to_arrays(signals)
+    n = len(df)
+    conf = arr["start"] - 1
+    brk = arr["break_bar"]                      # break candle (engine)
+    ok = (conf >= 0) & (conf < n) & (brk >= 0) & (brk <= conf) & (arr["risk"] > 0)
+    a = np.where(ok, atr[np.clip(conf, 0, n - 1)], np.nan)
+    ok &= np.isfinite(a) & (a > 0)
+    rows = np.flatnonzero(ok)
+
+    d = arr["direction"][rows].astype(np.float64)
+    a = a[rows]
+    entry = arr["entry"][rows]
+    close = df["Close"].to_numpy()
+    hour = df.index[conf[rows]].hour.to_numpy() * (2 * np.pi / 24)
+    x = np.column_stack([
+        arr["swing_range"][rows] / a,
+        (close[brk[rows]] - entry) * d / a,
+        (arr["w1_peak"][rows] - entry) * d / a,
+        arr["risk"][rows] / a,
+        (conf[rows] - brk[rows]).astype(np.float64),
+        np.sin(hour),
+        np.cos(hour),
+    ])
+    outcomes = {
+        "direction": arr["direction"][rows],
+        "result": np.array([signals[i].result for i in rows], dtype=object),
+        "pnl_r": np.array([signals[i].pnl_r for i in rows], dtype=np.float64),
+        "confirm_time": df.index.values[conf[rows]],
+        "exit_time": np.array([df.index.values[signals[i].exit_bar]
+                               if signals[i].result in CLOSED_RESULTS and 0 <= signals[i].exit_bar < n
+                               else np.datetime64("NaT") for i in rows],
+                              dtype=df.index.values.dtype),
+    }
+    return x, outcomes
+
+
+class KDTree:
+    """
+    Minimal numpy KD-tree (fallback for scipy's cKDTree, same query signature).
+    Points are reordered so each leaf is a contiguous block; nodes keep their
+    bounding box for the best-first lower bound.
+    """
+
+    def __init__(self, points: np.ndarray, leaf_size: int = LEAF_SIZE):
+        points = np.asarray(points, dtype=np.float64)
+        perm = np.arange(len(points))
+        lo_box, hi_box, child, span = [], [], [], []
+        stack = [(0, len(points), -1, 0)]
+        while stack:
+            a, b, parent, side = stack.pop()
+            node = len(span)
+            if parent >= 0:
+                child[parent][side] = node
+            pts = points[perm[a:b]]
+            lo_box.append(pts.min(axis=0) if b > a else np.zeros(points.shape[1]))
+            hi_box.append(pts.max(axis=0) if b > a else np.zeros(points.shape[1]))
+            span.append((a, b))
+            child.append([-1, -1])
+            if b - a > leaf_size:
+                dim = int(np.argmax(hi_box[-1] - lo_box[-1]))
+                mid = (b - a) // 2
+                perm[a:b] = perm[a:b][np.argpartition(pts[:, dim], mid)]
+                stack.append((a + mid, b, node, 1))
+                stack.append((a, a + mid, node, 0))
+        self.perm = perm
+        self.points = points[perm]
+        self.sq = (self.points * self.points).sum(axis=1)
+        self.lo = np.array(lo_box)
+        self.hi = np.array(hi_box)
+        self.child = np.array(child, dtype=np.int64).reshape(-1, 2)
+        self.span = np.array(span, dtype=np.int64).reshape(-1, 2)
+
+    def _query_one(self, q: np.ndarray, k: int) -> tuple:
+        best_d = np.full(k, np.inf)
+        best_i = np.full(k, -1, dtype=np.int64)
+        qq = float(q @ q)
+        heap = [(0.0, 0)]
+        while heap:
+            bound, node = heapq.heappop(heap)
+            if bound > best_d[-1]:
+                break
+            left, right = self.child[node]
+            if left < 0:
+                a, b = self.span[node]
+                d2 = self.sq[a:b] - 2.0 * (self.points[a:b] @ q) + qq
+                d = np.concatenate([best_d, d2])
+                i = np.concatenate([best_i, np.arange(a, b)])
+                top = np.argsort(d, kind="stable")[:k]
+                best_d, best_i = d[top], i[top]
+                continue
+            for c in (left, right):
+                gap = np.maximum(self.lo[c] - q, 0.0) + np.maximum(q - self.hi[c], 0.0)
+                lb = float(gap @ gap)
+                if lb <= best_d[-1]:
+                    heapq.heappush(heap, (lb, int(c)))
+        return np.sqrt(np.maximum(best_d, 0.0)), self.perm[best_i]
+
+    def query(self, q: np.ndarray, k: int = 1) -> tuple:
+        """(dist, rows), each (queries × k), nearest first."""
+        q = np.atleast_2d(np.asarray(q, dtype=np.float64))
+        k = min(k, len(self.points))
+        dist = np.zeros((len(q), k))
+        rows = np.zeros((len(q), k), dtype=np.int64)
+        for j in range(len(q)):
+            dist[j], rows[j] = self._query_one(q[j], k)
+        return dist, rows
+
+
+@dataclass
+class Neighbours:
+    """k nearest setups per query (rows = queries, sorted by distance)."""
+    rows: np.ndarray          # row ids into the index
+    dist: np.ndarray
+    pnl_r: np.ndarray
+
+    def summary(self) -> pd.DataFrame:
+        """Outcome of the neighbours per query: win rate, mean R, mean distance."""
+        return pd.DataFrame({
+            "k": self.rows.shape[1],
+            "win_rate": (self.pnl_r > 0).mean(axis=1) * 100,
+            "avg_r": self.pnl_r.mean(axis=1),
+            "avg_dist": self.dist.mean(axis=1),
+        })
+
+
+class SetupIndex:
+    """Incremental exact k-NN index over setup feature vectors (see module doc)."""
+
+    def __init__(self, mean: np.ndarray, std: np.ndarray, weights: Optional[np.ndarray] = None):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        std = np.asarray(std, dtype=np.float64)
+        self.scale = np.where(std > 0, 1.0 / np.where(std > 0, std, 1.0), 1.0)
+        if weights is not None:
+            self.scale = self.scale * np.asarray(weights, dtype=np.float64)
+        self._x = np.zeros((0, len(self.mean)))
+        self._sq = np.zeros(0)
+        self._pnl = np.zeros(0)
+        self._extra: Dict[str, np.ndarray] = {}
+        self._n = 0
+        self._tree = None
+        self._n_tree = 0          # rows [0, _n_tree) are in the tree, the rest is the buffer
+
+    @classmethod
+    def build(cls, x: np.ndarray, pnl_r: np.ndarray, weights=None, **extra) -> "SetupIndex":
+        """Index of the given setups; scaling fitted on them."""
+        x = np.asarray(x, dtype=np.float64)
+        index = cls(x.mean(axis=0), x.std(axis=0), weights)
+        index.add(x, pnl_r, **extra)
+        return index
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def points(self) -> np.ndarray:
+        """Scaled feature vectors of the indexed setups."""
+        return self._x[:self._n]
+
+    def column(self, name: str) -> np.ndarray:
+        return self._pnl[:self._n] if name == "pnl_r" else self._extra[name][:self._n]
+
+    def transform(self, x) -> np.ndarray:
+        return (np.atleast_2d(np.asarray(x, dtype=np.float64)) - self.mean) * self.scale
+
+    def _grow(self, need: int):
+        cap = len(self._x)
+        if need <= cap:
+            return
+        cap = max(need, 2 * cap, 256)
+        def grown(a):
+            out = np.zeros((cap,) + a.shape[1:], dtype=a.dtype)
+            out[:self._n] = a[:self._n]
+            return out
+        self._x, self._sq, self._pnl = grown(self._x), grown(self._sq), grown(self._pnl)
+        self._extra = {k: grown(v) for k, v in self._extra.items()}
+
+    def add(self, x, pnl_r, **extra) -> np.ndarray:
+        """Append setups (raw features + outcome columns); returns their row ids."""
+        z = self.transform(x)
+        m = len(z)
+        lo, hi = self._n, self._n + m
+        for k, v in extra.items():
+            if k not in self._extra:
+                self._extra[k] = np.zeros(len(self._x), dtype=np.asarray(v).dtype)
+        self._grow(hi)
+        self._x[lo:hi] = z
+        self._sq[lo:hi] = (z * z).sum(axis=1)
+        self._pnl[lo:hi] = np.broadcast_to(np.asarray(pnl_r, dtype=np.float64), (m,))
+        for k, v in extra.items():
+            self._extra[k][lo:hi] = v
+        self._n = hi
+        if self._n - self._n_tree > max(REBUILD_MIN, REBUILD_FRAC * self._n_tree):
+            self._tree = (cKDTree if HAS_SCIPY else KDTree)(self._x[:self._n])
+            self._n_tree = self._n
+        return np.arange(lo, hi)
+
+    def _scan(self, q: np.ndarray, lo: int, hi: int, k: int) -> tuple:
+        """Exact k-NN of q among rows [lo, hi) (blocked over queries)."""
+        k = min(k, hi - lo)
+        rows = np.zeros((len(q), k), dtype=np.int64)
+        dist = np.zeros((len(q), k))
+        if k == 0:
+            return rows, dist
+        x, sq = self._x[lo:hi], self._sq[lo:hi]
+        step = max(1, SCAN_BLOCK // (hi - lo))
+        for a in range(0, len(q), step):
+            qb = q[a:a + step]
+            d2 = sq[None, :] - 2.0 * (qb @ x.T) + (qb * qb).sum(axis=1)[:, None]
+            part = np.argpartition(d2, k - 1, axis=1)[:, :k] if k < hi - lo else \
+                np.broadcast_to(np.arange(hi - lo), d2.shape).copy()
+            rows[a:a + step] = part + lo
+            dist[a:a + step] = np.sqrt(np.maximum(np.take_along_axis(d2, part, axis=1), 0.0))
+        return rows, dist
+
+    def query(self, x, k: int = 10) -> Neighbours:
+        """k nearest indexed setups for each raw feature row of x."""
+        q = self.transform(x)
+        k = min(k, self._n)
+        if self._tree is not None:
+            dist, rows = self._tree.query(q, k=k)
+            dist, rows = dist.reshape(len(q), k), rows.reshape(len(q), k)
+            if self._n > self._n_tree:
+                b_rows, b_dist = self._scan(q, self._n_tree, self._n, k)
+                rows, dist = np.hstack([rows, b_rows]), np.hstack([dist, b_dist])
+        else:
+            rows, dist = self._scan(q, 0, self._n, k)
+        order = np.argsort(dist, axis=1, kind="stable")[:, :k]
+        rows = np.take_along_axis(rows, order, axis=1)
+        dist = np.take_along_axis(dist, order, axis=1)
+        return Neighbours(rows=rows, dist=dist, pnl_r=self._pnl[rows])
+
+    def save(self, path: str):
+        np.savez(path, mean=self.mean, scale=self.scale, x=self.points,
+                 pnl_r=self._pnl[:self._n],
+                 **{f"extra_{k}": v[:self._n] for k, v in self._extra.items()})
+
+    @classmethod
+    def load(cls, path: str) -> "SetupIndex":
+        with np.load(path, allow_pickle=False) as z:
+            index = cls(z["mean"], np.ones_like(z["scale"]), weights=z["scale"])
+            extra = {k[len("extra_"):]: z[k] for k in z.files if k.startswith("extra_")}
+            # x is stored scaled: undo the transform so add() re-applies it
+            index.add(z["x"] / index.scale + index.mean, z["pnl_r"], **extra)
+        return index
+
+
+def bench(n: int = 300_000, n_queries: int = 200, k: int = 10, seed: int = 42):
+    """Build / query timings on n synthetic setups (python similarity.py --bench)."""
+    import time
+
+    rng = np.random.default_rng(seed)
+    x = rng.normal(0.0, 1.0, (n, len(FEATURES)))
+    t0 = time.perf_counter()
+    index = SetupIndex.build(x, rng.normal(0.0, 1.0, n))
+    t_build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for q in x[:n_queries]:
+        index.query(q, k=k)
+    print(f"{n} setups ({'cKDTree' if HAS_SCIPY else 'numpy KDTree'}): build {t_build * 1e3:.0f} ms, "
+          f"query {(time.perf_counter() - t0) / n_queries * 1e3:.2f} ms")
+
+
+def main():
+    from strategy_mst_medio import CLOSED_RESULTS, run_mst_medio
+
+    PAIRS = [
+        ("XAUUSD", "XAUUSD_M5.csv"),
+        ("EURUSD", "EURUSD_M5.csv"),
+        ("USDJPY", "USDJPY_M5.csv"),
+        ("BTCUSD", "BTCUSD_M5.csv"),
+    ]
+    K = 10
+
+    xs, outs = [], []
+    for pair_id, (symbol, filename) in enumerate(PAIRS):
+        filepath = os.path.join(DATA_DIR, filename)
+        if not os.path.exists(filepath):
+            print(f"⚠️ {symbol}: No data file ({filename})")
+            continue
+        df = load_data(filepath)
+        signals, _ = run_mst_medio(df, pivot_len=5, break_mult=0.25, impulse_mult=1.5,
+                                   min_rr=0, tp_mode="confirm", debug=False)
+        x, out = setup_features(df, signals)
+        out["pair"] = np.full(len(x), pair_id, dtype=np.int8)
+        xs.append(x)
+        outs.append(out)
+    if not xs:
+        return
+    x = np.vstack(xs)
+    out = {k: np.concatenate([o[k] for o in outs]) for k in outs[0]}
+    closed = np.isin(out["result"], CLOSED_RESULTS) & ~np.isnat(out["exit_time"])
+
+    # Walk forward in confirm order. A setup's outcome joins the index only once
+    # its exit time is <= the confirm time of the setup being queried; scaling is
+    # fitted on the first setups' features (known at confirm, no outcomes).
+    order = np.flatnonzero(closed)[np.argsort(out["confirm_time"][closed], kind="stable")]
+    fit = x[order[:max(3 * K, 1)]]
+    index = SetupIndex(fit.mean(axis=0), fit.std(axis=0))
+    pending = []              # heap of (exit_time, row) not yet resolved
+    pred, real = [], []
+    for i in order:
+        now = out["confirm_time"][i]
+        while pending and pending[0][0] <= now:
+            _, j = heapq.heappop(pending)
+            index.add(x[j], out["pnl_r"][j], pair=out["pair"][j:j + 1])
+        if len(index) >= K:
+            pred.append(index.query(x[i], k=K).pnl_r.mean())
+            real.append(out["pnl_r"][i])
+        heapq.heappush(pending, (out["exit_time"][i], i))
+
+    print("=" * 72)
+    print(f"MST Medio v2.0 — Similar-setup index (k={K}, outcomes known at confirm time)")
+    print("=" * 72)
+    print(f"  Features: {', '.join(FEATURES)}")
+    print(f"  {len(order)} closed setups, {len(pred)} walk-forward queries")
+    if pred:
+        pred, real = np.array(pred), np.array(real)
+        good = pred > 0
+        for label, m in (("neighbours avg R > 0", good), ("neighbours avg R <= 0", ~good)):
+            if m.any():
+                print(f"  {label:<24s} n={m.sum():>4d}  WR={(real[m] > 0).mean() * 100:5.1f}%  "
+                      f"avg={real[m].mean():+.2f}R")
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv[1:]:
+        bench()
+    else:
+        main()
@@ -18,6 +18,10 @@ import numpy as np
 from dataclasses import dataclass
 from typing import List, Optional
 
+from intrabar import INTRABAR_TP, INTRABAR_NONE, INTRABAR_UNKNOWN
+
+CLOSED_RESULTS = ("TP", "SL", "CLOSE_REVERSE")   # Signal.result values of closed trades
+
 
 @dataclass
 class Signal:
@@ -27,12 +31,19 @@ class Signal:
     sl: float
     tp: float
     w1_peak: float          # W1 impulse wave peak
-    break_time: pd.Timestamp
-    confirm_time: pd.Timestamp
+    break_time: pd.Timestamp    # Bar of the broken swing (sh0 BUY / sl0 SELL)
+    confirm_time: pd.Timestamp  # Confirm bar (= time, except for entry_mode="retest")
     result: str = ""        # "TP", "SL", "CLOSE_REVERSE", "OPEN", "PENDING", "UNFILLED"
     pnl_r: float = 0.0
     filled: bool = False    # Whether limit order was filled
     orig_sl: float = 0.0   # Original SL (before BE move) for risk calculation
+    bar_index: int = -1     # Position of `time` in df (first bar the order is managed on)
+    conf_high: float = 0.0  # High of Confirm candle
+    conf_low: float = 0.0   # Low of Confirm candle
+    fill_bar: int = -1      # Bar the order filled on (-1 = not filled)
+    exit_bar: int = -1      # Bar the trade / order was closed on (-1 = still OPEN / PENDING)
+    break_bar: int = -1     # Break candle: first close beyond the broken swing
+    swing_range: float = 0.0  # Range of the breaking swing: sh1 - SL swing (BUY) / SL swing - sl1 (SELL)
 
 
 @dataclass
@@ -104,12 +115,34 @@ def run_mst_medio(
     fixed_rr: float = 2.0,         # Only used if tp_mode="fixed_rr"
     limit_order: bool = True,      # True = realistic limit order (wait for fill), False = instant entry (legacy)
     be_at_r: float = 0.0,          # Breakeven: move SL to entry when profit >= be_at_r × risk (0=disabled)
+    entry_mode: str = "confirm",   # "confirm" = signal at Confirm, "retest" = Confirm then wait for retest of break point
+    intrabar=None,                 # intrabar.IntrabarResolver: order same-bar fill/SL/TP from M1 (None = SL priority)
+    long_ok=None,                  # per-bar bool mask: False → no BUY signal on that bar (see gates.py)
+    short_ok=None,                 # per-bar bool mask: False → no SELL signal on that bar
     debug: bool = False,
 ) -> tuple[List[Signal], List[SwingPoint]]:
     """
     Run MST Medio v2.0 strategy on historical data.
-    Signal fires at CONFIRM (close > W1 peak), no retest phase.
+    entry_mode="confirm": signal fires at CONFIRM (close > W1 peak), no retest phase.
+    entry_mode="retest":  after CONFIRM, wait for price to retest the break point
+                          (cancel on SL or on a return to the W1 trough first).
+                          The retest is the fill → signal starts as OPEN; time /
+                          bar_index / fill_bar are the retest bar, confirm_time the
+                          bar the setup confirmed on.
+    intrabar: bars touching both SL and TP (or fill + TP) are ordered from M1;
+              bars without M1 coverage keep SL priority.
+    long_ok / short_ok: pre-trade gates (HTF trend, session, regime) aligned to df rows.
+              A gated bar creates no signal, so the active signal is not replaced or
+              reverse-closed by a trade that would have been filtered out.
     """
+    if entry_mode not in ("confirm", "retest"):
+        raise ValueError(f"entry_mode must be 'confirm' or 'retest', got {entry_mode!r}")
+    retest = entry_mode == "retest"
+    if long_ok is not None:
+        long_ok = np.asarray(long_ok, dtype=bool)
+    if short_ok is not None:
+        short_ok = np.asarray(short_ok, dtype=bool)
+
     swings = find_swings(df, pivot_len)
     if len(swings) < 4:
         return [], swings
@@ -146,6 +179,7 @@ def run_mst_medio(
             avg_body_arr[i] = (cum_bodies[end] - cum_bodies[start - 1]) / count
 
     # Pending state: 0=idle, 1=waiting confirm BUY, -1=waiting confirm SELL
+    #                2=waiting retest BUY, -2=waiting retest SELL (entry_mode="retest")
     pending_state = 0
     pend_break_point = None    # Entry level (sh0 for BUY, sl0 for SELL)
     pend_w1_peak = None        # W1 peak level to confirm against
@@ -153,6 +187,11 @@ def run_mst_medio(
     pend_sl = None
     pend_sl_idx = None
     pend_break_idx = None
+    pend_break_bar = -1        # Break candle (first close beyond the broken swing)
+    pend_swing_range = 0.0
+    pend_conf_high = 0.0       # Confirm candle H/L kept while waiting for retest
+    pend_conf_low = 0.0
+    pend_conf_time = None      # Bar the setup confirmed on (signal confirm_time in retest mode)
 
     # Active signal tracking
     active_signal: Optional[Signal] = None
@@ -184,6 +223,8 @@ def run_mst_medio(
         if confirmed_bar < 0:
             continue
 
+        managed = active_signal   # to record its exit bar if it closes on this bar
+
         # Check swings at confirmed bar
         is_sw_h = False
         is_sw_l = False
@@ -269,6 +310,43 @@ def run_mst_medio(
         conf_wave_high = 0.0
         conf_wave_low = 0.0
 
+        # Wait for Retest BUY: low returns to break point (checked before Confirm,
+        # so the Confirm candle itself can never be the retest)
+        if pending_state == 2:
+            if pend_sl is not None and prev_low <= pend_sl:
+                if debug:
+                    print(f"  [{bar_time}] ✗ BUY retest cancelled: SL hit low={prev_low:.2f} <= SL={pend_sl:.2f}")
+                pending_state = 0
+            elif prev_low <= pend_break_point:
+                confirmed_buy = True
+                conf_wave_high = pend_conf_high
+                conf_wave_low = pend_conf_low
+                if debug:
+                    print(f"  [{bar_time}] ✓ RETEST BUY low={prev_low:.2f} <= entry={pend_break_point:.2f}")
+                pending_state = 0
+            elif pend_w1_trough is not None and prev_low <= pend_w1_trough:
+                if debug:
+                    print(f"  [{bar_time}] ✗ BUY retest cancelled: W1 trough broken low={prev_low:.2f}")
+                pending_state = 0
+
+        # Wait for Retest SELL: high returns to break point
+        elif pending_state == -2:
+            if pend_sl is not None and prev_high >= pend_sl:
+                if debug:
+                    print(f"  [{bar_time}] ✗ SELL retest cancelled: SL hit high={prev_high:.2f} >= SL={pend_sl:.2f}")
+                pending_state = 0
+            elif prev_high >= pend_break_point:
+                confirmed_sell = True
+                conf_wave_high = pend_conf_high
+                conf_wave_low = pend_conf_low
+                if debug:
+                    print(f"  [{bar_time}] ✓ RETEST SELL high={prev_high:.2f} >= entry={pend_break_point:.2f}")
+                pending_state = 0
+            elif pend_w1_trough is not None and prev_high >= pend_w1_trough:
+                if debug:
+                    print(f"  [{bar_time}] ✗ SELL retest cancelled: W1 peak broken high={prev_high:.2f}")
+                pending_state = 0
+
         # Wait for Confirm BUY: close > W1 peak
         if pending_state == 1:
             # Track W1 trough
@@ -286,12 +364,18 @@ def run_mst_medio(
                 pending_state = 0
             # Confirm: close > W1 peak
             elif pend_w1_peak is not None and prev_close > pend_w1_peak:
-                confirmed_buy = True
-                conf_wave_high = prev_high
-                conf_wave_low = prev_low
                 if debug:
                     print(f"  [{bar_time}] ✓ CONFIRM BUY close={prev_close:.2f} > W1={pend_w1_peak:.2f}")
-                pending_state = 0
+                if retest:
+                    pending_state = 2
+                    pend_conf_high = prev_high
+                    pend_conf_low = prev_low
+                    pend_conf_time = bar_time
+                else:
+                    confirmed_buy = True
+                    conf_wave_high = prev_high
+                    conf_wave_low = prev_low
+                    pending_state = 0
 
         # Wait for Confirm SELL: close < W1 trough
         elif pending_state == -1:
@@ -310,15 +394,22 @@ def run_mst_medio(
                 pending_state = 0
             # Confirm: close < W1 trough
             elif pend_w1_peak is not None and prev_close < pend_w1_peak:
-                confirmed_sell = True
-                conf_wave_high = prev_high
-                conf_wave_low = prev_low
                 if debug:
                     print(f"  [{bar_time}] ✓ CONFIRM SELL close={prev_close:.2f} < W1={pend_w1_peak:.2f}")
-                pending_state = 0
+                if retest:
+                    pending_state = -2
+                    pend_conf_high = prev_high
+                    pend_conf_low = prev_low
+                    pend_conf_time = bar_time
+                else:
+                    confirmed_sell = True
+                    conf_wave_high = prev_high
+                    conf_wave_low = prev_low
+                    pending_state = 0
 
         # ── New break → find W1 peak and start tracking ──
-        if raw_break_up:
+        # (a new break never replaces a same-direction setup already waiting for retest)
+        if raw_break_up and pending_state != 2:
             if debug:
                 print(f"[{bar_time}] BREAK UP sh1={sh1:.2f} sh0={sh0:.2f}")
             # Find W1 peak: highest high from break candle to first bearish candle
@@ -335,6 +426,7 @@ def run_mst_medio(
                 if not found_break:
                     if cl > sh0:
                         found_break = True
+                        break_j = j
                         w1_peak = hi
                         w1_trough_init = lo
                 else:
@@ -353,6 +445,8 @@ def run_mst_medio(
                 pend_sl = sl_before_sh
                 pend_sl_idx = sl_before_sh_idx
                 pend_break_idx = sh0_idx
+                pend_break_bar = break_j
+                pend_swing_range = sh1 - sl_before_sh
 
                 if debug:
                     print(f"  → Pending BUY, entry={sh0:.2f}, W1={w1_peak:.2f}, SL={pend_sl}")
@@ -380,17 +474,36 @@ def run_mst_medio(
                             pending_state = 0
                             break
                         if rC > pend_w1_peak:
+                            if debug:
+                                print(f"  retro[{times[j]}] ✓ CONFIRM BUY close={rC:.2f} > W1={pend_w1_peak:.2f}")
+                            if retest:
+                                pending_state = 2
+                                pend_conf_high = rH
+                                pend_conf_low = rL
+                                pend_conf_time = bar_time
+                                continue
                             confirmed_buy = True
                             conf_wave_high = rH
                             conf_wave_low = rL
-                            if debug:
-                                print(f"  retro[{times[j]}] ✓ CONFIRM BUY close={rC:.2f} > W1={pend_w1_peak:.2f}")
+                            pending_state = 0
+                            break
+                    if pending_state == 2:
+                        if pend_sl is not None and rL <= pend_sl:
+                            pending_state = 0
+                            break
+                        if rL <= pend_break_point:
+                            confirmed_buy = True
+                            conf_wave_high = pend_conf_high
+                            conf_wave_low = pend_conf_low
+                            pending_state = 0
+                            break
+                        if pend_w1_trough is not None and rL <= pend_w1_trough:
                             pending_state = 0
                             break
                     if pending_state == 0:
                         break
 
-        if raw_break_down:
+        if raw_break_down and pending_state != -2:
             if debug:
                 print(f"[{bar_time}] BREAK DOWN sl1={sl1:.2f} sl0={sl0:.2f}")
             # Find W1 trough: lowest low from break candle to first bullish candle
@@ -407,6 +520,7 @@ def run_mst_medio(
                 if not found_break:
                     if cl < sl0:
                         found_break = True
+                        break_j = j
                         w1_trough = lo
                         w1_peak_init = hi
                 else:
@@ -425,6 +539,8 @@ def run_mst_medio(
                 pend_sl = sh_before_sl
                 pend_sl_idx = sh_before_sl_idx
                 pend_break_idx = sl0_idx
+                pend_break_bar = break_j
+                pend_swing_range = sh_before_sl - sl1
 
                 if debug:
                     print(f"  → Pending SELL, entry={sl0:.2f}, W1={w1_trough:.2f}, SL={pend_sl}")
@@ -451,16 +567,45 @@ def run_mst_medio(
                             pending_state = 0
                             break
                         if rC < pend_w1_peak:
+                            if debug:
+                                print(f"  retro[{times[j]}] ✓ CONFIRM SELL close={rC:.2f} < W1={pend_w1_peak:.2f}")
+                            if retest:
+                                pending_state = -2
+                                pend_conf_high = rH
+                                pend_conf_low = rL
+                                pend_conf_time = bar_time
+                                continue
                             confirmed_sell = True
                             conf_wave_high = rH
                             conf_wave_low = rL
-                            if debug:
-                                print(f"  retro[{times[j]}] ✓ CONFIRM SELL close={rC:.2f} < W1={pend_w1_peak:.2f}")
+                            pending_state = 0
+                            break
+                    if pending_state == -2:
+                        if pend_sl is not None and rH >= pend_sl:
+                            pending_state = 0
+                            break
+                        if rH >= pend_break_point:
+                            confirmed_sell = True
+                            conf_wave_high = pend_conf_high
+                            conf_wave_low = pend_conf_low
+                            pending_state = 0
+                            break
+                        if pend_w1_trough is not None and rH >= pend_w1_trough:
                             pending_state = 0
                             break
                     if pending_state == 0:
                         break
 
+        # ── Pre-trade gates ──
+        if confirmed_buy and long_ok is not None and not long_ok[bar_i]:
+            confirmed_buy = False
+            if debug:
+                print(f"  [{bar_time}] ⚠️ Gated BUY")
+        if confirmed_sell and short_ok is not None and not short_ok[bar_i]:
+            confirmed_sell = False
+            if debug:
+                print(f"  [{bar_time}] ⚠️ Gated SELL")
+
         # ── Process confirmed signals ──
         if confirmed_buy and pend_break_point is not None and pend_sl is not None:
             entry = pend_break_point
@@ -490,12 +635,16 @@ def run_mst_medio(
                         active_signal.result = "CLOSE_REVERSE"
                         active_signal.pnl_r = _calc_pnl_r(active_signal, bar_close)
 
-                init_state = "PENDING" if limit_order else "OPEN"
+                # Retest mode: the retest touch is the fill → trade is already open
+                filled = retest or not limit_order
                 sig = Signal(
                     time=bar_time, direction="BUY", entry=entry, sl=sl_val, tp=tp,
                     w1_peak=pend_w1_peak, break_time=times[pend_break_idx] if pend_break_idx else bar_time,
-                    confirm_time=bar_time, result=init_state, filled=not limit_order,
-                    orig_sl=sl_val,
+                    confirm_time=pend_conf_time if retest else bar_time, result="OPEN" if filled else "PENDING", filled=filled,
+                    orig_sl=sl_val, bar_index=bar_i,
+                    conf_high=conf_wave_high, conf_low=conf_wave_low,
+                    fill_bar=bar_i if filled else -1,
+                    break_bar=pend_break_bar, swing_range=pend_swing_range,
                 )
                 signals.append(sig)
                 active_signal = sig
@@ -530,12 +679,16 @@ def run_mst_medio(
                         active_signal.result = "CLOSE_REVERSE"
                         active_signal.pnl_r = _calc_pnl_r(active_signal, bar_close)
 
-                init_state = "PENDING" if limit_order else "OPEN"
+                # Retest mode: the retest touch is the fill → trade is already open
+                filled = retest or not limit_order
                 sig = Signal(
                     time=bar_time, direction="SELL", entry=entry, sl=sl_val, tp=tp,
                     w1_peak=pend_w1_peak, break_time=times[pend_break_idx] if pend_break_idx else bar_time,
-                    confirm_time=bar_time, result=init_state, filled=not limit_order,
-                    orig_sl=sl_val,
+                    confirm_time=pend_conf_time if retest else bar_time, result="OPEN" if filled else "PENDING", filled=filled,
+                    orig_sl=sl_val, bar_index=bar_i,
+                    conf_high=conf_wave_high, conf_low=conf_wave_low,
+                    fill_bar=bar_i if filled else -1,
+                    break_bar=pend_break_bar, swing_range=pend_swing_range,
                 )
                 signals.append(sig)
                 active_signal = sig
@@ -551,12 +704,17 @@ def run_mst_medio(
                     if bar_low <= active_signal.entry:
                         active_signal.result = "OPEN"
                         active_signal.filled = True
+                        active_signal.fill_bar = bar_i
                         if debug:
                             print(f"  [{bar_time}] ✓ BUY LIMIT filled at {active_signal.entry:.2f} (low={bar_low:.2f})")
-                        # Check if SL also hit on same bar (SL takes priority)
+                        # Check if SL also hit on same bar (SL takes priority unless M1 shows TP first)
                         if bar_low <= active_signal.sl:
-                            active_signal.result = "SL"
-                            active_signal.pnl_r = -1.0
+                            if (active_signal.tp > 0 and bar_high >= active_signal.tp and
+                                    _intrabar_order(intrabar, bar_i, active_signal, fill=True) == INTRABAR_TP):
+                                _close_at_tp(active_signal)
+                            else:
+                                active_signal.result = "SL"
+                                active_signal.pnl_r = -1.0
                             active_signal = None
                     # Check if SL hit before fill (cancel order)
                     elif bar_low <= active_signal.sl:
@@ -570,12 +728,17 @@ def run_mst_medio(
                     if bar_high >= active_signal.entry:
                         active_signal.result = "OPEN"
                         active_signal.filled = True
+                        active_signal.fill_bar = bar_i
                         if debug:
                             print(f"  [{bar_time}] ✓ SELL LIMIT filled at {active_signal.entry:.2f} (high={bar_high:.2f})")
                         # Check if SL also hit on same bar
                         if bar_high >= active_signal.sl:
-                            active_signal.result = "SL"
-                            active_signal.pnl_r = -1.0
+                            if (active_signal.tp > 0 and bar_low <= active_signal.tp and
+                                    _intrabar_order(intrabar, bar_i, active_signal, fill=True) == INTRABAR_TP):
+                                _close_at_tp(active_signal)
+                            else:
+                                active_signal.result = "SL"
+                                active_signal.pnl_r = -1.0
                             active_signal = None
                     # Check if SL hit before fill (cancel order)
                     elif bar_high >= active_signal.sl:
@@ -590,12 +753,16 @@ def run_mst_medio(
                 risk_dist = abs(active_signal.entry - active_signal.orig_sl)  # Original risk distance
 
                 if active_signal.direction == "BUY":
-                    # Check SL hit first (SL priority)
-                    if bar_low <= active_signal.sl:
+                    # Check SL hit first (SL priority unless M1 shows TP first)
+                    if bar_low <= active_signal.sl and not (
+                            active_signal.tp > 0 and bar_high >= active_signal.tp and
+                            _intrabar_order(intrabar, bar_i, active_signal) == INTRABAR_TP):
                         active_signal.result = "SL"
                         active_signal.pnl_r = (active_signal.sl - active_signal.entry) / risk_dist if risk_dist > 0 else -1.0
                         active_signal = None
-                    elif active_signal.tp > 0 and bar_high >= active_signal.tp:
+                    elif active_signal.tp > 0 and bar_high >= active_signal.tp and not (
+                            active_signal.fill_bar == bar_i and
+                            _intrabar_order(intrabar, bar_i, active_signal, fill=True) == INTRABAR_NONE):
                         rr_actual = abs(active_signal.tp - active_signal.entry) / risk_dist if risk_dist > 0 else 0
                         active_signal.result = "TP"
                         active_signal.pnl_r = rr_actual
@@ -608,11 +775,15 @@ def run_mst_medio(
                             if debug:
                                 print(f"  [{bar_time}] ✓ BE moved: SL → {active_signal.entry:.2f}")
                 else:
-                    if bar_high >= active_signal.sl:
+                    if bar_high >= active_signal.sl and not (
+                            active_signal.tp > 0 and bar_low <= active_signal.tp and
+                            _intrabar_order(intrabar, bar_i, active_signal) == INTRABAR_TP):
                         active_signal.result = "SL"
                         active_signal.pnl_r = (active_signal.entry - active_signal.sl) / risk_dist if risk_dist > 0 else -1.0
                         active_signal = None
-                    elif active_signal.tp > 0 and bar_low <= active_signal.tp:
+                    elif active_signal.tp > 0 and bar_low <= active_signal.tp and not (
+                            active_signal.fill_bar == bar_i and
+                            _intrabar_order(intrabar, bar_i, active_signal, fill=True) == INTRABAR_NONE):
                         rr_actual = abs(active_signal.entry - active_signal.tp) / risk_dist if risk_dist > 0 else 0
                         active_signal.result = "TP"
                         active_signal.pnl_r = rr_actual
@@ -625,9 +796,29 @@ def run_mst_medio(
                             if debug:
                                 print(f"  [{bar_time}] ✓ BE moved: SL → {active_signal.entry:.2f}")
 
+        # Exit bar of the trade managed on this bar and/or a new one closed on the same bar
+        for closed in (managed, signals[-1] if signals else None):
+            if closed is not None and closed.exit_bar < 0 and closed.result not in ("OPEN", "PENDING"):
+                closed.exit_bar = bar_i
+
     return signals, swings
 
 
+def _intrabar_order(intrabar, bar_i: int, signal: Signal, fill: bool = False) -> int:
+    """M1 order of SL vs TP on bar_i (from the limit fill when fill=True); UNKNOWN without a resolver."""
+    if intrabar is None:
+        return INTRABAR_UNKNOWN
+    d = 1 if signal.direction == "BUY" else -1
+    return intrabar.resolve_one(bar_i, d, signal.sl, signal.tp,
+                                fill=signal.entry if fill else None)
+
+
+def _close_at_tp(signal: Signal):
+    risk = abs(signal.entry - signal.orig_sl) if signal.orig_sl != 0 else abs(signal.entry - signal.sl)
+    signal.result = "TP"
+    signal.pnl_r = abs(signal.tp - signal.entry) / risk if risk > 0 else 0
+
+
 def _calc_pnl_r(signal: Signal, close_price: float) -> float:
     # Use orig_sl for risk distance (SL may have moved to entry via BE)
     risk = abs(signal.entry - signal.orig_sl) if signal.orig_sl != 0 else abs(signal.entry - signal.sl)
@@ -662,13 +853,67 @@ def signals_to_dataframe(signals: List[Signal]) -> pd.DataFrame:
     return pd.DataFrame(records)
 
 
+def signals_to_arrays(signals: List[Signal]) -> dict:
+    """
+    Column arrays for the vectorized evaluators (fast_exits.py).
+    start = bar_index (first bar the order is managed on), direction: +1 BUY / -1 SELL,
+    sl = original SL (before BE), tp = NaN when there is no TP.
+    """
+    direction = np.array([1 if s.direction == "BUY" else -1 for s in signals], dtype=np.int8)
+    entry = np.array([s.entry for s in signals], dtype=np.float64)
+    sl = np.array([s.orig_sl if s.orig_sl != 0 else s.sl for s in signals], dtype=np.float64)
+    tp = np.array([s.tp if s.tp > 0 else np.nan for s in signals], dtype=np.float64)
+    return {
+        "start": np.array([s.bar_index for s in signals], dtype=np.int64),
+        "direction": direction,
+        "entry": entry,
+        "sl": sl,
+        "tp": tp,
+        "risk": (entry - sl) * direction,
+        "w1_peak": np.array([s.w1_peak for s in signals], dtype=np.float64),
+        "conf_high": np.array([s.conf_high for s in signals], dtype=np.float64),
+        "conf_low": np.array([s.conf_low for s in signals], dtype=np.float64),
+        "break_bar": np.array([s.break_bar for s in signals], dtype=np.int64),
+        "swing_range": np.array([s.swing_range for s in signals], dtype=np.float64),
+    }
+
+
+def trades_from_signals(signals: List[Signal], include_open: bool = False, times=None) -> dict:
+    """
+    Filled engine trades as column arrays (closed only, or also OPEN with include_open):
+    entry_bar (fill bar), exit_bar (-1 while OPEN), direction (+1 BUY / -1 SELL), entry,
+    risk (original SL distance), pnl_r (0 while OPEN), result.
+    times (df.index values): adds entry_time / exit_time (NaT while OPEN).
+    """
+    results = CLOSED_RESULTS + (("OPEN",) if include_open else ())
+    keep = [s for s in signals if s.filled and s.fill_bar >= 0 and s.result in results]
+    is_open = np.array([s.result == "OPEN" for s in keep], dtype=bool)
+    entry = np.array([s.entry for s in keep], dtype=np.float64)
+    sl = np.array([s.orig_sl if s.orig_sl != 0 else s.sl for s in keep], dtype=np.float64)
+    trades = {
+        "entry_bar": np.array([s.fill_bar for s in keep], dtype=np.int64),
+        "exit_bar": np.where(is_open, -1, np.array([s.exit_bar for s in keep], dtype=np.int64)),
+        "direction": np.array([1 if s.direction == "BUY" else -1 for s in keep], dtype=np.int64),
+        "entry": entry,
+        "risk": np.abs(entry - sl),
+        "pnl_r": np.where(is_open, 0.0, np.array([s.pnl_r for s in keep], dtype=np.float64)),
+        "result": np.array([s.result for s in keep], dtype=object),
+    }
+    if times is not None:
+        times = np.asarray(times)
+        trades["entry_time"] = times[trades["entry_bar"]]
+        trades["exit_time"] = np.where(trades["exit_bar"] >= 0, times[trades["exit_bar"]],
+                                       np.array("NaT", dtype=times.dtype))
+    return trades
+
+
 def print_summary(signals: List[Signal], title: str = "MST Medio v2.0"):
     if not signals:
         print("No signals found.")
         return
 
     df = signals_to_dataframe(signals)
-    closed = df[df["Result"].isin(["TP", "SL", "CLOSE_REVERSE"])]
+    closed = df[df["Result"].isin(CLOSED_RESULTS)]
     unfilled = df[df["Result"] == "UNFILLED"]
     pending = df[df["Result"] == "PENDING"]
     total = len(closed)
@@ -17,7 +17,12 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 import pandas as pd
 import numpy as np
-from strategy_mst_medio import run_mst_medio, Signal
+from strategy_mst_medio import run_mst_medio, Signal, signals_to_arrays
+from fast_exits import BarIndex, fill_bars
+from trade_paths import build_excursion_store, ExcursionStore
+from analytics_cube import AnalyticsCube, DAY_NAMES
+from filter_discovery import discover_filters, print_discovery
+from market_data import load_data
 from typing import List
 
 # ============================================================================
@@ -42,29 +47,8 @@ SESSIONS = {
     "Off_Hours":   (22, 24),  # 22:00 - 00:00 UTC (thin liquidity)
 }
 
-DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-
-
-# ============================================================================
-# DATA LOADING
-# ============================================================================
-def load_data(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path, parse_dates=["datetime"])
-    df.set_index("datetime", inplace=True)
-    df.sort_index(inplace=True)
-
-    for col_upper, col_lower in [
-        ("Open", "open"), ("High", "high"), ("Low", "low"),
-        ("Close", "close"), ("Volume", "volume")
-    ]:
-        if col_upper in df.columns and col_lower in df.columns:
-            df[col_upper] = df[col_upper].fillna(df[col_lower])
-            df.drop(columns=[col_lower], inplace=True, errors="ignore")
-
-    df.drop(columns=["symbol"], inplace=True, errors="ignore")
-    df.dropna(subset=["Open", "High", "Low", "Close"], inplace=True)
-    df = df[df.index.dayofweek < 5]
-    return df
+# Excursion store: bars after fill kept per trade (288 × M5 = 1 day)
+EXCURSION_HORIZON = 288
 
 
 # ============================================================================
@@ -89,259 +73,225 @@ def calc_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
 # ============================================================================
 # ENRICHED SIGNAL DATA
 # ============================================================================
+def _session_lut() -> np.ndarray:
+    """Hour (0-23) → session name; "Unknown" outside every window (first match wins)."""
+    lut = np.full(24, "Unknown", dtype=object)
+    for hour in range(24):
+        for sname, (start_h, end_h) in SESSIONS.items():
+            inside = (hour >= start_h or hour < end_h - 24) if end_h > 24 else start_h <= hour < end_h
+            if inside:
+                lut[hour] = sname
+                break
+    return lut
+
+
+def _positions(index: pd.DatetimeIndex, times: pd.DatetimeIndex):
+    """Position of each time in a sorted index (first match) and whether it is present."""
+    pos = index.searchsorted(times, side="left")
+    found = np.zeros(len(times), dtype=bool)
+    inside = pos < len(index)
+    found[inside] = index.values[pos[inside]] == times.values[inside]
+    return pos, found
+
+
 def enrich_signals(signals: List[Signal], df: pd.DataFrame) -> pd.DataFrame:
     """Convert signals to DataFrame with timing metadata."""
     if not signals:
         return pd.DataFrame()
+    kept = [s for s in signals if s.result != "OPEN"]   # Skip open signals
+    cols = {
+        "confirm_time": pd.DatetimeIndex([s.confirm_time for s in kept]),
+        "break_time": pd.DatetimeIndex([s.break_time for s in kept]),
+        "direction": np.array([s.direction for s in kept], dtype=object),
+        "entry": np.array([s.entry for s in kept], dtype=np.float64),
+        "sl": np.array([s.sl for s in kept], dtype=np.float64),
+        "tp": np.array([s.tp for s in kept], dtype=np.float64),
+        "result": np.array([s.result for s in kept], dtype=object),
+        "pnl_r": np.array([s.pnl_r for s in kept], dtype=np.float64),
+    }
+    return enrich_columns(cols, df)
+
+
+def enrich_columns(cols: dict, df: pd.DataFrame, atr: pd.Series = None) -> pd.DataFrame:
+    """
+    enrich_signals() on column arrays (confirm_time, break_time, direction, entry, sl,
+    tp, result, pnl_r) — e.g. straight from a parameter sweep, no Signal objects.
+    """
+    if atr is None:
+        atr = calc_atr(df, 14)
+    confirm_time = pd.DatetimeIndex(cols["confirm_time"])
+    break_time = pd.DatetimeIndex(cols["break_time"])
+    entry = np.asarray(cols["entry"], dtype=np.float64)
+    sl = np.asarray(cols["sl"], dtype=np.float64)
+    tp = np.asarray(cols["tp"], dtype=np.float64)
+    pnl_r = np.asarray(cols["pnl_r"], dtype=np.float64)
+
+    risk = np.abs(entry - sl)
+    reward = np.where(tp > 0, np.abs(tp - entry), 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rr_planned = np.where(risk > 0, reward / risk, 0.0)
+        risk_pct = np.where(entry > 0, risk / entry * 100, 0.0)
+
+    # Timing metadata
+    hour = confirm_time.hour.to_numpy()
+    day_of_week = confirm_time.dayofweek.to_numpy()  # 0=Mon, 4=Fri
+
+    # Bars from break to confirm (positional join; M5 time estimate if not in data)
+    conf_pos, conf_found = _positions(df.index, confirm_time)
+    break_pos, break_found = _positions(df.index, break_time)
+    td = (confirm_time.values - break_time.values) / np.timedelta64(1, "s")
+    bars_to_confirm = np.where(conf_found & break_found, conf_pos - break_pos,
+                               np.where(confirm_time.values != break_time.values,
+                                        np.trunc(td / 300), 0)).astype(np.int64)
+
+    # ATR at confirm time (else the last bar before it)
+    atr_values = atr.to_numpy(dtype=np.float64)
+    prev = (conf_pos > 0) & (conf_pos < len(atr_values))
+    atr_pos = np.where(conf_found, conf_pos, np.where(prev, conf_pos - 1, -1))
+    atr_at_confirm = np.where(atr_pos >= 0, atr_values[np.maximum(atr_pos, 0)], np.nan) \
+        if len(atr_values) else np.full(len(confirm_time), np.nan)
+
+    return pd.DataFrame({
+        "confirm_time": confirm_time,
+        "break_time": break_time,
+        "direction": cols["direction"],
+        "entry": entry,
+        "sl": sl,
+        "tp": tp,
+        "rr_planned": np.round(rr_planned, 2),
+        "result": cols["result"],
+        "pnl_r": np.round(pnl_r, 2),
+        "is_win": pnl_r > 0,
+        "hour": hour,
+        "day_of_week": day_of_week,
+        "day_name": np.array(DAY_NAMES, dtype=object)[day_of_week],
+        "session": _session_lut()[hour],
+        "bars_to_confirm": bars_to_confirm,
+        "atr_at_confirm": np.round(atr_at_confirm, 5),
+        "risk_pct": np.round(risk_pct, 4),
+    })
+
+
+def build_trade_excursions(signals: List[Signal], df: pd.DataFrame,
+                           horizon: int = EXCURSION_HORIZON) -> ExcursionStore:
+    """
+    Excursion store row-aligned with enrich_signals (OPEN signals skipped).
+    Rows start at the limit fill bar; never-filled orders are all NaN.
+    """
+    kept = [s for s in signals if s.result != "OPEN"]
+    arr = signals_to_arrays(kept)
+    index = BarIndex.from_df(df)
+    start = fill_bars(index, arr["start"], arr["direction"], arr["entry"])
+    return build_excursion_store(index, start, arr["direction"], arr["entry"], arr["sl"], horizon)
 
-    atr = calc_atr(df, 14)
-
-    records = []
-    for s in signals:
-        # Skip open signals
-        if s.result == "OPEN":
-            continue
-
-        risk = abs(s.entry - s.sl)
-        reward = abs(s.tp - s.entry) if s.tp > 0 else 0
-        rr_planned = reward / risk if risk > 0 else 0
 
-        # Timing metadata
-        confirm_time = s.confirm_time
-        hour = confirm_time.hour
-        day_of_week = confirm_time.dayofweek  # 0=Mon, 4=Fri
-        day_name = DAY_NAMES[day_of_week]
+# ============================================================================
+# ANALYSIS FUNCTIONS
+# ============================================================================
+def _cube_table(trades: pd.DataFrame, cube, dim: str, name: str = None) -> pd.DataFrame:
+    """One cube dimension in the analyze_* layout (total, wins, pnl_r, avg_pnl, win_rate)."""
+    if cube is None:
+        cube = AnalyticsCube.from_trades(trades)
+    t = cube.table(dim).rename(columns={dim: name or dim})
+    t["win_rate"] = t["win_rate"].round(1)
+    t["pnl_r"] = t["pnl_r"].round(2)
+    t["avg_pnl"] = t["avg_pnl"].round(2)
+    return t
 
-        # Session
-        session = "Unknown"
-        for sname, (start_h, end_h) in SESSIONS.items():
-            if end_h > 24:
-                if hour >= start_h or hour < (end_h - 24):
-                    session = sname
-                    break
-            elif start_h <= hour < end_h:
-                session = sname
-                break
 
-        # Bars from break to confirm
-        break_time = s.break_time
-        bars_to_confirm = 0
-        if break_time in df.index and confirm_time in df.index:
-            break_loc = df.index.get_loc(break_time)
-            conf_loc = df.index.get_loc(confirm_time)
-            if isinstance(break_loc, int) and isinstance(conf_loc, int):
-                bars_to_confirm = conf_loc - break_loc
-            elif hasattr(break_loc, 'start'):
-                bars_to_confirm = conf_loc - break_loc.start if isinstance(conf_loc, int) else 0
-        elif break_time != confirm_time:
-            # Estimate from time difference
-            td = (confirm_time - break_time).total_seconds()
-            bars_to_confirm = int(td / 300)  # M5 = 300s per bar
-
-        # ATR at confirm time
-        atr_at_confirm = np.nan
-        if confirm_time in atr.index:
-            atr_at_confirm = atr.loc[confirm_time]
-        else:
-            # Find nearest ATR
-            nearest_idx = atr.index.searchsorted(confirm_time)
-            if nearest_idx > 0 and nearest_idx < len(atr):
-                atr_at_confirm = atr.iloc[nearest_idx - 1]
-
-        # Risk as % of price
-        risk_pct = (risk / s.entry * 100) if s.entry > 0 else 0
-
-        # Win/Loss
-        is_win = s.pnl_r > 0
-
-        records.append({
-            "confirm_time": confirm_time,
-            "break_time": break_time,
-            "direction": s.direction,
-            "entry": s.entry,
-            "sl": s.sl,
-            "tp": s.tp,
-            "rr_planned": round(rr_planned, 2),
-            "result": s.result,
-            "pnl_r": round(s.pnl_r, 2),
-            "is_win": is_win,
-            "hour": hour,
-            "day_of_week": day_of_week,
-            "day_name": day_name,
-            "session": session,
-            "bars_to_confirm": bars_to_confirm,
-            "atr_at_confirm": round(atr_at_confirm, 5) if not np.isnan(atr_at_confirm) else np.nan,
-            "risk_pct": round(risk_pct, 4),
-        })
-
-    return pd.DataFrame(records)
+_COLUMNS = ["total", "wins", "pnl_r", "avg_pnl", "win_rate"]
 
 
-# ============================================================================
-# ANALYSIS FUNCTIONS
-# ============================================================================
-def analyze_by_hour(trades: pd.DataFrame) -> pd.DataFrame:
+def analyze_by_hour(trades: pd.DataFrame, cube: AnalyticsCube = None) -> pd.DataFrame:
     """Win rate by hour of day."""
     if trades.empty:
         return pd.DataFrame()
-
-    grouped = trades.groupby("hour").agg(
-        total=("is_win", "count"),
-        wins=("is_win", "sum"),
-        pnl_r=("pnl_r", "sum"),
-        avg_pnl=("pnl_r", "mean"),
-    ).reset_index()
-    grouped["win_rate"] = (grouped["wins"] / grouped["total"] * 100).round(1)
-    grouped["pnl_r"] = grouped["pnl_r"].round(2)
-    grouped["avg_pnl"] = grouped["avg_pnl"].round(2)
-    return grouped.sort_values("hour")
+    t = _cube_table(trades, cube, "hour")
+    t["hour"] = t["hour"].astype(int)
+    return t[["hour"] + _COLUMNS]
 
 
-def analyze_by_day(trades: pd.DataFrame) -> pd.DataFrame:
+def analyze_by_day(trades: pd.DataFrame, cube: AnalyticsCube = None) -> pd.DataFrame:
     """Win rate by day of week."""
     if trades.empty:
         return pd.DataFrame()
-
-    grouped = trades.groupby(["day_of_week", "day_name"]).agg(
-        total=("is_win", "count"),
-        wins=("is_win", "sum"),
-        pnl_r=("pnl_r", "sum"),
-        avg_pnl=("pnl_r", "mean"),
-    ).reset_index()
-    grouped["win_rate"] = (grouped["wins"] / grouped["total"] * 100).round(1)
-    grouped["pnl_r"] = grouped["pnl_r"].round(2)
-    grouped["avg_pnl"] = grouped["avg_pnl"].round(2)
-    return grouped.sort_values("day_of_week")
+    t = _cube_table(trades, cube, "day", "day_name")
+    t.insert(0, "day_of_week", [DAY_NAMES.index(d) for d in t["day_name"]])
+    return t[["day_of_week", "day_name"] + _COLUMNS]
 
 
-def analyze_by_session(trades: pd.DataFrame) -> pd.DataFrame:
+def analyze_by_session(trades: pd.DataFrame, cube: AnalyticsCube = None) -> pd.DataFrame:
     """Win rate by trading session."""
     if trades.empty:
         return pd.DataFrame()
+    return _cube_table(trades, cube, "session")[["session"] + _COLUMNS]
 
-    grouped = trades.groupby("session").agg(
-        total=("is_win", "count"),
-        wins=("is_win", "sum"),
-        pnl_r=("pnl_r", "sum"),
-        avg_pnl=("pnl_r", "mean"),
-    ).reset_index()
-    grouped["win_rate"] = (grouped["wins"] / grouped["total"] * 100).round(1)
-    grouped["pnl_r"] = grouped["pnl_r"].round(2)
-    grouped["avg_pnl"] = grouped["avg_pnl"].round(2)
-    return grouped
 
-
-def analyze_bars_to_confirm(trades: pd.DataFrame) -> pd.DataFrame:
+def analyze_bars_to_confirm(trades: pd.DataFrame, cube: AnalyticsCube = None) -> pd.DataFrame:
     """Win rate bucketed by bars from break to confirm."""
     if trades.empty:
         return pd.DataFrame()
+    t = _cube_table(trades, cube, "btc", "btc_bucket")
+    t["avg_bars"] = t["avg_bars"].round(0)
+    return t[["btc_bucket"] + _COLUMNS[:4] + ["avg_bars", "win_rate"]]
+
 
-    bins = [0, 5, 10, 20, 30, 50, 100, 500, 10000]
-    labels = ["1-5", "6-10", "11-20", "21-30", "31-50", "51-100", "101-500", "500+"]
-    trades = trades.copy()
-    trades["btc_bucket"] = pd.cut(trades["bars_to_confirm"], bins=bins, labels=labels, right=True)
-
-    grouped = trades.groupby("btc_bucket", observed=True).agg(
-        total=("is_win", "count"),
-        wins=("is_win", "sum"),
-        pnl_r=("pnl_r", "sum"),
-        avg_pnl=("pnl_r", "mean"),
-        avg_bars=("bars_to_confirm", "mean"),
-    ).reset_index()
-    grouped["win_rate"] = (grouped["wins"] / grouped["total"] * 100).round(1)
-    grouped["pnl_r"] = grouped["pnl_r"].round(2)
-    grouped["avg_pnl"] = grouped["avg_pnl"].round(2)
-    grouped["avg_bars"] = grouped["avg_bars"].round(0)
-    return grouped
-
-
-def analyze_atr_buckets(trades: pd.DataFrame) -> pd.DataFrame:
+def analyze_atr_buckets(trades: pd.DataFrame, cube: AnalyticsCube = None) -> pd.DataFrame:
     """Win rate by ATR percentile buckets."""
     if trades.empty or trades["atr_at_confirm"].isna().all():
         return pd.DataFrame()
-
-    valid = trades.dropna(subset=["atr_at_confirm"]).copy()
-    if len(valid) < 5:
+    if trades["atr_at_confirm"].notna().sum() < 5:
         return pd.DataFrame()
-
-    try:
-        valid["atr_quartile"] = pd.qcut(valid["atr_at_confirm"], q=4,
-                                         labels=["Low (Q1)", "Medium-Low (Q2)",
-                                                  "Medium-High (Q3)", "High (Q4)"],
-                                         duplicates="drop")
-    except ValueError:
-        # Not enough unique values for 4 quartiles
-        valid["atr_quartile"] = pd.qcut(valid["atr_at_confirm"], q=2,
-                                         labels=["Low", "High"],
-                                         duplicates="drop")
-
-    grouped = valid.groupby("atr_quartile", observed=True).agg(
-        total=("is_win", "count"),
-        wins=("is_win", "sum"),
-        pnl_r=("pnl_r", "sum"),
-        avg_pnl=("pnl_r", "mean"),
-        atr_min=("atr_at_confirm", "min"),
-        atr_max=("atr_at_confirm", "max"),
-    ).reset_index()
-    grouped["win_rate"] = (grouped["wins"] / grouped["total"] * 100).round(1)
-    grouped["pnl_r"] = grouped["pnl_r"].round(2)
-    grouped["avg_pnl"] = grouped["avg_pnl"].round(2)
-    return grouped
-
-
-def analyze_by_direction(trades: pd.DataFrame) -> pd.DataFrame:
+    if cube is None:
+        cube = AnalyticsCube.from_trades(trades)
+    t = _cube_table(trades, cube, "atr", "atr_quartile")
+
+    # Range of ATR values inside each bucket
+    code = cube.codes["atr"]
+    atr = trades["atr_at_confirm"].to_numpy(dtype=np.float64)
+    k = len(cube.labels["atr"])
+    lo = np.full(k, np.inf)
+    hi = np.full(k, -np.inf)
+    ok = code >= 0
+    np.minimum.at(lo, code[ok], atr[ok])
+    np.maximum.at(hi, code[ok], atr[ok])
+    ids = [cube.labels["atr"].index(q) for q in t["atr_quartile"]]
+    t["atr_min"] = lo[ids]
+    t["atr_max"] = hi[ids]
+    return t[["atr_quartile"] + _COLUMNS[:4] + ["atr_min", "atr_max", "win_rate"]]
+
+
+def analyze_by_direction(trades: pd.DataFrame, cube: AnalyticsCube = None) -> pd.DataFrame:
     """Win rate by direction."""
     if trades.empty:
         return pd.DataFrame()
-
-    grouped = trades.groupby("direction").agg(
-        total=("is_win", "count"),
-        wins=("is_win", "sum"),
-        pnl_r=("pnl_r", "sum"),
-        avg_pnl=("pnl_r", "mean"),
-    ).reset_index()
-    grouped["win_rate"] = (grouped["wins"] / grouped["total"] * 100).round(1)
-    grouped["pnl_r"] = grouped["pnl_r"].round(2)
-    grouped["avg_pnl"] = grouped["avg_pnl"].round(2)
-    return grouped
+    return _cube_table(trades, cube, "direction")[["direction"] + _COLUMNS]
 
 
-def analyze_rr_buckets(trades: pd.DataFrame) -> pd.DataFrame:
+def analyze_rr_buckets(trades: pd.DataFrame, cube: AnalyticsCube = None) -> pd.DataFrame:
     """Win rate by planned R:R buckets."""
     if trades.empty:
         return pd.DataFrame()
-
-    bins = [0, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 100.0]
-    labels = ["<0.5", "0.5-1.0", "1.0-1.5", "1.5-2.0", "2.0-3.0", "3.0-5.0", "5.0+"]
-    t = trades.copy()
-    t["rr_bucket"] = pd.cut(t["rr_planned"], bins=bins, labels=labels, right=True)
-
-    grouped = t.groupby("rr_bucket", observed=True).agg(
-        total=("is_win", "count"),
-        wins=("is_win", "sum"),
-        pnl_r=("pnl_r", "sum"),
-        avg_pnl=("pnl_r", "mean"),
-    ).reset_index()
-    grouped["win_rate"] = (grouped["wins"] / grouped["total"] * 100).round(1)
-    grouped["pnl_r"] = grouped["pnl_r"].round(2)
-    grouped["avg_pnl"] = grouped["avg_pnl"].round(2)
-    return grouped
+    return _cube_table(trades, cube, "rr", "rr_bucket")[["rr_bucket"] + _COLUMNS]
 
 
 # ============================================================================
 # RECOMMENDATIONS
 # ============================================================================
-def generate_recommendations(trades: pd.DataFrame, pair: str) -> List[str]:
+def generate_recommendations(trades: pd.DataFrame, pair: str,
+                             cube: AnalyticsCube = None) -> List[str]:
     """Generate timing filter recommendations based on data."""
     recs = []
     if trades.empty:
         return recs
+    if cube is None:
+        cube = AnalyticsCube.from_trades(trades)
 
     total = len(trades)
     overall_wr = trades["is_win"].mean() * 100
 
     # ── Session recommendations ──
-    by_session = analyze_by_session(trades)
+    by_session = analyze_by_session(trades, cube)
     for _, row in by_session.iterrows():
         if row["total"] >= 3:
             if row["win_rate"] < overall_wr - 15 and row["pnl_r"] < 0:
@@ -353,7 +303,7 @@ def generate_recommendations(trades: pd.DataFrame, pair: str) -> List[str]:
                            f"(WR={row['win_rate']:.0f}%, PnL={row['pnl_r']:+.1f}R, n={row['total']})")
 
     # ── Day recommendations ──
-    by_day = analyze_by_day(trades)
+    by_day = analyze_by_day(trades, cube)
     for _, row in by_day.iterrows():
         if row["total"] >= 3:
             if row["win_rate"] < overall_wr - 15 and row["pnl_r"] < 0:
@@ -361,7 +311,7 @@ def generate_recommendations(trades: pd.DataFrame, pair: str) -> List[str]:
                            f"(WR={row['win_rate']:.0f}%, PnL={row['pnl_r']:+.1f}R, n={row['total']})")
 
     # ── Bars to confirm ──
-    by_btc = analyze_bars_to_confirm(trades)
+    by_btc = analyze_bars_to_confirm(trades, cube)
     for _, row in by_btc.iterrows():
         if row["total"] >= 3:
             if row["win_rate"] < overall_wr - 15 and row["pnl_r"] < 0:
@@ -369,7 +319,7 @@ def generate_recommendations(trades: pd.DataFrame, pair: str) -> List[str]:
                            f"(WR={row['win_rate']:.0f}%, PnL={row['pnl_r']:+.1f}R, n={row['total']})")
 
     # ── ATR ──
-    by_atr = analyze_atr_buckets(trades)
+    by_atr = analyze_atr_buckets(trades, cube)
     if not by_atr.empty:
         for _, row in by_atr.iterrows():
             if row["total"] >= 3 and row["win_rate"] < overall_wr - 15 and row["pnl_r"] < 0:
@@ -377,7 +327,7 @@ def generate_recommendations(trades: pd.DataFrame, pair: str) -> List[str]:
                            f"(WR={row['win_rate']:.0f}%, PnL={row['pnl_r']:+.1f}R, n={row['total']})")
 
     # ── R:R ──
-    by_rr = analyze_rr_buckets(trades)
+    by_rr = analyze_rr_buckets(trades, cube)
     for _, row in by_rr.iterrows():
         if row["total"] >= 3 and row["pnl_r"] < -1:
             recs.append(f"⚠️ {pair}: R:R {row['rr_bucket']} losing money "
@@ -421,6 +371,12 @@ def run_analysis_for_pair(pair_name: str, data_file: str) -> pd.DataFrame:
 
     trades["pair"] = pair_name
     closed = trades[trades["result"].isin(["TP", "SL", "CLOSE_REVERSE"])]
+
+    # Excursion store — row-aligned with the closed trades saved to trades_detail.csv
+    excursions = build_trade_excursions(signals, df).take(closed.index.values)
+    excursions.extra = {"bars_to_confirm": closed["bars_to_confirm"].values.astype(np.int64)}
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    excursions.save(os.path.join(OUTPUT_DIR, f"excursions_{pair_name}.npz"))
     total = len(closed)
     wins = closed["is_win"].sum()
     wr = wins / total * 100 if total > 0 else 0
@@ -428,11 +384,14 @@ def run_analysis_for_pair(pair_name: str, data_file: str) -> pd.DataFrame:
 
     print(f"  Closed trades: {total} | WR: {wr:.1f}% | Total PnL: {total_r:+.2f} R")
 
+    # All breakdowns below are slices of one cube (one bincount pass per table)
+    cube = AnalyticsCube.from_trades(closed)
+
     # ── Analysis by Hour ──
     print(f"\n  {'─'*50}")
     print(f"  📊 WIN RATE BY HOUR (UTC)")
     print(f"  {'─'*50}")
-    by_hour = analyze_by_hour(closed)
+    by_hour = analyze_by_hour(closed, cube)
     if not by_hour.empty:
         for _, row in by_hour.iterrows():
             bar = "█" * int(row["win_rate"] / 5)
@@ -443,7 +402,7 @@ def run_analysis_for_pair(pair_name: str, data_file: str) -> pd.DataFrame:
     print(f"\n  {'─'*50}")
     print(f"  📊 WIN RATE BY DAY OF WEEK")
     print(f"  {'─'*50}")
-    by_day = analyze_by_day(closed)
+    by_day = analyze_by_day(closed, cube)
     if not by_day.empty:
         for _, row in by_day.iterrows():
             bar = "█" * int(row["win_rate"] / 5)
@@ -454,7 +413,7 @@ def run_analysis_for_pair(pair_name: str, data_file: str) -> pd.DataFrame:
     print(f"\n  {'─'*50}")
     print(f"  📊 WIN RATE BY SESSION")
     print(f"  {'─'*50}")
-    by_session = analyze_by_session(closed)
+    by_session = analyze_by_session(closed, cube)
     if not by_session.empty:
         for _, row in by_session.iterrows():
             bar = "█" * int(row["win_rate"] / 5)
@@ -465,7 +424,7 @@ def run_analysis_for_pair(pair_name: str, data_file: str) -> pd.DataFrame:
     print(f"\n  {'─'*50}")
     print(f"  📊 WIN RATE BY BARS TO CONFIRM")
     print(f"  {'─'*50}")
-    by_btc = analyze_bars_to_confirm(closed)
+    by_btc = analyze_bars_to_confirm(closed, cube)
     if not by_btc.empty:
         for _, row in by_btc.iterrows():
             bar = "█" * int(row["win_rate"] / 5)
@@ -476,7 +435,7 @@ def run_analysis_for_pair(pair_name: str, data_file: str) -> pd.DataFrame:
     print(f"\n  {'─'*50}")
     print(f"  📊 WIN RATE BY ATR LEVEL")
     print(f"  {'─'*50}")
-    by_atr = analyze_atr_buckets(closed)
+    by_atr = analyze_atr_buckets(closed, cube)
     if not by_atr.empty:
         for _, row in by_atr.iterrows():
             bar = "█" * int(row["win_rate"] / 5)
@@ -487,7 +446,7 @@ def run_analysis_for_pair(pair_name: str, data_file: str) -> pd.DataFrame:
     print(f"\n  {'─'*50}")
     print(f"  📊 WIN RATE BY PLANNED R:R")
     print(f"  {'─'*50}")
-    by_rr = analyze_rr_buckets(closed)
+    by_rr = analyze_rr_buckets(closed, cube)
     if not by_rr.empty:
         for _, row in by_rr.iterrows():
             bar = "█" * int(row["win_rate"] / 5)
@@ -498,15 +457,31 @@ def run_analysis_for_pair(pair_name: str, data_file: str) -> pd.DataFrame:
     print(f"\n  {'─'*50}")
     print(f"  📊 WIN RATE BY DIRECTION")
     print(f"  {'─'*50}")
-    by_dir = analyze_by_direction(closed)
+    by_dir = analyze_by_direction(closed, cube)
     if not by_dir.empty:
         for _, row in by_dir.iterrows():
             bar = "█" * int(row["win_rate"] / 5)
             print(f"  {row['direction']:<5s}  {bar:<20s}  WR={row['win_rate']:5.1f}%  "
                   f"PnL={row['pnl_r']:+6.1f}R  n={int(row['total']):3d}")
 
+    # ── Excursions (from the store, no OHLC rescan) ──
+    if len(excursions.start):
+        print(f"\n  {'─'*50}")
+        print(f"  📊 EXCURSIONS (first {excursions.horizon} bars after fill)")
+        print(f"  {'─'*50}")
+        stop_k = excursions.stop_offset()
+        for level in (1.0, 2.0, 3.0):
+            k = excursions.bars_to_mfe(level)
+            # Counts only if reached before the original SL bar
+            reached = (k >= 0) & ((stop_k < 0) | (k < stop_k))
+            med = f"{int(np.median(k[reached]))} bars" if reached.any() else "—"
+            print(f"  MFE ≥ {level:.0f}R before SL: {reached.mean() * 100:5.1f}%  median {med}")
+        stopped = stop_k >= 0
+        if stopped.any():
+            print(f"  SL hit within horizon: {stopped.mean() * 100:5.1f}%  median {int(np.median(stop_k[stopped]))} bars")
+
     # ── Recommendations ──
-    recs = generate_recommendations(closed, pair_name)
+    recs = generate_recommendations(closed, pair_name, cube)
     if recs:
         print(f"\n  {'─'*50}")
         print(f"  💡 RECOMMENDATIONS")
@@ -539,12 +514,13 @@ def main():
         wr = wins / total * 100 if total > 0 else 0
         total_r = combined["pnl_r"].sum()
         print(f"  Overall: {total} trades | WR={wr:.1f}% | PnL={total_r:+.2f}R")
+        cube = AnalyticsCube.from_trades(combined)
 
         # Combined by session
         print(f"\n  {'─'*50}")
         print(f"  📊 COMBINED WIN RATE BY SESSION")
         print(f"  {'─'*50}")
-        by_session = analyze_by_session(combined)
+        by_session = analyze_by_session(combined, cube)
         if not by_session.empty:
             for _, row in by_session.iterrows():
                 bar = "█" * int(row["win_rate"] / 5)
@@ -555,15 +531,24 @@ def main():
         print(f"\n  {'─'*50}")
         print(f"  📊 COMBINED WIN RATE BY BARS TO CONFIRM")
         print(f"  {'─'*50}")
-        by_btc = analyze_bars_to_confirm(combined)
+        by_btc = analyze_bars_to_confirm(combined, cube)
         if not by_btc.empty:
             for _, row in by_btc.iterrows():
                 bar = "█" * int(row["win_rate"] / 5)
                 print(f"  {str(row['btc_bucket']):<10s}  {bar:<20s}  WR={row['win_rate']:5.1f}%  "
                       f"PnL={row['pnl_r']:+6.1f}R  n={int(row['total']):3d}  avg={int(row['avg_bars'])} bars")
 
+        # Combined session × direction (cube cross slice)
+        print(f"\n  {'─'*50}")
+        print(f"  📊 COMBINED WIN RATE BY SESSION × DIRECTION")
+        print(f"  {'─'*50}")
+        for row in cube.table("session", "direction").itertuples(index=False):
+            bar = "█" * int(row.win_rate / 5)
+            print(f"  {row.session:<14s} {row.direction:<5s} {bar:<20s}  WR={row.win_rate:5.1f}%  "
+                  f"PnL={row.pnl_r:+6.1f}R  n={int(row.total):3d}")
+
         # Combined recommendations
-        recs = generate_recommendations(combined, "ALL_PAIRS")
+        recs = generate_recommendations(combined, "ALL_PAIRS", cube)
         if recs:
             print(f"\n  {'─'*50}")
             print(f"  💡 COMBINED RECOMMENDATIONS")
@@ -571,6 +556,10 @@ def main():
             for r in recs:
                 print(f"  {r}")
 
+        # Automated search over filter combinations (in-sample rank, out-of-sample check)
+        print_discovery("🔎 DISCOVERED FILTERS (ALL PAIRS)",
+                        discover_filters(combined, min_trades=20, min_oos=8), top=5)
+
         # Save to CSV
         csv_path = os.path.join(OUTPUT_DIR, "trades_detail.csv")
         combined.to_csv(csv_path, index=False)
@@ -0,0 +1,363 @@
+"""
+trade_paths.py — Per-trade bar paths for path-dependent exit studies
+
+Every trade's bars (start → original SL bar, or end of data) are laid out once in
+flat CSR arrays (`offsets` delimit each trade's segment). Running max of the
+favourable excursion is computed once per trade; a whole grid of trailing
+settings is then evaluated with array ops over the flat path instead of one
+Python bar loop per (signal, setting).
+
+Conventions (same as fast_exits.py / the bar-loop studies):
+- direction: +1 = BUY, -1 = SELL; start = first bar checked (inclusive)
+- on each bar the stop from previous bars is checked first, then the bar's
+  excursion updates best_r / the trailed stop
+- the original SL is never loosened, so no exit can happen after the original SL bar
+
+ExcursionStore: dense, horizon-truncated running MFE / MAE / close in R per setup
+(row = setup, column = bars since entry), saved as .npz next to the signals so later
+studies (time stop, time-to-level, exit policies) never touch raw OHLC again.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from fast_exits import BarIndex, OUTCOME_SL, OUTCOME_OPEN, OUTCOME_TP
+
+# Upper bound on grid × path cells evaluated per chunk (memory ≈ 8 bytes × this)
+_CHUNK_CELLS = 4_000_000
+
+
+@dataclass
+class TradePaths:
+    """
+    Flat path store. Per trade t, path cells are offsets[t]:offsets[t+1].
+
+    Per cell:
+        bar:         bar index in the dataset
+        fav_r:       favourable excursion of the bar in R (BUY: (High-entry)/risk, SELL: (entry-Low)/risk)
+        favourable:  favourable price of the bar (BUY: High, SELL: Low)
+        adverse:     adverse price of the bar (BUY: Low, SELL: High)
+        close:       Close of the bar (NaN when the index has no closes)
+        best_before: best_r before the bar (running max of fav_r over earlier bars, floored at 0)
+    """
+    start: np.ndarray
+    direction: np.ndarray
+    entry: np.ndarray
+    sl: np.ndarray
+    risk: np.ndarray
+    stop_bar: np.ndarray
+    offsets: np.ndarray
+    trade: np.ndarray
+    bar: np.ndarray
+    fav_r: np.ndarray
+    favourable: np.ndarray
+    adverse: np.ndarray
+    close: np.ndarray
+    best_before: np.ndarray
+    n: int
+
+    @property
+    def n_trades(self) -> int:
+        return len(self.start)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def best_at_end(self) -> np.ndarray:
+        """best_r after the last bar of each path (0 for empty paths)."""
+        out = np.zeros(self.n_trades)
+        last = self.offsets[1:] - 1
+        ok = self.lengths > 0
+        out[ok] = np.maximum(self.best_before[last[ok]], self.fav_r[last[ok]])
+        return out
+
+    def first_in_segment(self, hit: np.ndarray) -> np.ndarray:
+        """
+        hit: (g, cells) bool → (g, trades) offset of the first True cell per trade
+        (cells = no hit / empty path).
+        """
+        cells = len(self.bar)
+        pos = np.where(hit, np.arange(cells), cells)
+        out = np.full((hit.shape[0], self.n_trades), cells, dtype=np.int64)
+        ok = self.lengths > 0
+        if ok.any():
+            out[:, ok] = np.minimum.reduceat(pos, self.offsets[:-1][ok], axis=1)
+        return out
+
+
+def build_trade_paths(index: BarIndex, start, direction, entry, sl, stop_bar=None) -> TradePaths:
+    """
+    Lay out each trade's bars from `start` up to its original SL bar (inclusive),
+    or to the last bar if the SL is never hit.
+    """
+    start = np.asarray(start, dtype=np.int64)
+    direction = np.asarray(direction, dtype=np.int8)
+    entry = np.asarray(entry, dtype=np.float64)
+    sl = np.asarray(sl, dtype=np.float64)
+    buy = direction > 0
+    risk = (entry - sl) * direction
+    n = index.n
+
+    if stop_bar is None:
+        stop_bar = np.where(
+            buy,
+            index.first_low_at_or_below(start, np.where(buy, sl, np.nan)),
+            index.first_high_at_or_above(start, np.where(buy, np.nan, sl)),
+        )
+    stop_bar = np.asarray(stop_bar, dtype=np.int64)
+    end = np.clip(np.minimum(stop_bar, n - 1) + 1, start, None)   # exclusive
+    end = np.where(start >= n, start, end)
+    lengths = np.maximum(end - start, 0)
+
+    offsets = np.zeros(len(start) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    trade = np.repeat(np.arange(len(start)), lengths)
+    bar = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths) + np.repeat(start, lengths)
+
+    d = direction[trade]
+    e = entry[trade]
+    fav_price = np.where(d > 0, index.highs[bar], index.lows[bar])
+    adverse = np.where(d > 0, index.lows[bar], index.highs[bar])
+    close = index.closes[bar] if index.closes is not None else np.full(len(bar), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fav_r = (fav_price - e) * d / risk[trade]
+
+    # best_r before each bar: running max per trade, shifted by one, floored at 0 (initial best_r)
+    running = pd.Series(fav_r).groupby(trade).cummax().values
+    best_before = np.zeros(len(bar))
+    if len(bar):
+        best_before[1:] = running[:-1]
+        best_before[offsets[:-1][lengths > 0]] = 0.0
+        best_before = np.maximum(best_before, 0.0)
+
+    return TradePaths(start=start, direction=direction, entry=entry, sl=sl, risk=risk,
+                      stop_bar=stop_bar, offsets=offsets, trade=trade, bar=bar,
+                      fav_r=fav_r, favourable=fav_price, adverse=adverse, close=close,
+                      best_before=best_before, n=n)
+
+
+# ========================================================
+#  Trailing stop grid
+# ========================================================
+@dataclass
+class TrailingGrid:
+    """
+    Result of trailing_grid: rows = configs, columns = trades.
+
+    exit_bar:  bar the trailed stop is hit (-1 = still open)
+    exit_r:    PnL in R (-1.0 when stopped at the untouched original SL, 0 when open)
+    outcome:   OUTCOME_TP (stopped above entry) / OUTCOME_SL (at or below entry) / OUTCOME_OPEN
+    stop:      stop level at exit (or at end of data)
+    best_r:    best_r when the trade closed (before the exit bar's own excursion)
+    """
+    lock_rr: np.ndarray
+    step: np.ndarray
+    exit_bar: np.ndarray
+    exit_r: np.ndarray
+    outcome: np.ndarray
+    stop: np.ndarray
+    best_r: np.ndarray
+
+    def summary(self) -> pd.DataFrame:
+        """One row per config: wins (exit_r > 0), losses (exit_r < 0), total R, WR%, avg R."""
+        closed = self.outcome != OUTCOME_OPEN
+        wins = ((self.exit_r > 0) & closed).sum(axis=1)
+        losses = ((self.exit_r < 0) & closed).sum(axis=1)
+        total_r = np.where(closed, self.exit_r, 0.0).sum(axis=1)
+        decided = wins + losses
+        with np.errstate(divide="ignore", invalid="ignore"):
+            wr = np.where(decided > 0, wins / decided * 100, 0.0)
+            avg_r = np.where(decided > 0, total_r / decided, 0.0)
+        return pd.DataFrame({"lock_rr": self.lock_rr, "step": self.step, "wins": wins,
+                             "losses": losses, "total_r": total_r, "wr": wr, "avg_r": avg_r})
+
+
+def trailing_grid(paths: TradePaths, configs) -> TrailingGrid:
+    """
+    Evaluate many trailing settings at once.
+
+    configs: iterable of (lock_rr, step). Once best_r >= lock_rr the stop trails at
+    entry ± (best_r - step) × risk, only ever tightening (same rule as the bar loops).
+    """
+    configs = np.asarray(list(configs), dtype=np.float64).reshape(-1, 2)
+    lock_rr, step = configs[:, 0], configs[:, 1]
+    g, t, cells = len(configs), paths.n_trades, len(paths.bar)
+
+    exit_bar = np.full((g, t), -1, dtype=np.int64)
+    exit_r = np.zeros((g, t))
+    outcome = np.full((g, t), OUTCOME_OPEN, dtype=np.int8)
+    stop = np.broadcast_to(paths.sl, (g, t)).copy()
+    best_r = np.broadcast_to(paths.best_at_end(), (g, t)).copy()
+    if g == 0 or t == 0:
+        return TrailingGrid(lock_rr, step, exit_bar, exit_r, outcome, stop, best_r)
+
+    tr = paths.trade
+    d = paths.direction[tr].astype(np.float64)
+    e = paths.entry[tr]
+    sl = paths.sl[tr]
+    rk = paths.risk[tr]
+    best = paths.best_before
+    last = paths.offsets[1:] - 1
+    ok = paths.lengths > 0
+    chunk = max(1, _CHUNK_CELLS // max(cells, 1))
+
+    for lo in range(0, g, chunk):
+        hi = min(g, lo + chunk)
+        lk = lock_rr[lo:hi, None]
+        st = step[lo:hi, None]
+        # Stop in force on each bar (set by earlier bars); best_r only moves when > 0
+        trailed = e + d * ((best - st) * rk)
+        locked = (best > 0) & (best >= lk) & ((trailed - sl) * d > 0)
+        level = np.where(locked, trailed, sl)
+        hit = (paths.adverse - level) * d <= 0
+
+        first = paths.first_in_segment(hit)
+        closed = first < cells
+        cell = np.where(closed, first, np.where(ok, last, 0))
+        rows = np.arange(hi - lo)[:, None]
+        lvl = level[rows, cell]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = (lvl - paths.entry) * paths.direction / paths.risk
+        r = np.where(lvl == paths.sl, -1.0, r)
+
+        exit_bar[lo:hi] = np.where(closed, paths.bar[cell], -1)
+        exit_r[lo:hi] = np.where(closed, r, 0.0)
+        outcome[lo:hi] = np.where(
+            closed, np.where((lvl - paths.entry) * paths.direction > 0, OUTCOME_TP, OUTCOME_SL),
+            OUTCOME_OPEN)
+        # Open trades keep the last stop in force after the final bar's update
+        end_best = best_r[lo:hi]
+        end_trailed = paths.entry + paths.direction * ((end_best - st) * paths.risk)
+        end_locked = (end_best > 0) & (end_best >= lk) & ((end_trailed - paths.sl) * paths.direction > 0)
+        stop[lo:hi] = np.where(closed, lvl, np.where(end_locked, end_trailed, paths.sl))
+        best_r[lo:hi] = np.where(closed, best[cell], end_best)
+
+    return TrailingGrid(lock_rr, step, exit_bar, exit_r, outcome, stop, best_r)
+
+
+# ========================================================
+#  Excursion store (MFE / MAE by bars since entry)
+# ========================================================
+@dataclass
+class ExcursionStore:
+    """
+    Row t = setup t, column k = k bars after its start bar (k=0 is the start bar itself).
+
+    mfe_r:   running max favourable excursion in R up to and including bar k
+    mae_r:   running max adverse excursion in R (positive = against us; 1.0 = original SL)
+    close_r: close of bar k in R
+    Cells past the end of data are NaN. float32 keeps 1000 setups × 500 bars ≈ 6 MB.
+    extra:   optional per-setup columns persisted with the store (e.g. bars_to_confirm)
+    """
+    start: np.ndarray
+    direction: np.ndarray
+    entry: np.ndarray
+    sl: np.ndarray
+    mfe_r: np.ndarray
+    mae_r: np.ndarray
+    close_r: np.ndarray
+    extra: dict = None
+
+    @property
+    def horizon(self) -> int:
+        return self.mfe_r.shape[1]
+
+    @property
+    def risk(self) -> np.ndarray:
+        return (self.entry - self.sl) * self.direction
+
+    def bars_to_mfe(self, level_r) -> np.ndarray:
+        """Bars since entry until MFE first reaches level_r (-1 = not within horizon)."""
+        return _first_true(self.mfe_r >= level_r)
+
+    def bars_to_mae(self, level_r) -> np.ndarray:
+        """Bars since entry until MAE first reaches level_r (-1 = not within horizon)."""
+        return _first_true(self.mae_r >= level_r)
+
+    def stop_offset(self) -> np.ndarray:
+        """Bars since entry of the original SL hit (-1 = not within horizon)."""
+        return self.bars_to_mae(1.0)
+
+    def mfe_before(self, bars) -> np.ndarray:
+        """MFE in R over the first `bars` bars (clipped to the horizon)."""
+        k = int(np.clip(bars, 1, self.horizon)) - 1
+        return self.mfe_r[:, k]
+
+    def take(self, rows) -> "ExcursionStore":
+        """Subset of setups (index array or bool mask)."""
+        return ExcursionStore(start=self.start[rows], direction=self.direction[rows],
+                              entry=self.entry[rows], sl=self.sl[rows], mfe_r=self.mfe_r[rows],
+                              mae_r=self.mae_r[rows], close_r=self.close_r[rows],
+                              extra={k: v[rows] for k, v in self.extra.items()} if self.extra else None)
+
+    def save(self, path: str):
+        extra = {f"extra_{k}": np.asarray(v) for k, v in (self.extra or {}).items()}
+        np.savez_compressed(path, start=self.start, direction=self.direction, entry=self.entry,
+                            sl=self.sl, mfe_r=self.mfe_r, mae_r=self.mae_r,
+                            close_r=self.close_r, **extra)
+
+    @classmethod
+    def load(cls, path: str) -> "ExcursionStore":
+        with np.load(path, allow_pickle=False) as z:
+            extra = {k[len("extra_"):]: z[k] for k in z.files if k.startswith("extra_")}
+            return cls(start=z["start"], direction=z["direction"], entry=z["entry"], sl=z["sl"],
+                       mfe_r=z["mfe_r"], mae_r=z["mae_r"], close_r=z["close_r"],
+                       extra=extra or None)
+
+    @classmethod
+    def concat(cls, stores) -> "ExcursionStore":
+        """Stack stores row-wise (horizon = the smallest one; extras kept when present in all)."""
+        stores = list(stores)
+        h = min(st.horizon for st in stores)
+        keys = set.intersection(*[set(st.extra or {}) for st in stores]) if stores else set()
+        return cls(
+            start=np.concatenate([st.start for st in stores]),
+            direction=np.concatenate([st.direction for st in stores]),
+            entry=np.concatenate([st.entry for st in stores]),
+            sl=np.concatenate([st.sl for st in stores]),
+            mfe_r=np.concatenate([st.mfe_r[:, :h] for st in stores]),
+            mae_r=np.concatenate([st.mae_r[:, :h] for st in stores]),
+            close_r=np.concatenate([st.close_r[:, :h] for st in stores]),
+            extra={k: np.concatenate([st.extra[k] for st in stores]) for k in sorted(keys)} or None,
+        )
+
+
+def _first_true(mask: np.ndarray) -> np.ndarray:
+    hit = mask.any(axis=1)
+    return np.where(hit, mask.argmax(axis=1), -1)
+
+
+def build_excursion_store(index: BarIndex, start, direction, entry, sl,
+                          horizon: int = 288, extra: dict = None) -> ExcursionStore:
+    """
+    Gather `horizon` bars after each start into (setups × horizon) running MFE / MAE / close in R.
+    Needs index.closes (BarIndex.from_df). Default horizon 288 = one day of M5.
+    """
+    start = np.asarray(start, dtype=np.int64)
+    direction = np.asarray(direction, dtype=np.int8)
+    entry = np.asarray(entry, dtype=np.float64)
+    sl = np.asarray(sl, dtype=np.float64)
+    n = index.n
+
+    bars = start[:, None] + np.arange(horizon)[None, :]
+    valid = bars < n
+    bars = np.minimum(bars, max(n - 1, 0))
+    d = direction[:, None].astype(np.float64)
+    e = entry[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv_risk = 1.0 / ((entry - sl) * direction)[:, None]
+        fav = np.where(d > 0, index.highs[bars], index.lows[bars])
+        adv = np.where(d > 0, index.lows[bars], index.highs[bars])
+        mfe = np.maximum.accumulate((fav - e) * d * inv_risk, axis=1)
+        mae = np.maximum.accumulate((e - adv) * d * inv_risk, axis=1)
+        close = (index.closes[bars] - e) * d * inv_risk
+
+    def pack(a):
+        return np.where(valid, a, np.nan).astype(np.float32)
+
+    return ExcursionStore(start=start, direction=direction, entry=entry, sl=sl,
+                          mfe_r=pack(mfe), mae_r=pack(mae), close_r=pack(close), extra=extra)
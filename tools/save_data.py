@@ -1,7 +1,7 @@
 """
 save_data.py — Lấy dữ liệu từ TradingView và lưu file CSV
 
-Dữ liệu lưu vào: MST Medio/data/XAUUSD_M5.csv
+Dữ liệu lưu vào: indicators/MST Medio/data/XAUUSD_M5.csv
 Timezone: UTC+7 (Vietnam)
 
 Cách chạy:
@@ -16,8 +16,8 @@ from fetch_data import fetch_ohlcv
 import pandas as pd
 from pathlib import Path
 
-# Data lưu trong MST Medio/data/ (cùng cấp với strategy)
-DATA_DIR = Path(__file__).parent.parent / "MST Medio" / "data"
+# Data lưu trong indicators/MST Medio/data/ (cùng cấp với strategy)
+DATA_DIR = Path(__file__).parent.parent / "indicators" / "MST Medio" / "data"
 
 
 def save_tv_data(
@@ -34,10 +34,11 @@ def save_tv_data(
     # Ensure data/ directory exists
     DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-    # Save CSV
+    # Save CSV — full precision (EURUSD needs 5 decimals); backtest/market_data.py
+    # converts it to its binary store on the next load
     filename = f"{symbol}_{timeframe}.csv"
     filepath = DATA_DIR / filename
-    df.to_csv(filepath, float_format="%.3f")
+    df.to_csv(filepath)
 
     print(f"\n✅ Đã lưu: {filepath}")
     print(f"   Range: {df.index[0].strftime('%Y-%m-%d %H:%M')} → {df.index[-1].strftime('%Y-%m-%d %H:%M')} (UTC+7)")